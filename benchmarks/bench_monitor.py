@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# benchmarks/bench_monitor.py - v1.0.3
+# Acquisition, persistence and API latency of the monitor, on fake hardware
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import fake_hardware
+
+HISTORY_SIZES = (0, 1000, 10000, 100000)
+
+
+def summarize(benchmark, durations, **extra):
+    """One result: latency percentiles in microseconds"""
+    ordered = sorted(durations)
+    n = len(ordered)
+    result = {"benchmark": benchmark}
+    result.update(extra)
+    result.update({
+        "count": n,
+        "mean_us": statistics.fmean(ordered) * 1e6,
+        "p50_us": ordered[n // 2] * 1e6,
+        "p95_us": ordered[min(n - 1, int(n * 0.95))] * 1e6,
+        "p99_us": ordered[min(n - 1, int(n * 0.99))] * 1e6,
+        "max_us": ordered[-1] * 1e6
+    })
+    return result
+
+
+def timed(function, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def write_config(**settings):
+    """config.json in the working directory, read by the monitor on every request"""
+    with open("config.json", "w") as f:
+        json.dump(settings, f)
+
+
+def make_log(monitor, path, size):
+    """A data file holding size readings, written in chunks like the data log writer"""
+    with open(path, "w") as f:
+        f.write(monitor.datalog.HEADER + monitor.datalog.CLOSING)
+    mpu, _ = monitor.init_sensor("mpu6050")
+    reading = monitor.read_sensor(mpu, monitor.calibration.Transform(monitor.CONFIG["calibration"]))
+    row = reading.to_dict(orientation=False, raw=True)
+    for start in range(0, size, 10000):
+        monitor.datalog.append_readings(path, [row] * min(10000, size - start))
+    return row
+
+
+def bench_read_sensor(monitor, repeat):
+    mpu, config = monitor.init_sensor("mpu6050")
+    transform = monitor.calibration.Transform(config["calibration"])
+    yield summarize("read_sensor", timed(lambda: monitor.read_sensor(mpu, transform), repeat),
+                    read_delay=fake_hardware.settings["read_delay"])
+
+
+def bench_save_data(monitor, sizes, repeat):
+    for size in sizes:
+        path = f"save_{size}.json"
+        row = make_log(monitor, path, size)
+        config = {"data_file": path}
+        file_bytes = os.path.getsize(path)
+        yield summarize("save_data", timed(lambda: monitor.save_data(row, config), repeat),
+                        history=size, file_bytes=file_bytes)
+
+
+def bench_http(monitor, sizes, repeat):
+    client = monitor.app.test_client()
+
+    def get(url):
+        response = client.get(url)
+        response.get_data()  # /download streams the file
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    # /data only reads the latest snapshot, so the log size does not matter
+    write_config(data_file="http_0.json")
+    make_log(monitor, "http_0.json", 0)
+    yield summarize("http", timed(lambda: get("/data"), repeat), route="/data")
+    for size in sizes:
+        path = f"http_{size}.json"
+        make_log(monitor, path, size)
+        write_config(data_file=path)
+        runs = max(3, repeat // max(1, size // 1000))  # full-log routes get slow
+        for route in ("/api/v1/log", "/download"):
+            yield summarize("http", timed(lambda: get(route), runs), route=route, history=size,
+                            file_bytes=os.path.getsize(path))
+
+
+def bench_end_to_end(monitor, rate_hz, seconds):
+    """Acquisition through the whole pipeline and data log at a requested rate"""
+    for mode in ("poll", "fifo"):
+        write_config(data_file=f"e2e_{mode}.json", sample_rate=1.0 / rate_hz,
+                     sensor={"backend": "mpu6050" if mode == "poll" else "synthetic", "fifo": mode == "fifo"})
+        monitor.running = True
+        thread = threading.Thread(target=monitor.sensor_thread, daemon=True)
+        thread.start()
+        while monitor.registry is None or monitor.data_log is None:
+            time.sleep(0.01)
+        time.sleep(0.5)  # Warm up
+        device = monitor.registry.primary
+        samples_before, readings_before = device.samples, monitor.data_log.readings
+        start = time.perf_counter()
+        time.sleep(seconds)
+        elapsed = time.perf_counter() - start
+        acquired = device.samples - samples_before
+        logged = monitor.data_log.readings - readings_before
+        monitor.running = False
+        thread.join(timeout=5)
+        monitor.data_log.close()
+        yield {
+            "benchmark": "end_to_end",
+            "mode": mode,
+            "requested_hz": rate_hz,
+            "seconds": elapsed,
+            "samples_per_s": acquired / elapsed,
+            "logged_per_s": logged / elapsed,
+            "errors": device.errors,
+            "log_dropped": monitor.data_log.dropped
+        }
+        monitor.registry = None
+        monitor.data_log = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor benchmarks on fake hardware (JSON lines on stdout)")
+    parser.add_argument("--repeat", type=int, default=1000, help="Calls per latency benchmark")
+    parser.add_argument("--sizes", default=",".join(map(str, HISTORY_SIZES)),
+                        help="Comma separated readings in the data file")
+    parser.add_argument("--rate", type=float, default=1000, help="Requested sample rate for end-to-end runs (Hz)")
+    parser.add_argument("--seconds", type=float, default=5, help="Duration of each end-to-end run")
+    parser.add_argument("--read-delay", type=float, default=0.0,
+                        help="Seconds each fake register read takes (~0.00015 for 400 kHz I2C)")
+    parser.add_argument("--only", help="Comma separated subset: read_sensor,save_data,http,end_to_end")
+    parser.add_argument("--output", help="Also append the results to this file")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    only = set(args.only.split(",")) if args.only else None
+    output = os.path.abspath(args.output) if args.output else None
+
+    fake_hardware.install(rate_hz=max(args.rate, 1), read_delay=args.read_delay)
+    # The monitor writes its log, config and data files in the working directory
+    workdir = tempfile.mkdtemp(prefix="mpu6050-bench-")
+    os.chdir(workdir)
+    write_config()
+    import mpu6050_monitor as monitor
+    logging.disable(logging.WARNING)
+
+    run = {
+        "version": "1.0.3",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "started": time.time()
+    }
+    suites = [
+        ("read_sensor", lambda: bench_read_sensor(monitor, args.repeat)),
+        ("save_data", lambda: bench_save_data(monitor, sizes, args.repeat)),
+        ("http", lambda: bench_http(monitor, sizes, args.repeat)),
+        ("end_to_end", lambda: bench_end_to_end(monitor, args.rate, args.seconds))
+    ]
+    try:
+        for name, suite in suites:
+            if only and name not in only:
+                continue
+            for result in suite():
+                line = json.dumps(dict(run, **result))
+                print(line, flush=True)
+                if output:
+                    with open(output, "a") as f:
+                        f.write(line + "\n")
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# benchmarks/bench_recovery.py - v1.0.3
+# Time from an injected bus fault to the next good sample, with and without the watchdog
+
+import argparse
+import json
+import logging
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import fake_hardware
+
+# Scenario: (description, inject(args), fault duration(args))
+SCENARIOS = {
+    "errors": ("every read fails for --errors seconds",
+               lambda args: fake_hardware.fail_reads(args.errors), lambda args: args.errors),
+    "hang": ("one read blocks for --hang seconds",
+             lambda args: fake_hardware.hang_next_read(args.hang), lambda args: args.hang),
+    "lockup": ("reads fail until the bus is reset",
+               lambda args: fake_hardware.lock_bus(), lambda args: None)
+}
+
+
+def wait_for_sample(device, after_ns, timeout):
+    """Seconds until a sample taken after after_ns shows up, or None"""
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        latest = device.latest
+        if latest is not None and latest.t_ns > after_ns:
+            return time.perf_counter() - started
+        time.sleep(0.001)
+    return None
+
+
+def run(monitor, watchdog, scenarios, args):
+    with open("config.json", "w") as f:
+        json.dump({"data_file": "sensor_data.json", "sample_rate": 1.0 / args.rate,
+                   "sensor": {"backend": "mpu6050", "fifo": False},
+                   "watchdog": {"enabled": watchdog, "read_timeout": args.read_timeout}}, f)
+    monitor.running = True
+    thread = threading.Thread(target=monitor.sensor_thread, daemon=True)
+    thread.start()
+    while monitor.registry is None or monitor.registry.primary is None or monitor.registry.primary.latest is None:
+        time.sleep(0.01)
+    device = monitor.registry.primary
+    try:
+        for name in scenarios:
+            for repeat in range(args.repeat):
+                time.sleep(args.settle)
+                if wait_for_sample(device, time.monotonic_ns(), 1.0) is None:
+                    yield {"benchmark": "recovery", "scenario": name, "watchdog": watchdog,
+                           "repeat": repeat, "recovered": False, "note": "not sampling before the fault"}
+                    return
+                opens_before = dict(fake_hardware.faults)
+                onset_ns = time.monotonic_ns()
+                SCENARIOS[name][1](args)
+                recovery = wait_for_sample(device, onset_ns, args.timeout)
+                gaps = device.watchdog.gaps_list(onset_ns) if device.watchdog is not None else []
+                gap = gaps[-1] if gaps else None
+                yield {
+                    "benchmark": "recovery",
+                    "scenario": name,
+                    "watchdog": watchdog,
+                    "repeat": repeat,
+                    "rate_hz": args.rate,
+                    "fault_s": SCENARIOS[name][2](args),
+                    "recovered": recovery is not None,
+                    "recovery_s": recovery,
+                    "gap_s": (gap["end"] - gap["start"]) / 1e9 if gap is not None and gap["end"] else None,
+                    "gap_reason": gap["reason"] if gap is not None else None,
+                    "sensor_opens": fake_hardware.faults["sensor_opens"] - opens_before["sensor_opens"],
+                    "bus_opens": fake_hardware.faults["bus_opens"] - opens_before["bus_opens"]
+                }
+                if recovery is None:
+                    return  # The acquisition is wedged; later scenarios would measure nothing
+    finally:
+        fake_hardware.faults.update(errors_until=0.0, hang=0.0, locked=False)
+        monitor.running = False
+        thread.join(timeout=2)
+        monitor.data_log.close()
+        monitor.registry = None
+        monitor.data_log = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bus fault recovery benchmark on fake hardware (JSON lines on stdout)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="Comma separated: " + ", ".join(f"{k} ({v[0]})" for k, v in SCENARIOS.items()))
+    parser.add_argument("--errors", type=float, default=0.2, help="Seconds an error burst lasts")
+    parser.add_argument("--hang", type=float, default=3.0, help="Seconds a hung read blocks")
+    parser.add_argument("--rate", type=float, default=200, help="Sample rate (Hz)")
+    parser.add_argument("--repeat", type=int, default=3, help="Faults injected per scenario")
+    parser.add_argument("--read-timeout", type=float, default=0.5, help="Watchdog read_timeout (s)")
+    parser.add_argument("--settle", type=float, default=1.0, help="Seconds of normal sampling between faults")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Give up waiting for recovery after (s)")
+    parser.add_argument("--compare", action="store_true", help="Also run without the watchdog")
+    args = parser.parse_args()
+    scenarios = [name for name in args.scenarios.split(",") if name]
+    for name in scenarios:
+        if name not in SCENARIOS:
+            parser.error(f"Unknown scenario: {name}")
+
+    fake_hardware.install(rate_hz=args.rate)
+    workdir = tempfile.mkdtemp(prefix="mpu6050-recovery-")
+    os.chdir(workdir)
+    import mpu6050_monitor as monitor
+    logging.disable(logging.CRITICAL)
+
+    info = {"version": "1.0.3", "python": platform.python_version(), "machine": platform.machine()}
+    try:
+        for watchdog in ((True, False) if args.compare else (True,)):
+            for result in run(monitor, watchdog, scenarios, args):
+                print(json.dumps(dict(info, **result)), flush=True)
+    finally:
+        os.chdir("/")
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
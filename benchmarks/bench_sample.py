@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+# benchmarks/bench_sample.py - v1.0.3
+# Memory and allocation cost of one reading: nested dicts vs samples.Sample
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import samples
+
+
+def legacy_reading(ax, ay, az, gx, gy, gz, temp):
+    """What read_sensor() + sensor_thread() used to build for every sample"""
+    data = {
+        "acceleration": {"x": ax, "y": ay, "z": az},
+        "gyro": {"x": gx, "y": gy, "z": gz},
+        "temperature": temp
+    }
+    data_with_timestamp = data.copy()
+    data_with_timestamp["timestamp"] = datetime.now().isoformat()
+    return data_with_timestamp
+
+
+def sample_reading(ax, ay, az, gx, gy, gz, temp):
+    return samples.Sample(time.monotonic_ns(), ax, ay, az, gx, gy, gz, temp)
+
+
+def measure(name, factory, count):
+    values = [(0.1 * i, 0.2, 9.8, 0.01, 0.02, 0.03, 25.0) for i in range(count)]
+
+    # Time to build the readings
+    gc.collect()
+    start = time.perf_counter()
+    kept = [factory(*v) for v in values]
+    elapsed = time.perf_counter() - start
+    del kept
+
+    # Allocated blocks and bytes still held per reading
+    gc.collect()
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    kept = [factory(*v) for v in values]
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks_before
+    del kept
+
+    return {
+        "benchmark": "sample_representation",
+        "variant": name,
+        "count": count,
+        "ns_per_reading": elapsed / count * 1e9,
+        "bytes_per_reading": current / count,
+        "peak_bytes_per_reading": peak / count,
+        "blocks_per_reading": blocks / count
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sample representation memory/allocation benchmark")
+    parser.add_argument("--count", type=int, default=100000, help="Readings to build per variant")
+    args = parser.parse_args()
+    for name, factory in (("nested_dict", legacy_reading), ("sample_slots", sample_reading)):
+        print(json.dumps(measure(name, factory, args.count)))
+
+
+if __name__ == "__main__":
+    main()
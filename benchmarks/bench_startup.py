@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# benchmarks/bench_startup.py - v1.0.3
+# Cold start of the monitor: import time, time to the first sample and to the first HTTP response
+
+import argparse
+import http.client
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.abspath(os.path.join(BENCHMARKS, ".."))
+MONITOR = os.path.join(ROOT, "mpu6050_monitor.py")
+PORT = 5000  # the monitor's web server port
+
+# Runs the monitor as __main__ with the fake board/busio/adafruit_mpu6050 modules installed
+FAKE_HARDWARE = ("import runpy, sys; sys.path[:0] = [{root!r}, {benchmarks!r}]; import fake_hardware; "
+                 "fake_hardware.install(rate_hz={rate!r}); sys.argv = [{monitor!r}] + sys.argv[1:]; "
+                 "runpy.run_path({monitor!r}, run_name='__main__')")
+
+FIRST_SAMPLE = re.compile(r"First sample from (\S+)")
+SENSOR_OPENED = re.compile(r"MPU6050 sensor .*initialized successfully")
+WARM_START = re.compile(r"Warm start: (\d+) readings .* in ([0-9.]+) s")
+
+# One logged reading, as the data log writer formats it
+READING = ('    {{"acceleration": {{"x": 0.0, "y": 0.0, "z": 9.80665}}, "gyro": {{"x": 0.0, "y": 0.0, "z": 0.0}}, '
+           '"temperature": 25.0, "raw": {{"acceleration": {{"x": 0.0, "y": 0.0, "z": 9.80665}}, '
+           '"gyro": {{"x": 0.0, "y": 0.0, "z": 0.0}}, "temperature": 25.0}}, "timestamp": "{timestamp}"}}')
+
+
+def write_log(path, size, rate_hz):
+    """A data file of size readings logged at rate_hz up to now, the state a restart finds"""
+    now = time.time()
+    with open(path, "w") as f:
+        f.write('{\n  "readings": [\n')
+        for start in range(0, size, 10000):
+            lines = [READING.format(timestamp=datetime.fromtimestamp(now - (size - i) / rate_hz).isoformat())
+                     for i in range(start, min(size, start + 10000))]
+            f.write((",\n" if start else "") + ",\n".join(lines))
+        f.write("\n  ]\n}\n")
+
+
+def interpreter_seconds(code, cwd, repeat):
+    """Best wall time of python -c code over repeat runs"""
+    best = None
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def get_status(path):
+    """Status of one GET, or None while nothing listens"""
+    connection = http.client.HTTPConnection("127.0.0.1", PORT, timeout=2)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    except (OSError, http.client.HTTPException):
+        return None
+    finally:
+        connection.close()
+
+
+def cold_start(backend, workdir, args):
+    """Start the monitor once and time its milestones from the moment it was spawned"""
+    extra = ["--web-only", "--rate", f"{args.rate:g}"]
+    if args.acquisition_process:
+        extra.append("--acquisition-process")
+    if backend == "synthetic":
+        command = [sys.executable, MONITOR, "--simulate"] + extra
+    else:
+        code = FAKE_HARDWARE.format(root=ROOT, benchmarks=BENCHMARKS, rate=args.rate, monitor=MONITOR)
+        command = [sys.executable, "-c", code] + extra
+
+    marks = {"first_sample_s": None, "sensor_opens": 0, "warm_start_readings": None, "warm_start_s": None}
+    started = time.perf_counter()
+    process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               text=True)
+
+    def watch_log():
+        # The monitor also logs to stderr; a line arrives within milliseconds of being logged
+        for line in process.stderr:
+            if marks["first_sample_s"] is None and FIRST_SAMPLE.search(line):
+                marks["first_sample_s"] = time.perf_counter() - started
+            if SENSOR_OPENED.search(line):
+                marks["sensor_opens"] += 1
+            match = WARM_START.search(line)
+            if match:
+                marks["warm_start_readings"] = int(match.group(1))
+                marks["warm_start_s"] = float(match.group(2))
+
+    reader = threading.Thread(target=watch_log, daemon=True)
+    reader.start()
+    first_response = None
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline and process.poll() is None:
+            if first_response is None and get_status("/data") == 200:
+                first_response = time.perf_counter() - started
+            if first_response is not None and marks["first_sample_s"] is not None:
+                break
+            time.sleep(0.005)
+        time.sleep(0.5)  # Late sensor open messages
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        reader.join(timeout=2)
+    return {
+        "benchmark": "cold_start",
+        "backend": backend,
+        "acquisition_process": args.acquisition_process,
+        "first_response_s": first_response,
+        "first_sample_s": marks["first_sample_s"],
+        "sensor_opens": marks["sensor_opens"],
+        "warm_start_readings": marks["warm_start_readings"],
+        "warm_start_s": marks["warm_start_s"],
+        "exit_code": process.returncode
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monitor start-up benchmark (JSON lines on stdout)")
+    parser.add_argument("--backends", default="fake,synthetic",
+                        help="Comma separated: fake (hardware code path on fake_hardware), synthetic (--simulate)")
+    parser.add_argument("--repeat", type=int, default=5, help="Starts per backend")
+    parser.add_argument("--rate", type=float, default=100, help="Sample rate of the monitor (Hz)")
+    parser.add_argument("--acquisition-process", action="store_true",
+                        help="Start the monitor with --acquisition-process")
+    parser.add_argument("--log-sizes", default="0",
+                        help="Comma separated readings in the data file found at start (e.g. 0,100000,1000000), "
+                             "logged at --rate up to the moment of the start")
+    parser.add_argument("--timeout", type=float, default=30, help="Give up on a start after (s)")
+    parser.add_argument("--output", help="Also append the results to this file")
+    args = parser.parse_args()
+    backends = [name for name in args.backends.split(",") if name]
+    for name in backends:
+        if name not in ("fake", "synthetic"):
+            parser.error(f"Unknown backend: {name}")
+    log_sizes = [int(size) for size in args.log_sizes.split(",") if size]
+    output = os.path.abspath(args.output) if args.output else None
+
+    run = {
+        "version": "1.0.3",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "started": time.time()
+    }
+    workdir = tempfile.mkdtemp(prefix="mpu6050-startup-")
+
+    def emit(result):
+        line = json.dumps(dict(run, **result))
+        print(line, flush=True)
+        if output:
+            with open(output, "a") as f:
+                f.write(line + "\n")
+
+    try:
+        interpreter = interpreter_seconds("pass", workdir, args.repeat)
+        emit({
+            "benchmark": "import",
+            "interpreter_s": interpreter,
+            # Best of --repeat, without the interpreter's own start-up
+            "import_s": interpreter_seconds("import mpu6050_monitor", workdir, args.repeat) - interpreter
+        })
+        data_file = os.path.join(workdir, "sensor_data.json")
+        for size in log_sizes:
+            for backend in backends:
+                for repeat in range(args.repeat):
+                    write_log(data_file, size, args.rate)
+                    log_bytes = os.path.getsize(data_file)
+                    emit(dict(cold_start(backend, workdir, args), log_readings=size, log_bytes=log_bytes,
+                              repeat=repeat))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/fake_hardware.py - v1.0.3
+# Stand-in board, busio and adafruit_mpu6050 modules so the hardware code path runs without a Pi,
+# with injectable bus faults
+
+import os
+import sys
+import time
+import types
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import synthetic_sensor
+
+# Settings of the installed fake, see install()
+settings = {
+    "rate_hz": 1000,     # output data rate of the simulated sensor
+    "read_delay": 0.0,   # seconds each register read takes (400 kHz I2C: ~0.00015)
+    "signals": {}        # synthetic_sensor signal overrides
+}
+
+# Injected faults, see fail_reads(), hang_next_read() and lock_bus()
+faults = {
+    "errors_until": 0.0,  # time.monotonic() until which every read fails
+    "hang": 0.0,          # seconds the next read blocks
+    "locked": False,      # every read fails until the bus is opened again
+    "bus_opens": 0,
+    "sensor_opens": 0
+}
+
+
+def fail_reads(seconds):
+    """Make every register read raise a remote I/O error for the next seconds"""
+    faults["errors_until"] = time.monotonic() + seconds
+
+
+def hang_next_read(seconds):
+    """Make the next register read block for seconds, like a slave holding SCL low"""
+    faults["hang"] = seconds
+
+
+def lock_bus():
+    """Make reads fail until busio.I2C is created again (only a bus reset helps)"""
+    faults["locked"] = True
+
+
+class FakeI2C:
+    """busio.I2C look-alike; only remembers its pins"""
+
+    def __init__(self, scl, sda, frequency=400000):
+        self.scl = scl
+        self.sda = sda
+        self.frequency = frequency
+        faults["bus_opens"] += 1
+        faults["locked"] = False
+
+    def deinit(self):
+        pass
+
+
+class FakeMPU6050:
+    """adafruit_mpu6050.MPU6050 look-alike backed by a synthetic sensor.
+
+    Like the real driver it only offers acceleration, gyro and temperature,
+    each a separate register read taking read_delay seconds, and no FIFO.
+    """
+
+    def __init__(self, i2c_bus, address=0x68):
+        if faults["locked"] or time.monotonic() < faults["errors_until"]:
+            raise OSError(121, "Remote I/O error")  # The real driver talks to the chip here
+        self.i2c = i2c_bus
+        self.address = address
+        self.sensor = synthetic_sensor.SyntheticMPU6050(settings["signals"], rate_hz=settings["rate_hz"])
+        self.read_delay = settings["read_delay"]
+        self.reads = 0
+        faults["sensor_opens"] += 1
+
+    def _read(self, index):
+        self.reads += 1
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        if faults["hang"]:
+            hang, faults["hang"] = faults["hang"], 0.0
+            time.sleep(hang)
+        if faults["locked"] or time.monotonic() < faults["errors_until"]:
+            raise OSError(121, "Remote I/O error")
+        return self.sensor._current()[index]
+
+    @property
+    def acceleration(self):
+        return self._read(0)
+
+    @property
+    def gyro(self):
+        return self._read(1)
+
+    @property
+    def temperature(self):
+        return self._read(2)
+
+
+def install(rate_hz=None, read_delay=None, signals=None):
+    """Register fake board, busio and adafruit_mpu6050 modules in sys.modules.
+
+    Call before the monitor opens its bus; devices.HardwareBus imports the
+    modules lazily and gets the fakes.
+    """
+    if rate_hz is not None:
+        settings["rate_hz"] = rate_hz
+    if read_delay is not None:
+        settings["read_delay"] = read_delay
+    if signals is not None:
+        settings["signals"] = signals
+
+    board = types.ModuleType("board")
+    board.SCL = "SCL"
+    board.SDA = "SDA"
+    busio = types.ModuleType("busio")
+    busio.I2C = FakeI2C
+    adafruit_mpu6050 = types.ModuleType("adafruit_mpu6050")
+    adafruit_mpu6050.MPU6050 = FakeMPU6050
+    sys.modules.update(board=board, busio=busio, adafruit_mpu6050=adafruit_mpu6050)
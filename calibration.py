@@ -0,0 +1,316 @@
+# calibration.py - v1.0.3
+# Accelerometer ellipsoid / gyro bias calibration fitted in background jobs
+
+import itertools
+import threading
+import time
+
+import numpy as np
+
+import samples
+
+GRAVITY = 9.80665
+
+# A window counts as a resting position when the sensor barely rotates and
+# the acceleration is steady; positions closer than POSITION_ANGLE are merged
+WINDOW_S = 0.5
+STILL_GYRO = 0.05           # rad/s, mean gyro magnitude
+STILL_ACCEL_STD = 0.2       # m/s², acceleration standard deviation
+POSITION_ANGLE = 20.0       # degrees
+
+MODES = {
+    "ellipsoid": 60.0,      # default duration: rest in 6 (or 9+) orientations
+    "level": 5.0            # rest level with z up
+}
+
+
+def parameters(calibration):
+    """Calibration dict as NumPy parameters of
+
+        accel = accel_matrix @ (raw - accel_offset - sum_k accel_temp[k] * dT^(k+1))
+        gyro = gyro_matrix @ (raw - gyro_bias - sum_k gyro_temp[k] * dT^(k+1))
+
+    with dT = temperature - temperature_reference. Offsets-only calibrations
+    from earlier versions (accel = raw + x/y/z_offset) are converted.
+    """
+    result = {
+        "accel_matrix": np.eye(3),
+        "accel_offset": np.zeros(3),
+        "gyro_matrix": np.eye(3),
+        "gyro_bias": np.zeros(3),
+        "temperature_reference": 25.0,
+        "accel_temp": np.zeros((0, 3)),
+        "gyro_temp": np.zeros((0, 3))
+    }
+    if not calibration.get("calibrated"):
+        return result
+    if "accel_matrix" not in calibration:
+        result["accel_offset"] = -np.array([calibration["x_offset"], calibration["y_offset"],
+                                            calibration["z_offset"]], dtype=np.float64)
+        return result
+    for key in ("accel_matrix", "accel_offset", "gyro_matrix", "gyro_bias"):
+        if key in calibration:
+            result[key] = np.array(calibration[key], dtype=np.float64)
+    for key in ("accel_temp", "gyro_temp"):
+        if calibration.get(key):
+            result[key] = np.array(calibration[key], dtype=np.float64).reshape(-1, 3)
+    result["temperature_reference"] = float(calibration.get("temperature_reference", 25.0))
+    return result
+
+
+def calibration_dict(params):
+    """Calibration section for config.json; x/y/z_offset mirror the offset for older readers"""
+    offset = params["accel_offset"]
+    return {
+        "x_offset": float(-offset[0]),
+        "y_offset": float(-offset[1]),
+        "z_offset": float(-offset[2]),
+        "calibrated": True,
+        "accel_matrix": params["accel_matrix"].tolist(),
+        "accel_offset": offset.tolist(),
+        "gyro_matrix": params["gyro_matrix"].tolist(),
+        "gyro_bias": params["gyro_bias"].tolist(),
+        "temperature_reference": params["temperature_reference"],
+        "accel_temp": params["accel_temp"].tolist(),
+        "gyro_temp": params["gyro_temp"].tolist()
+    }
+
+
+class Transform:
+    """A calibration precomputed as one affine map of raw (n, 7) sample rows.
+
+    Rows are (ax, ay, az, gx, gy, gz, temp). Matrices, offsets and the
+    temperature polynomial are folded into a (7, 7) linear part, a constant
+    row and one row per temperature power, so a batch is calibrated with a
+    single matrix product (plus one more when temperature terms are set).
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        p = parameters(settings)
+        m, g = p["accel_matrix"], p["gyro_matrix"]
+        self.linear = np.zeros((7, 7))
+        self.linear[0:3, 0:3] = m.T
+        self.linear[3:6, 3:6] = g.T
+        self.linear[6, 6] = 1.0
+        self.constant = np.concatenate((-m @ p["accel_offset"], -g @ p["gyro_bias"], [0.0]))
+        powers = max(len(p["accel_temp"]), len(p["gyro_temp"]))
+        self.temperature = np.zeros((powers, 7))
+        self.temperature[:len(p["accel_temp"]), 0:3] = -p["accel_temp"] @ m.T
+        self.temperature[:len(p["gyro_temp"]), 3:6] = -p["gyro_temp"] @ g.T
+        self.reference = p["temperature_reference"]
+        self.identity = not settings.get("calibrated")
+
+    def apply(self, raw):
+        """Calibrated copy of a raw (n, 7) array"""
+        if self.identity:
+            return raw.copy()
+        calibrated = raw @ self.linear + self.constant
+        if len(self.temperature):
+            dt = raw[:, 6:7] - self.reference
+            calibrated += (dt ** np.arange(1, len(self.temperature) + 1)) @ self.temperature
+        return calibrated
+
+    def samples(self, times, raw):
+        """Samples from monotonic ns times and raw value rows, calibrated as one batch"""
+        if not raw:
+            return []
+        calibrated = self.apply(np.array(raw, dtype=np.float64)).tolist()
+        return [samples.Sample(t_ns, *values, raw=row) for t_ns, values, row in zip(times, calibrated, raw)]
+
+
+def replay(history, settings):
+    """New Samples recalibrated from the raw values the given ones carry, in the same order.
+
+    Samples without raw values are passed through as they are. The given
+    Samples are left alone: snapshots, captures and API responses may
+    still hold them.
+    """
+    kept = [sample for sample in history if sample.raw is not None]
+    if not kept:
+        return list(history)
+    calibrated = iter(Transform(settings).apply(np.array([sample.raw for sample in kept])).tolist())
+    result = []
+    for sample in history:
+        if sample.raw is None:
+            result.append(sample)
+            continue
+        ax, ay, az, gx, gy, gz, _ = next(calibrated)
+        result.append(samples.Sample(sample.t_ns, ax, ay, az, gx, gy, gz, sample.temp,
+                                     device=sample.device, q=sample.q, raw=sample.raw))
+    return result
+
+
+def still_windows(t_ns, values, window_s=WINDOW_S):
+    """Mean accel and gyro of every WINDOW_S window in which the sensor was at rest"""
+    ids = (t_ns - t_ns[0]) // int(window_s * 1e9)
+    starts = np.flatnonzero(np.r_[True, np.diff(ids) != 0])
+    counts = np.diff(np.r_[starts, len(ids)])[:, None]
+    accel = values[:, 0:3]
+    gyro = values[:, 3:6]
+    accel_mean = np.add.reduceat(accel, starts) / counts
+    accel_var = np.add.reduceat(accel ** 2, starts) / counts - accel_mean ** 2
+    gyro_mean = np.add.reduceat(gyro, starts) / counts
+    gyro_speed = np.add.reduceat(np.linalg.norm(gyro, axis=1), starts) / counts[:, 0]
+    still = ((gyro_speed < STILL_GYRO)
+             & (np.sqrt(np.maximum(accel_var, 0).sum(axis=1)) < STILL_ACCEL_STD)
+             & (counts[:, 0] >= 3))
+    return accel_mean[still], gyro_mean[still]
+
+
+def positions(accel_means, angle=POSITION_ANGLE):
+    """Merge resting windows pointing the same way into one averaged position each"""
+    limit = np.cos(np.radians(angle))
+    units = accel_means / np.linalg.norm(accel_means, axis=1, keepdims=True)
+    centers = []
+    members = []
+    for index, unit in enumerate(units):
+        if centers:
+            similarity = np.array(centers) @ unit
+            best = int(np.argmax(similarity))
+            if similarity[best] > limit:
+                members[best].append(index)
+                continue
+        centers.append(unit)
+        members.append([index])
+    return np.array([accel_means[group].mean(axis=0) for group in members])
+
+
+def fit_ellipsoid(points, gravity=GRAVITY):
+    """Fit accel = M @ (raw - offset) so that |accel| == gravity at every point.
+
+    Nine or more positions determine the full symmetric 3x3 matrix
+    (scale and cross-axis terms); six to eight only the per-axis scales.
+    Returns (matrix, offset, rms residual in m/s²).
+    """
+    n = len(points)
+    x, y, z = points.T
+    if n >= 9:
+        design = np.column_stack((x * x, y * y, z * z, 2 * x * y, 2 * x * z, 2 * y * z, 2 * x, 2 * y, 2 * z))
+    elif n >= 6:
+        design = np.column_stack((x * x, y * y, z * z, 2 * x, 2 * y, 2 * z))
+    else:
+        raise ValueError(f"Need at least 6 distinct resting positions, got {n}")
+    v = np.linalg.lstsq(design, np.ones(n), rcond=None)[0]
+    if n >= 9:
+        quadric = np.array([[v[0], v[3], v[4]], [v[3], v[1], v[5]], [v[4], v[5], v[2]]])
+        linear = v[6:9]
+    else:
+        quadric = np.diag(v[0:3])
+        linear = v[3:6]
+
+    # (p - c)^T A (p - c) = 1 + c^T A c with c = -A^-1 b
+    center = -np.linalg.solve(quadric, linear)
+    quadric = quadric / (1 + center @ quadric @ center)
+    eigenvalues, eigenvectors = np.linalg.eigh(quadric)
+    if np.any(eigenvalues <= 0):
+        raise ValueError("Resting positions do not determine an ellipsoid")
+    matrix = gravity * eigenvectors @ np.diag(np.sqrt(eigenvalues)) @ eigenvectors.T
+    residual = np.linalg.norm((points - center) @ matrix.T, axis=1) - gravity
+    return matrix, center, float(np.sqrt(np.mean(residual ** 2)))
+
+
+def compose(base, matrix, offset, gyro_bias):
+    """Calibration whose output equals applying base and then (matrix, offset, gyro_bias)"""
+    params = parameters(base)
+    m1, g1 = params["accel_matrix"], params["gyro_matrix"]
+    # matrix @ (m1 @ (raw - o1 - ...) - offset) == matrix @ m1 @ (raw - o1 - m1^-1 offset - ...)
+    params["accel_offset"] = params["accel_offset"] + np.linalg.solve(m1, offset)
+    params["accel_matrix"] = matrix @ m1
+    params["gyro_bias"] = params["gyro_bias"] + np.linalg.solve(g1, gyro_bias)
+    return calibration_dict(params)
+
+
+class CalibrationJob:
+    """Collects samples of one device for a while, then fits a new calibration.
+
+    feed() is called with every analysed batch (already calibrated with
+    base), so the fit is a correction on top of base that compose() folds
+    into a single transform. The job runs in its own thread and never
+    touches the acquisition loop.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, device, mode="ellipsoid", duration=None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown calibration mode: {mode}")
+        self.id = str(next(self._ids))
+        self.device = device
+        self.mode = mode
+        self.duration = float(duration or MODES[mode])
+        self.base = device.calibration
+        self.state = "collecting"
+        self.created = time.time()
+        self.error = None
+        self.result = None
+        self.result_info = {}
+        self.samples = 0
+        self.elapsed = 0.0  # seconds of samples collected
+        self._chunks = []
+        self._first_ns = None
+        self._collected = threading.Event()
+
+    def feed(self, t_ns, values):
+        if self._collected.is_set() or len(t_ns) == 0:
+            return
+        if self._first_ns is None:
+            self._first_ns = int(t_ns[0])
+        self._chunks.append((t_ns, values))
+        self.samples += len(t_ns)
+        self.elapsed = (int(t_ns[-1]) - self._first_ns) / 1e9
+        if self.elapsed >= self.duration:
+            self._collected.set()
+
+    def run(self):
+        """Wait for the samples, fit, and store the result (called in a background thread)"""
+        if not self._collected.wait(self.duration * 2 + 5):
+            self._collected.set()
+            self.fail("Not enough samples received")
+            return
+        self.state = "fitting"
+        try:
+            if self.device.calibration is not self.base:
+                raise ValueError("Calibration changed while collecting")
+            t_ns = np.concatenate([chunk[0] for chunk in self._chunks])
+            values = np.concatenate([chunk[1] for chunk in self._chunks])
+            self._chunks = []
+            accel_means, gyro_means = still_windows(t_ns, values)
+            if not len(accel_means):
+                raise ValueError("The sensor never rested; keep it still in each position")
+            gyro_bias = gyro_means.mean(axis=0)
+            if self.mode == "level":
+                # Resting level: gravity on +z only
+                offset = accel_means.mean(axis=0) - np.array([0.0, 0.0, GRAVITY])
+                matrix, residual, found = np.eye(3), None, 1
+            else:
+                points = positions(accel_means)
+                found = len(points)
+                matrix, offset, residual = fit_ellipsoid(points)
+            self.result = compose(self.base, matrix, offset, gyro_bias)
+            self.result_info = {"positions": found, "residual": residual}
+            self.state = "done"
+        except (ValueError, np.linalg.LinAlgError) as e:
+            self.fail(str(e))
+
+    def fail(self, message):
+        self.error = message
+        self.state = "failed"
+
+    def describe(self):
+        info = {
+            "id": self.id,
+            "device": self.device.id,
+            "mode": self.mode,
+            "state": self.state,
+            "created": self.created,
+            "duration": self.duration,
+            "elapsed": min(self.elapsed, self.duration),
+            "samples": self.samples
+        }
+        if self.error:
+            info["error"] = self.error
+        if self.result:
+            info["calibration"] = self.result
+            info.update(self.result_info)
+        return info
@@ -0,0 +1,100 @@
+# capture.py - v1.0.3
+# Pre/post-trigger capture of full-rate samples around detected events
+
+import numpy as np
+
+# Default capture configuration, overridden by config["capture"]
+DEFAULT_CAPTURE = {
+    "enabled": True,
+    "directory": "captures",
+    "triggers": ["shock", "free_fall"],  # event types that start a capture
+    "pre_ms": 200,
+    "post_ms": 300,
+    "buffer_samples": 16384,      # pre-trigger ring size; must cover pre_ms + event + post_ms
+    "max_captures": 100           # oldest capture files are removed beyond this
+}
+
+
+class CaptureBuffer:
+    """Ring of the most recent full-rate samples plus the captures waiting for their post-trigger part.
+
+    add() copies every batch, processed values and the uncalibrated
+    readings they came from, into fixed-size NumPy rings. trigger() opens a
+    capture spanning pre_ms before the event start to post_ms after its end
+    (events whose windows overlap share one capture), and collect() returns
+    the captures whose window has fully arrived, cut out of the ring.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_CAPTURE, **(settings or {}))
+        self.capacity = int(settings["buffer_samples"])
+        self.pre_ns = int(settings["pre_ms"] * 1e6)
+        self.post_ns = int(settings["post_ms"] * 1e6)
+        self.triggers = set(settings["triggers"])
+        self.directory = settings["directory"]
+        self.max_captures = settings["max_captures"]
+        self.t_ns = np.zeros(self.capacity, dtype=np.int64)
+        self.values = np.zeros((self.capacity, 7))
+        self.raw = np.full((self.capacity, 7), np.nan)  # NaN rows: raw reading not known
+        self.head = 0  # samples written so far
+        self.pending = []  # [{"events", "from", "to"}], oldest first
+
+    def add(self, t_ns, values, raw=None):
+        """Append a batch given as t_ns (n,), values (n, 7) and optionally the raw rows (n, 7)"""
+        n = len(t_ns)
+        if n > self.capacity:
+            t_ns, values = t_ns[-self.capacity:], values[-self.capacity:]
+            raw = raw[-self.capacity:] if raw is not None else None
+            self.head += n - self.capacity
+            n = self.capacity
+        slots = (self.head + np.arange(n)) % self.capacity
+        self.t_ns[slots] = t_ns
+        self.values[slots] = values
+        self.raw[slots] = raw if raw is not None else np.nan
+        self.head += n
+
+    def trigger(self, event):
+        """Start (or extend) a capture around an event; ignored for non-trigger types"""
+        if event["type"] not in self.triggers:
+            return
+        start = event["start"] - self.pre_ns
+        end = (event["end"] if event["end"] is not None else event["start"]) + self.post_ns
+        if self.pending and start <= self.pending[-1]["to"]:
+            self.pending[-1]["events"].append(event)
+            self.pending[-1]["to"] = max(self.pending[-1]["to"], end)
+        else:
+            self.pending.append({"events": [event], "from": start, "to": end})
+
+    def collect(self):
+        """Captures whose post-trigger window is complete:
+        [{"events", "from", "to", "truncated", "t_ns", "values", "raw"}]
+        """
+        if not self.pending or not self.head:
+            return []
+        latest = self.t_ns[(self.head - 1) % self.capacity]
+        ready = [capture for capture in self.pending if capture["to"] <= latest]
+        if not ready:
+            return []
+        self.pending = [capture for capture in self.pending if capture["to"] > latest]
+
+        count = min(self.head, self.capacity)
+        order = (self.head - count + np.arange(count)) % self.capacity
+        t_ns = self.t_ns[order]
+        values = self.values[order]
+        raw = self.raw[order]
+        for capture in ready:
+            first = np.searchsorted(t_ns, capture["from"], side="left")
+            stop = np.searchsorted(t_ns, capture["to"], side="right")
+            capture["truncated"] = bool(t_ns[0] > capture["from"])
+            capture["t_ns"] = t_ns[first:stop]
+            capture["values"] = values[first:stop]
+            capture["raw"] = raw[first:stop]
+        return ready
+
+
+def create_capture(settings):
+    """Build the capture buffer described by config["capture"], or None if disabled"""
+    settings = dict(DEFAULT_CAPTURE, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return CaptureBuffer(settings)
@@ -0,0 +1,133 @@
+# console.py - v1.0.3
+# Flicker-free terminal rendering: only the parts of a frame that changed are rewritten
+
+import os
+import select
+import shutil
+import sys
+import time
+
+# Default console configuration, overridden by config["console"]
+DEFAULT_CONSOLE = {
+    "fps": 10,  # frames per second, independent of the sample rate
+    "redraw_interval": 5.0  # seconds between full repaints (wipes stray output such as log lines)
+}
+
+HIDE_CURSOR = "\x1b[?25l"
+SHOW_CURSOR = "\x1b[?25h"
+CLEAR_SCREEN = "\x1b[2J"
+CLEAR_TO_END = "\x1b[K"
+CLEAR_LINE = "\x1b[2K"
+
+
+def move(row, column):
+    """Cursor addressing escape (0-based row and column)"""
+    return f"\x1b[{row + 1};{column + 1}H"
+
+
+class Renderer:
+    """Draws frames (lists of lines) by rewriting only what differs from the last one.
+
+    For every changed line the common prefix and suffix with the previous
+    frame are skipped, so a changing number costs a cursor move plus the
+    few characters that changed. The whole update goes out in one write.
+    Every redraw_interval seconds the screen is cleared and repainted in
+    full, in case something else wrote to the terminal.
+    """
+
+    def __init__(self, stream=None, redraw_interval=DEFAULT_CONSOLE["redraw_interval"]):
+        self.stream = stream or sys.stdout
+        self.redraw_interval = redraw_interval
+        self.previous = []
+        self.next_redraw = 0.0
+        self.frames = 0
+        self.bytes_written = 0
+
+    def _write(self, data):
+        self.stream.write(data)
+        self.stream.flush()
+        self.bytes_written += len(data)
+
+    def start(self):
+        """Clear the screen once and hide the cursor"""
+        self.previous = []
+        self._write(HIDE_CURSOR + CLEAR_SCREEN + move(0, 0))
+
+    def draw(self, lines):
+        """Bring the screen from the previous frame to lines.
+
+        Lines are cut at the terminal width: a line that wrapped would push
+        the rows below it down and the cursor moves would land on the wrong row.
+        """
+        columns = shutil.get_terminal_size().columns
+        lines = [line[:columns] for line in lines]
+        parts = []
+        now = time.monotonic()
+        if self.redraw_interval and now >= self.next_redraw:
+            parts.append(CLEAR_SCREEN)
+            self.previous = []
+            self.next_redraw = now + self.redraw_interval
+        for row, line in enumerate(lines):
+            old = self.previous[row] if row < len(self.previous) else ""
+            if line == old:
+                continue
+            start = len(os.path.commonprefix((old, line)))
+            if len(old) == len(line):
+                end = len(line) - len(os.path.commonprefix((old[::-1], line[::-1])))
+                parts.append(move(row, start) + line[start:max(start, end)])
+            else:
+                parts.append(move(row, start) + line[start:])
+                if len(old) > len(line):
+                    parts.append(CLEAR_TO_END)
+        for row in range(len(lines), len(self.previous)):
+            parts.append(move(row, 0) + CLEAR_LINE)
+        self.previous = list(lines)
+        self.frames += 1
+        if parts:
+            self._write("".join(parts))
+
+    def stop(self):
+        """Leave the cursor below the last frame and show it again"""
+        self._write(move(len(self.previous), 0) + SHOW_CURSOR)
+
+
+class KeyInput:
+    """Single key presses from stdin without Enter or echo (when stdin is a terminal)"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdin
+        self.saved = None
+        self.closed = False  # stdin reached end of file (e.g. /dev/null)
+
+    def __enter__(self):
+        if self.stream.isatty():
+            import termios
+            import tty
+            fd = self.stream.fileno()
+            self.saved = termios.tcgetattr(fd)
+            tty.setcbreak(fd)
+        return self
+
+    def __exit__(self, *exc):
+        if self.saved is not None:
+            import termios
+            termios.tcsetattr(self.stream.fileno(), termios.TCSADRAIN, self.saved)
+            self.saved = None
+
+    def read(self, timeout):
+        """Next key, or None if nothing was pressed within timeout seconds"""
+        if self.closed:
+            time.sleep(timeout)
+            return None
+        try:
+            ready, _, _ = select.select([self.stream], [], [], timeout)
+        except (OSError, ValueError):
+            self.closed = True
+            return None
+        if not ready:
+            return None
+        key = self.stream.read(1)
+        if not key:
+            self.closed = True
+            return None
+        return key
@@ -0,0 +1,205 @@
+# datalog.py - v1.0.3
+# Append-only JSON data log written in batches by a background thread
+
+import json
+import os
+import queue
+import threading
+import time
+
+import profiling
+
+# Default data log configuration, overridden by config["data_log"]
+DEFAULT_DATA_LOG = {
+    "flush_interval": 0.5,  # seconds between writes of queued readings
+    "max_pending": 1000     # queued batches; further batches are dropped and counted
+}
+
+HEADER = '{\n  "readings": [\n'
+CLOSING = "\n  ]\n}\n"
+TAIL_BYTES = 4096
+
+
+def insert_position(f):
+    """(offset, empty) where new readings go in an open {"readings": [...]} file, or None.
+
+    Only the last few KiB are looked at: the file must end with the closing
+    "]" and "}" of the readings array, preceded by "[" (no readings yet) or
+    by the "}" of the last reading.
+    """
+    f.seek(0, os.SEEK_END)
+    size = f.tell()
+    block = min(size, TAIL_BYTES)
+    f.seek(size - block)
+    tail = f.read(block).rstrip()
+    if not tail.endswith(b"}"):
+        return None
+    tail = tail[:-1].rstrip()
+    if not tail.endswith(b"]"):
+        return None
+    tail = tail[:-1].rstrip()
+    if not tail.endswith((b"[", b"}")):
+        return None
+    return size - block + len(tail), tail.endswith(b"[")
+
+
+def salvage(content):
+    """Readings that can still be decoded from a damaged (e.g. half-written) log"""
+    decoder = json.JSONDecoder()
+    key = content.find('"readings"')
+    pos = content.find("[", key) + 1 if key >= 0 else 0
+    readings = []
+    while pos:
+        while pos < len(content) and content[pos] in " \t\r\n,":
+            pos += 1
+        try:
+            reading, pos = decoder.raw_decode(content, pos)
+        except json.JSONDecodeError:
+            break
+        if not isinstance(reading, dict):
+            break
+        readings.append(reading)
+    return readings
+
+
+def encode(readings):
+    """Readings as log lines, one compact JSON object per line"""
+    return ",\n".join("    " + json.dumps(reading) for reading in readings)
+
+
+def append_readings(path, readings):
+    """Append readings to the log at path; returns the number of bytes written.
+
+    The cost depends on the number of new readings only: the file is never
+    read back in full, new lines overwrite the closing brackets at the end.
+    A missing or empty file is created, a damaged one is rewritten with the
+    readings that could be recovered.
+    """
+    if not readings:
+        return 0
+    lines = encode(readings)
+    try:
+        f = open(path, "r+b")
+    except FileNotFoundError:
+        f = open(path, "w+b")
+    with f:
+        position = insert_position(f)
+        if position is None:
+            f.seek(0)
+            content = f.read().decode("utf-8", errors="replace")
+            recovered = salvage(content) if content.strip() else []
+            data = HEADER + encode(recovered) + (",\n" if recovered else "") + lines + CLOSING
+            f.seek(0)
+        else:
+            offset, empty = position
+            data = ("\n" if empty else ",\n") + lines + CLOSING
+            f.seek(offset)
+        encoded = data.encode("utf-8")
+        f.write(encoded)
+        f.truncate()
+    return len(encoded)
+
+
+class DataLog:
+    """Background writer of the data log.
+
+    Acquisition threads hand over whole batches of Samples with write(),
+    which only enqueues them. The writer thread wakes up every
+    flush_interval, turns everything queued into log lines and appends them
+    with a single write, so file I/O never runs on the sensor thread.
+    """
+
+    def __init__(self, path, settings=None, lock=None, latency=None):
+        settings = dict(DEFAULT_DATA_LOG, **(settings or {}))
+        self.path = path
+        self.flush_interval = settings["flush_interval"]
+        self.lock = lock or threading.Lock()  # held while the file is being changed
+        self.pending = queue.Queue(maxsize=settings["max_pending"])
+        self.batches = 0
+        self.readings = 0
+        self.bytes_written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_latency = 0.0  # seconds spent on the last write
+        self.latency = latency  # optional histogram observing every write
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="data-log", daemon=True)
+        self._thread.start()
+
+    def write(self, batch, device_id=None):
+        """Queue Samples for the log (tagged with device_id when given)"""
+        if not batch:
+            return
+        try:
+            self.pending.put_nowait((batch, device_id))
+        except queue.Full:
+            self.dropped += len(batch)
+
+    def mark(self, entry):
+        """Queue a non-reading entry (e.g. a gap marker), written in order with the readings"""
+        try:
+            self.pending.put_nowait((entry, None))
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Write everything queued so far"""
+        readings = []
+        while True:
+            try:
+                batch, device_id = self.pending.get_nowait()
+            except queue.Empty:
+                break
+            if isinstance(batch, dict):
+                readings.append(batch)
+                continue
+            for sample in batch:
+                item = sample.to_dict(orientation=False, raw=True)
+                if device_id is not None:
+                    item["device"] = device_id
+                readings.append(item)
+        if not readings:
+            return
+        started = time.perf_counter()
+        try:
+            with self.lock:
+                self.bytes_written += append_readings(self.path, readings)
+            self.batches += 1
+            self.readings += len(readings)
+        except OSError as e:
+            self.errors += 1
+            self.last_error = str(e)
+            self.dropped += len(readings)
+            raise
+        finally:
+            self.last_latency = time.perf_counter() - started
+            if self.latency is not None:
+                self.latency.observe(self.last_latency)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            profiling.checkpoint()
+            try:
+                self.flush()
+            except OSError:
+                pass  # Counted in errors; try again with the next batch
+
+    def close(self):
+        """Stop the writer thread after writing what is still queued"""
+        self._stop.set()
+        self._thread.join()
+        self.flush()
+
+    def describe(self):
+        return {
+            "file": self.path,
+            "batches": self.batches,
+            "readings": self.readings,
+            "bytes_written": self.bytes_written,
+            "pending": self.pending.qsize(),
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_latency": self.last_latency
+        }
@@ -0,0 +1,293 @@
+# devices.py - v1.0.3
+# Device registry, I2C buses and timestamp alignment for multi-sensor rigs
+
+import bisect
+import collections
+
+import snapshot
+import synthetic_sensor
+
+DEFAULT_ADDRESS = 0x68
+MUX_ADDRESS = 0x70  # TCA9548A default
+HISTORY_SIZE = 1000  # samples kept per device for the merged timeline
+
+UNCALIBRATED = {
+    "x_offset": 0,
+    "y_offset": 0,
+    "z_offset": 0,
+    "calibrated": False
+}
+
+
+def parse_address(value):
+    """Accept I2C addresses as ints or strings like "0x69" """
+    if isinstance(value, str):
+        return int(value, 0)
+    return int(value)
+
+
+def device_configs(config):
+    """Return the configured devices, defaulting to a single sensor at 0x68.
+
+    The first device falls back to the top level "calibration" section so
+    single-sensor config files keep working unchanged.
+    """
+    entries = config.get("devices") or [{"id": "mpu0"}]
+    result = []
+    seen = set()
+    for index, entry in enumerate(entries):
+        device_id = str(entry.get("id", f"mpu{index}"))
+        if device_id in seen:
+            raise ValueError(f"Duplicate device id: {device_id}")
+        seen.add(device_id)
+        fallback = config["calibration"] if index == 0 else UNCALIBRATED
+        result.append({
+            "device_id": device_id,
+            "address": parse_address(entry.get("address", DEFAULT_ADDRESS)),
+            "channel": entry.get("channel"),
+            "mux_address": parse_address(entry.get("mux_address", MUX_ADDRESS)),
+            "calibration": dict(entry.get("calibration") or fallback),
+            "synthetic": entry.get("synthetic", {})
+        })
+    return result
+
+
+class HardwareBus:
+    """The Pi's I2C bus, with optional TCA9548A multiplexers in front of sensors.
+
+    board, busio and the sensor drivers are imported when the bus is opened,
+    not at module import, so everything else loads quickly and off the Pi.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def __init__(self):
+        import board
+        import busio
+        self.i2c = busio.I2C(board.SCL, board.SDA)
+        self.muxes = {}
+
+    def reset(self):
+        """Release the I2C peripheral and open it again (drivers must be reopened)"""
+        import board
+        import busio
+        deinit = getattr(self.i2c, "deinit", None)
+        if deinit is not None:
+            try:
+                deinit()
+            except Exception:
+                pass  # A wedged bus may fail to release; open a fresh one anyway
+        self.i2c = busio.I2C(board.SCL, board.SDA)
+        self.muxes = {}
+
+    def open(self, address, channel=None, mux_address=MUX_ADDRESS, signals=None):
+        import adafruit_mpu6050
+        bus = self.i2c
+        if channel is not None:
+            if mux_address not in self.muxes:
+                import adafruit_tca9548a
+                self.muxes[mux_address] = adafruit_tca9548a.TCA9548A(self.i2c, address=mux_address)
+            bus = self.muxes[mux_address][channel]
+        return adafruit_mpu6050.MPU6050(bus, address=address)
+
+
+class SyntheticBus:
+    """Stand-in bus that hands out synthetic sensors instead of talking to I2C.
+
+    populated restricts which (channel, address) pairs answer, so rigs with
+    missing or misaddressed sensors can be reproduced without hardware.
+    """
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config["sensor"]["synthetic"], rate_hz=1.0 / config["sample_rate"])
+
+    def __init__(self, signals=None, rate_hz=10, populated=None):
+        self.signals = signals or {}
+        self.rate_hz = rate_hz
+        self.populated = populated
+        self.opened = {}
+        self.resets = 0
+
+    def reset(self):
+        self.resets += 1
+
+    def open(self, address, channel=None, mux_address=MUX_ADDRESS, signals=None):
+        key = (channel, address)
+        if self.populated is not None and key not in self.populated:
+            raise ValueError(f"No I2C device at address: {hex(address)}")
+        merged = dict(self.signals)
+        merged.update(signals or {})
+        sensor = synthetic_sensor.SyntheticMPU6050(merged, rate_hz=self.rate_hz)
+        self.opened[key] = sensor
+        return sensor
+
+
+# Bus backends selectable with config["sensor"]["backend"]. A backend
+# provides from_config(config), open(address, channel, mux_address, signals)
+# returning a driver, and reset().
+BACKENDS = {
+    "mpu6050": HardwareBus,
+    "synthetic": SyntheticBus
+}
+
+
+def open_bus(backend, config):
+    """Open the bus of the named backend"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown sensor backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[backend].from_config(config)
+
+
+class Device:
+    """One sensor on the bus with its latest reading and recent history"""
+
+    def __init__(self, device_id, address=DEFAULT_ADDRESS, channel=None, mux_address=MUX_ADDRESS,
+                 calibration=None, synthetic=None, history_size=HISTORY_SIZE):
+        self.id = device_id
+        self.index = 0  # position in the registry
+        self.address = address
+        self.channel = channel
+        self.mux_address = mux_address
+        self.calibration = calibration or dict(UNCALIBRATED)
+        self.synthetic = synthetic or {}
+        self.driver = None
+        self.bus = None  # the bus the driver was opened on, kept for resets
+        self.snapshot = snapshot.SnapshotPublisher()
+        self.fusion = None  # orientation filter, see fusion.create_filter()
+        self.stats = None  # running statistics, see stats.create_stats()
+        self.spectrum = None  # vibration spectrum, see spectrum.create_spectrum()
+        self.events = None  # motion event detector, see events.create_events()
+        self.capture = None  # pre/post-trigger capture buffer, see capture.create_capture()
+        self.trend = None  # recent min/max/mean for the console, see trend.create_trend()
+        self.calibration_job = None  # running calibration.CalibrationJob
+        self.watchdog = None  # fault recovery and gaps, see sensor_watchdog.create_watchdog()
+        self.pipeline = None  # processing stages, see pipeline.create_pipeline()
+        self.samples = 0
+        self.errors = 0
+        # Samples, oldest first
+        self.history = collections.deque(maxlen=history_size)
+
+    def open(self, bus):
+        self.bus = bus
+        self.driver = bus.open(self.address, self.channel, self.mux_address, self.synthetic)
+        return self.driver
+
+    def record(self, sample):
+        """Publish a new sample and keep it in the history"""
+        self.snapshot.publish(sample)
+        self.samples += 1
+        self.history.append(sample)
+
+    def replace_history(self, replacements):
+        """Swap samples of the history for new ones ({id(old sample): new sample}).
+
+        Samples recorded since the replacements were made stay as they are.
+        """
+        self.history = collections.deque((replacements.get(id(sample), sample) for sample in list(self.history)),
+                                         maxlen=self.history.maxlen)
+
+    @property
+    def latest(self):
+        """Latest Sample, or None before the first one"""
+        return self.snapshot.read()[1]
+
+    def describe(self):
+        return {
+            "id": self.id,
+            "address": hex(self.address),
+            "channel": self.channel,
+            "connected": self.driver is not None,
+            "calibrated": self.calibration["calibrated"],
+            "samples": self.samples,
+            "errors": self.errors,
+            "watchdog": self.watchdog.describe() if self.watchdog is not None else None
+        }
+
+
+class DeviceRegistry:
+    """Ordered collection of devices; the first one is the primary sensor"""
+
+    def __init__(self, tolerance=0.05):
+        self.devices = collections.OrderedDict()
+        self.tolerance = tolerance
+
+    def add(self, device):
+        if device.id in self.devices:
+            raise ValueError(f"Duplicate device id: {device.id}")
+        device.index = len(self.devices)
+        self.devices[device.id] = device
+        return device
+
+    def get(self, device_id):
+        return self.devices.get(device_id)
+
+    @property
+    def primary(self):
+        return next(iter(self.devices.values()), None)
+
+    def __iter__(self):
+        return iter(list(self.devices.values()))
+
+    def __len__(self):
+        return len(self.devices)
+
+    def reopen_bus(self, bus, exclude=None):
+        """Reopen every device on bus after a reset left its drivers (and mux handles) dead.
+
+        Returns the ids of the devices that did not answer; their workers
+        recover them when their next read fails.
+        """
+        failed = []
+        for device in self:
+            if device.bus is not bus or device is exclude:
+                continue
+            try:
+                device.open(bus)
+            except Exception:
+                failed.append(device.id)
+        return failed
+
+    def merged(self, since_ns=None, tolerance=None, timelines=None):
+        """Samples of all devices aligned on the primary device's timestamps.
+
+        tolerance is in seconds. timelines overrides the in-process history,
+        e.g. with samples read from another process.
+        """
+        if not self.devices:
+            return []
+        if timelines is None:
+            timelines = {device.id: list(device.history) for device in self}
+        tolerance = self.tolerance if tolerance is None else tolerance
+        return align(timelines, self.primary.id, int(tolerance * 1e9), since_ns)
+
+
+def align(timelines, reference, tolerance_ns, since_ns=None):
+    """Align several Sample timelines onto the reference timeline.
+
+    Returns (t_ns, {device id: Sample}) rows holding, per device, the sample
+    closest in time to the reference sample, or None if nothing lies within
+    tolerance_ns. Timelines must be sorted by timestamp.
+    """
+    times = {device_id: [s.t_ns for s in timeline] for device_id, timeline in timelines.items()}
+    start = 0 if since_ns is None else bisect.bisect_right(times[reference], since_ns)
+    rows = []
+    for reading in timelines[reference][start:]:
+        t = reading.t_ns
+        row = {}
+        for device_id, timeline in timelines.items():
+            if device_id == reference:
+                row[device_id] = reading
+                continue
+            device_times = times[device_id]
+            i = bisect.bisect_left(device_times, t)
+            best = None
+            for j in (i - 1, i):
+                if 0 <= j < len(device_times) and abs(device_times[j] - t) <= tolerance_ns:
+                    if best is None or abs(device_times[j] - t) < abs(device_times[best] - t):
+                        best = j
+            row[device_id] = timeline[best] if best is not None else None
+        rows.append((t, row))
+    return rows
@@ -0,0 +1,196 @@
+# events.py - v1.0.3
+# Rule-based motion event detection (shock, free fall, tilt, stillness)
+
+import collections
+import threading
+
+import numpy as np
+
+# Default event configuration, overridden by config["events"]. "on" starts an
+# event and "off" ends it (hysteresis); the condition must hold for
+# min_duration seconds to start and the release condition for release
+# seconds to end it (debounce).
+DEFAULT_EVENTS = {
+    "enabled": True,
+    "file": "events.jsonl",
+    "history": 1000,              # events kept in memory for the API
+    "reference": [0.0, 0.0, 1.0],  # sensor axis pointing up when level, for tilt
+    "rules": {
+        "shock": {"enabled": True, "on": 29.4, "off": 24.5, "min_duration": 0.0, "release": 0.05},
+        "free_fall": {"enabled": True, "on": 2.0, "off": 4.0, "min_duration": 0.05, "release": 0.05},
+        "tilt": {"enabled": True, "on": 30.0, "off": 25.0, "min_duration": 0.5, "release": 0.5},
+        "stillness": {"enabled": True, "on": 0.02, "off": 0.05, "min_duration": 2.0, "release": 0.5}
+    }
+}
+
+# Rule name: (measure, direction, unit). Direction 1 fires above "on",
+# -1 below it.
+RULES = {
+    "shock": ("accel_norm", 1, "m/s²"),
+    "free_fall": ("accel_norm", -1, "m/s²"),
+    "tilt": ("tilt", 1, "deg"),
+    "stillness": ("gyro_norm", -1, "rad/s")
+}
+
+
+def measures(values, reference):
+    """Per-sample quantities the rules look at, from a (n, 7) values array"""
+    accel = values[:, 0:3]
+    accel_norm = np.linalg.norm(accel, axis=1)
+    cosine = np.divide(accel @ reference, accel_norm, out=np.ones_like(accel_norm), where=accel_norm > 0)
+    return {
+        "accel_norm": accel_norm,
+        "gyro_norm": np.linalg.norm(values[:, 3:6], axis=1),
+        "tilt": np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+    }
+
+
+def first(mask, start):
+    """Index of the first True in mask at or after start, or len(mask)"""
+    if start >= len(mask):
+        return len(mask)
+    index = int(np.argmax(mask[start:]))
+    return start + index if mask[start + index] else len(mask)
+
+
+class Rule:
+    """Hysteresis and debounce state machine over one measure.
+
+    The enter/leave conditions are evaluated for the whole batch with NumPy;
+    the loop below only visits the points where a condition starts or stops
+    holding, so a quiet batch costs a couple of array scans.
+    """
+
+    def __init__(self, name, settings):
+        self.name = name
+        self.measure, self.direction, self.unit = RULES[name]
+        self.on = settings["on"]
+        self.off = settings["off"]
+        self.min_ns = int(settings["min_duration"] * 1e9)
+        self.release_ns = int(settings["release"] * 1e9)
+        self.active = None        # open event: {"start", "peak"}
+        self.pending_since = None  # t_ns the enter condition started holding
+        self.release_since = None  # t_ns the leave condition started holding
+
+    def _track_peak(self, signed, start, stop):
+        if stop > start:
+            self.active["peak"] = max(self.active["peak"], float(signed[start:stop].max()))
+
+    def update(self, t_ns, values):
+        """Advance over a batch; returns the events that ended in it"""
+        signed = self.direction * values
+        enter = signed > self.direction * self.on
+        leave = signed < self.direction * self.off
+        finished = []
+        n = len(t_ns)
+        i = 0
+        while i < n:
+            if self.active is None:
+                if self.pending_since is None:
+                    i = first(enter, i)
+                    if i == n:
+                        break
+                    self.pending_since = int(t_ns[i])
+                end = first(~enter, i)
+                if end == i:
+                    self.pending_since = None  # Stopped holding at the batch boundary
+                    continue
+                fire_at = self.pending_since + self.min_ns
+                if t_ns[end - 1] >= fire_at:
+                    start = i + int(np.searchsorted(t_ns[i:end], fire_at))
+                    self.active = {"start": self.pending_since, "peak": float(signed[i:start + 1].max())}
+                    self.pending_since = None
+                    self.release_since = None
+                    i = start + 1
+                elif end < n:
+                    self.pending_since = None
+                    i = end
+                else:
+                    break
+            else:
+                if self.release_since is None:
+                    stop = first(leave, i)
+                    self._track_peak(signed, i, stop)
+                    if stop == n:
+                        break
+                    self.release_since = int(t_ns[stop])
+                    i = stop
+                end = first(~leave, i)
+                if end == i:
+                    self.release_since = None
+                    continue
+                release_at = self.release_since + self.release_ns
+                if t_ns[end - 1] >= release_at:
+                    finished.append({
+                        "type": self.name,
+                        "start": self.active["start"],
+                        "end": self.release_since,
+                        "peak": self.direction * self.active["peak"],
+                        "unit": self.unit
+                    })
+                    self.active = None
+                    self.release_since = None
+                    i = i + int(np.searchsorted(t_ns[i:end], release_at)) + 1
+                elif end < n:
+                    # Condition came back before the release time: still the same event
+                    self.release_since = None
+                    i = end
+                else:
+                    break
+        return finished
+
+
+class EventDetector:
+    """Runs the configured rules over batches and keeps recent events"""
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_EVENTS, **(settings or {}))
+        self.reference = np.asarray(settings["reference"], dtype=np.float64)
+        self.reference /= np.linalg.norm(self.reference)
+        self.rules = []
+        for name, defaults in DEFAULT_EVENTS["rules"].items():
+            rule = dict(defaults, **settings.get("rules", {}).get(name, {}))
+            if rule["enabled"]:
+                self.rules.append(Rule(name, rule))
+        self.history = collections.deque(maxlen=settings["history"])
+        self.file = settings["file"]
+        self._lock = threading.Lock()
+
+    def update_arrays(self, t_ns, values):
+        """Run the rules over a batch (t_ns (n,), values (n, 7)); returns events that ended"""
+        if len(t_ns) == 0:
+            return []
+        quantities = measures(values, self.reference)
+        finished = []
+        with self._lock:
+            for rule in self.rules:
+                finished.extend(rule.update(t_ns, quantities[rule.measure]))
+            finished.sort(key=lambda event: event["start"])
+            self.history.extend(finished)
+        return finished
+
+    def events(self, since_ns=None, kind=None):
+        """Ended events (oldest first) followed by the ones still in progress"""
+        with self._lock:
+            ended = list(self.history)
+            ongoing = [{
+                "type": rule.name,
+                "start": rule.active["start"],
+                "end": None,
+                "peak": rule.direction * rule.active["peak"],
+                "unit": rule.unit
+            } for rule in self.rules if rule.active is not None]
+        result = ended + ongoing
+        if since_ns is not None:
+            result = [e for e in result if e["end"] is None or e["end"] > since_ns]
+        if kind is not None:
+            result = [e for e in result if e["type"] == kind]
+        return result
+
+
+def create_events(settings):
+    """Build the event detector described by config["events"], or None if disabled"""
+    settings = dict(DEFAULT_EVENTS, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return EventDetector(settings)
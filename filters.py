@@ -0,0 +1,256 @@
+# filters.py - v1.0.3
+# Digital low-pass / high-pass / notch filters and FIR decimation keeping state across batches
+
+import math
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import stats
+
+# scipy.signal once looked up by scipy_signal(); None when SciPy is not installed
+_scipy_signal = False
+
+# Channel groups accepted in a filter's "axes" list besides single channel names
+GROUPS = {
+    "accel": ("accel_x", "accel_y", "accel_z"),
+    "gyro": ("gyro_x", "gyro_y", "gyro_z")
+}
+
+KINDS = ("lowpass", "highpass", "notch")
+
+
+def biquad(kind, freq, fs, q):
+    """One second-order section [b0, b1, b2, 1, a1, a2] (bilinear transform, prewarped)"""
+    w0 = 2 * math.pi * freq / fs
+    cos_w0 = math.cos(w0)
+    alpha = math.sin(w0) / (2 * q)
+    if kind == "lowpass":
+        b = [(1 - cos_w0) / 2, 1 - cos_w0, (1 - cos_w0) / 2]
+    elif kind == "highpass":
+        b = [(1 + cos_w0) / 2, -(1 + cos_w0), (1 + cos_w0) / 2]
+    else:
+        b = [1.0, -2 * cos_w0, 1.0]
+    a0 = 1 + alpha
+    return [b[0] / a0, b[1] / a0, b[2] / a0, 1.0, -2 * cos_w0 / a0, (1 - alpha) / a0]
+
+
+def first_order(kind, freq, fs):
+    """First-order section for odd Butterworth orders, in the same layout as biquad()"""
+    k = math.tan(math.pi * freq / fs)
+    a1 = (k - 1) / (k + 1)
+    if kind == "lowpass":
+        return [k / (k + 1), k / (k + 1), 0.0, 1.0, a1, 0.0]
+    return [1 / (k + 1), -1 / (k + 1), 0.0, 1.0, a1, 0.0]
+
+
+def butterworth(kind, cutoff, fs, order):
+    """Second-order sections (m, 6) of a digital Butterworth low- or high-pass"""
+    if not 0 < cutoff < fs / 2:
+        raise ValueError(f"Cutoff {cutoff} Hz must be between 0 and {fs / 2:g} Hz (half the sample rate)")
+    # Pole pairs of the analog prototype, each at angle theta from the negative real axis
+    angles = [abs(math.pi * (2 * k + order + 1) / (2 * order) - math.pi) for k in range(order // 2)]
+    sections = [biquad(kind, cutoff, fs, 1 / (2 * math.cos(theta))) for theta in angles]
+    if order % 2:
+        sections.append(first_order(kind, cutoff, fs))
+    return np.array(sections)
+
+
+def notch(freq, fs, q):
+    """Second-order section (1, 6) of a notch at freq with quality factor q"""
+    if not 0 < freq < fs / 2:
+        raise ValueError(f"Notch frequency {freq} Hz must be between 0 and {fs / 2:g} Hz")
+    return np.array([biquad("notch", freq, fs, q)])
+
+
+def lowpass_taps(cutoff, fs, numtaps):
+    """Linear-phase FIR low-pass (Hamming windowed sinc) with unit DC gain"""
+    n = np.arange(numtaps) - (numtaps - 1) / 2
+    taps = np.sinc(2 * cutoff / fs * n) * np.hamming(numtaps)
+    return taps / taps.sum()
+
+
+def fir_taps(kind, cutoff, fs, numtaps):
+    """Linear-phase FIR low- or high-pass; numtaps must be odd for a high-pass"""
+    if not 0 < cutoff < fs / 2:
+        raise ValueError(f"Cutoff {cutoff} Hz must be between 0 and {fs / 2:g} Hz (half the sample rate)")
+    taps = lowpass_taps(cutoff, fs, numtaps)
+    if kind == "highpass":
+        if numtaps % 2 == 0:
+            raise ValueError("A FIR high-pass needs an odd number of taps")
+        taps = -taps
+        taps[numtaps // 2] += 1.0  # Spectral inversion: delta minus low-pass
+    return taps
+
+
+def scipy_signal():
+    """scipy.signal (optional, runs the IIR recursion in C), imported on first use.
+
+    Importing SciPy takes about a second on a Pi, so it is only paid for
+    when an IIR filter is actually configured.
+    """
+    global _scipy_signal
+    if _scipy_signal is False:
+        try:
+            from scipy import signal
+            _scipy_signal = signal
+        except ImportError:
+            _scipy_signal = None
+    return _scipy_signal
+
+
+class SosFilter:
+    """Cascade of second-order IIR sections over several channels, state kept between batches.
+
+    The state starts at the steady state for the first input row, so the
+    filter does not ring up from zero. scipy.signal.sosfilt is used when
+    SciPy is installed. Otherwise each section runs in its state-space form
+    on blocks of up to block samples: the outputs of a block are one
+    matrix product of the impulse-response (Toeplitz) matrix with the input
+    plus the free response to the carried state, so the Python loop runs
+    once per block, not once per sample, and the result equals the
+    sample-by-sample recursion up to rounding.
+    """
+
+    def __init__(self, sos, block=64):
+        self.sos = np.asarray(sos, dtype=np.float64)
+        self.zi = None  # (sections, 2, channels), the layout sosfilt uses
+        self.signal = scipy_signal()
+        self.block = block
+        self._matrices = None  # per section, built on the first filter() without SciPy
+
+    def _block_matrices(self, section):
+        """Block form of one section (transposed direct form II, state z = (z1, z2)).
+
+        z[k+1] = A z[k] + B x[k] and y[k] = z1[k] + b0 x[k]. Returns
+        toeplitz (block, block), free (block, 2) with the output of each
+        state component, powers (block + 1, 2, 2) holding A^k and drive
+        (block, 2) holding A^k B.
+        """
+        b0, b1, b2, _, a1, a2 = section
+        a = np.array([[-a1, 1.0], [-a2, 0.0]])
+        b = np.array([b1 - a1 * b0, b2 - a2 * b0])
+        powers = np.empty((self.block + 1, 2, 2))
+        powers[0] = np.eye(2)
+        for k in range(1, self.block + 1):
+            powers[k] = a @ powers[k - 1]
+        drive = powers[:-1] @ b
+        impulse = np.concatenate(([b0], drive[:-1, 0]))  # y of a unit impulse: b0, then (A^(k-1) B)_1
+        lags = np.arange(self.block)[:, None] - np.arange(self.block)[None, :]
+        toeplitz = np.where(lags >= 0, impulse[np.clip(lags, 0, None)], 0.0)
+        return toeplitz, powers[:-1, 0, :], powers, drive
+
+    def _initial_state(self, x0):
+        zi = np.zeros((len(self.sos), 2, len(x0)))
+        level = np.asarray(x0, dtype=np.float64)
+        for i, (b0, b1, b2, _, a1, a2) in enumerate(self.sos):
+            gain = (b0 + b1 + b2) / (1 + a1 + a2)
+            zi[i, 0] = (gain - b0) * level
+            zi[i, 1] = (b2 - a2 * gain) * level
+            level = level * gain
+        return zi
+
+    def filter(self, x):
+        """Filter a (n, channels) block; returns a new array"""
+        if self.zi is None:
+            self.zi = self._initial_state(x[0])
+        if self.signal is not None:
+            y, self.zi = self.signal.sosfilt(self.sos, x, axis=0, zi=self.zi)
+            return y
+        if self._matrices is None:
+            self._matrices = [self._block_matrices(section) for section in self.sos]
+        y = np.array(x, dtype=np.float64)
+        for i, (toeplitz, free, powers, drive) in enumerate(self._matrices):
+            z = self.zi[i]
+            out = np.empty_like(y)
+            for start in range(0, len(y), self.block):
+                chunk = y[start:start + self.block]
+                m = len(chunk)
+                out[start:start + m] = toeplitz[:m, :m] @ chunk + free[:m] @ z
+                z = powers[m] @ z + drive[m - 1::-1].T @ chunk
+            self.zi[i] = z
+            y = out
+        return y
+
+
+class FirFilter:
+    """FIR filter over several channels, optionally keeping only every factor-th output.
+
+    Only the outputs that are kept are computed, each as one dot product of
+    the taps with a window of the input (the polyphase form of filter and
+    downsample), so decimating by 10 costs a tenth of filtering at full rate.
+    The last numtaps - 1 inputs are carried over to the next batch.
+    """
+
+    def __init__(self, taps, factor=1):
+        self.taps = np.asarray(taps, dtype=np.float64)
+        self.reversed = self.taps[::-1].copy()
+        self.factor = factor
+        self.delay = (len(self.taps) - 1) // 2  # group delay in samples (linear phase)
+        self.history = None  # last numtaps - 1 input rows
+        self.t_history = None
+        self.seen = 0  # inputs so far
+
+    def filter(self, x):
+        """Filter a (n, channels) block (factor 1); returns a new array"""
+        return self.decimate(x)[1]
+
+    def decimate(self, x, t_ns=None):
+        """Filter a (n, channels) block; returns (kept batch indices, outputs, delay-compensated times).
+
+        With times, outputs are stamped with the time of the input at their
+        centre; the first delay outputs, centred before the first input, are
+        left out.
+        """
+        count = len(self.taps) - 1
+        if self.history is None:
+            # Start as if the first row had been there forever
+            self.history = np.repeat(x[:1], count, axis=0)
+            if t_ns is not None:
+                self.t_history = np.repeat(t_ns[:1], count)
+        n = len(x)
+        extended = np.concatenate((self.history, x))
+        kept = np.arange((-self.seen) % self.factor, n, self.factor)
+        if t_ns is not None and self.seen < self.delay:
+            kept = kept[self.seen + kept >= self.delay]
+        self.seen += n
+        windows = sliding_window_view(extended, len(self.taps), axis=0)[kept]  # (k, channels, taps)
+        y = windows @ self.reversed
+        self.history = extended[n:]
+        times = None
+        if t_ns is not None:
+            t_extended = np.concatenate((self.t_history, t_ns))
+            times = t_extended[kept + count - self.delay]
+            self.t_history = t_extended[n:]
+        return kept, y, times
+
+
+def channel_index(axes):
+    """Column indices of the (n, 7) value rows for a list of channel and group names"""
+    columns = []
+    for name in axes:
+        for channel in GROUPS.get(name, (name,)):
+            if channel not in stats.CHANNELS:
+                raise ValueError(f"Unknown filter axis: {name}")
+            index = stats.CHANNELS.index(channel)
+            if index not in columns:
+                columns.append(index)
+    return columns
+
+
+def create_filter(spec, fs):
+    """(columns, filter) for one entry of a filter stage's "filters" list.
+
+    spec: {"kind": "lowpass" | "highpass" | "notch", "axes": [...],
+    "cutoff_hz" and "order" (Butterworth) or "design": "fir" with "taps",
+    "freq_hz" and "q" for a notch}.
+    """
+    kind = spec["kind"]
+    if kind not in KINDS:
+        raise ValueError(f"Unknown filter kind: {kind}")
+    columns = channel_index(spec.get("axes", ["accel", "gyro"]))
+    if kind == "notch":
+        return columns, SosFilter(notch(spec["freq_hz"], fs, spec.get("q", 30.0)))
+    if spec.get("design", "iir") == "fir":
+        return columns, FirFilter(fir_taps(kind, spec["cutoff_hz"], fs, int(spec.get("taps", 63))))
+    return columns, SosFilter(butterworth(kind, spec["cutoff_hz"], fs, int(spec.get("order", 2))))
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+# fit_temperature.py - v1.0.3
+# Fit per-axis bias-vs-temperature polynomials by streaming over the data log
+
+import argparse
+import json
+import math
+import re
+import sys
+
+import numpy as np
+
+import calibration
+import devices
+
+AXES = ("ax", "ay", "az", "gx", "gy", "gz")
+
+# Only readings taken at rest tell us the bias: the sensor must not rotate
+# and the acceleration must be gravity alone (checked on the raw values)
+STILL_GYRO = 0.1            # rad/s
+GRAVITY_TOLERANCE = 1.0     # m/s², loose enough for an uncalibrated scale
+# A new stationary segment starts when gravity points this far from the current one
+ORIENTATION_TOLERANCE = 5.0  # degrees
+
+
+def iter_readings(path, chunk_size=1 << 16):
+    """Yield the readings of a {"readings": [...]} log one at a time.
+
+    The file is read in chunks and each reading is decoded as soon as it is
+    complete, so memory use does not depend on the size of the log. A
+    truncated last reading (file being written) is ignored.
+    """
+    decoder = json.JSONDecoder()
+    separators = re.compile(r"[\s,]*")
+    with open(path, "r") as f:
+        buffer = ""
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer += chunk
+            key = buffer.find('"readings"')
+            bracket = buffer.find("[", key) if key >= 0 else -1
+            if bracket >= 0:
+                buffer = buffer[bracket + 1:]
+                break
+        pos = 0
+        while True:
+            pos = separators.match(buffer, pos).end()
+            if pos < len(buffer):
+                if buffer[pos] == "]":
+                    return
+                try:
+                    reading, pos = decoder.raw_decode(buffer, pos)
+                    yield reading
+                    continue
+                except json.JSONDecodeError:
+                    pass  # Reading continues in the next chunk
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            buffer = buffer[pos:] + chunk
+            pos = 0
+
+
+def values_of(reading):
+    """(ax, ay, az, gx, gy, gz, temp) of a reading, raw when the log has raw values"""
+    source = reading.get("raw", reading)
+    a, g = source["acceleration"], source["gyro"]
+    return a["x"], a["y"], a["z"], g["x"], g["y"], g["z"], source["temperature"]
+
+
+class TemperatureBins:
+    """Per-bin sums of the six axes, so every temperature counts once however long it lasted.
+
+    Readings at rest are split into stationary segments: a new segment
+    starts whenever the gravity direction moves more than
+    orientation_tolerance degrees from the mean direction of the current
+    one. Bins are kept per segment and temperature, so a change of
+    orientation is never mistaken for temperature drift (see fit()).
+    """
+
+    def __init__(self, width=0.25, orientation_tolerance=ORIENTATION_TOLERANCE):
+        self.width = width
+        self.min_cos = math.cos(math.radians(orientation_tolerance))
+        self.bins = {}
+        self.segments = []  # per segment: summed unit gravity vectors
+        self.used = 0
+        self.skipped = 0
+        self.with_raw = 0
+
+    def _segment(self, ax, ay, az):
+        """Index of the stationary segment a reading at rest belongs to"""
+        norm = math.sqrt(ax * ax + ay * ay + az * az)
+        unit = (ax / norm, ay / norm, az / norm)
+        if self.segments:
+            total = self.segments[-1]
+            length = math.sqrt(sum(value * value for value in total))
+            if sum(u * t for u, t in zip(unit, total)) / length >= self.min_cos:
+                for i in range(3):
+                    total[i] += unit[i]
+                return len(self.segments) - 1
+        self.segments.append(list(unit))
+        return len(self.segments) - 1
+
+    def add(self, reading):
+        ax, ay, az, gx, gy, gz, temp = values_of(reading)
+        if (math.sqrt(gx * gx + gy * gy + gz * gz) > STILL_GYRO
+                or abs(math.sqrt(ax * ax + ay * ay + az * az) - calibration.GRAVITY) > GRAVITY_TOLERANCE):
+            self.skipped += 1
+            return
+        axes = (ax, ay, az, gx, gy, gz)
+        key = (self._segment(ax, ay, az), int(math.floor(temp / self.width)))
+        entry = self.bins.setdefault(key, [0, 0.0, [0.0] * 6])
+        entry[0] += 1
+        entry[1] += temp
+        for i, value in enumerate(axes):
+            entry[2][i] += value
+        self.used += 1
+        self.with_raw += "raw" in reading
+
+    def means(self):
+        """(temperatures (m,), axis means (m, 6), counts (m,), segments (m,)) per bin, sorted by temperature"""
+        rows = sorted(self.bins.items(), key=lambda item: item[1][1] / item[1][0])
+        counts = np.array([entry[0] for _, entry in rows], dtype=np.float64)
+        temps = np.array([entry[1] for _, entry in rows]) / counts
+        axes = np.array([entry[2] for _, entry in rows]) / counts[:, None]
+        segments = np.array([key[0] for key, _ in rows], dtype=np.int64)
+        return temps, axes, counts, segments
+
+    def degrees_of_freedom(self):
+        """Bins left to determine the temperature terms once every segment has its own accel offset"""
+        return len(self.bins) - len({segment for segment, _ in self.bins})
+
+
+def fit(temps, axes, degree, reference, segments=None):
+    """Least-squares polynomial in dT per axis; returns (coefficients (degree, 6) for dT^1.., rms residual (6,)).
+
+    The accelerometer gets one constant per stationary segment, since the
+    gravity it measures depends on the orientation, and the polynomial
+    terms shared by all segments: only temperature changes within a
+    segment determine them. The gyro bias does not depend on orientation
+    and gets a single constant.
+    """
+    dt = temps - reference
+    powers = dt[:, None] ** np.arange(1, degree + 1)
+    if segments is None:
+        segments = np.zeros(len(temps), dtype=np.int64)
+    offsets = (segments[:, None] == np.unique(segments)[None, :]).astype(np.float64)
+    coefficients = np.empty((degree, 6))
+    residual = np.empty_like(axes)
+    for columns, design in ((slice(0, 3), np.hstack((offsets, powers))),
+                            (slice(3, 6), np.hstack((np.ones((len(dt), 1)), powers)))):
+        solution, _, _, _ = np.linalg.lstsq(design, axes[:, columns], rcond=None)
+        coefficients[:, columns] = solution[-degree:] if degree else solution[:0]
+        residual[:, columns] = axes[:, columns] - design @ solution
+    return coefficients, np.sqrt(np.mean(residual ** 2, axis=0))
+
+
+def store(config_path, device_id, accel_temp, gyro_temp, reference):
+    """Write the coefficients into the device's calibration in config.json"""
+    with open(config_path, "r") as f:
+        config = json.load(f)
+    entries = config.get("devices") or []
+    ids = [str(entry.get("id", f"mpu{i}")) for i, entry in enumerate(entries)] or ["mpu0"]
+    if device_id is not None and device_id not in ids:
+        raise ValueError(f"Unknown device: {device_id}")
+    index = ids.index(device_id) if device_id is not None else 0
+    # Same lookup as devices.device_configs(): the first sensor may use the top level section
+    if entries and (index > 0 or entries[0].get("calibration")):
+        holder, key = entries[index], "calibration"
+    else:
+        holder, key = config, "calibration"
+
+    params = calibration.parameters(holder.get(key) or devices.UNCALIBRATED)
+    params["temperature_reference"] = reference
+    params["accel_temp"] = accel_temp
+    params["gyro_temp"] = gyro_temp
+    holder[key] = calibration.calibration_dict(params)
+    with open(config_path, "w") as f:
+        json.dump(config, f, indent=4)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit bias-vs-temperature polynomials from the data log')
+    parser.add_argument('log', nargs='?', default='sensor_data.json', help='Data log to read (default: sensor_data.json)')
+    parser.add_argument('--degree', type=int, default=2, help='Polynomial degree (default: 2)')
+    parser.add_argument('--reference', type=float, default=None,
+                        help='Reference temperature in °C (default: the calibration\'s, else 25)')
+    parser.add_argument('--device', help='Only use readings of this device (multi-sensor logs)')
+    parser.add_argument('--bin-width', type=float, default=0.25, help='Temperature bin width in °C (default: 0.25)')
+    parser.add_argument('--orientation-tolerance', type=float, default=ORIENTATION_TOLERANCE,
+                        help=f'Degrees gravity may move before a new stationary segment starts '
+                             f'(default: {ORIENTATION_TOLERANCE:g})')
+    parser.add_argument('--apply', action='store_true', help='Store the coefficients in config.json')
+    parser.add_argument('--config', default='config.json', help='Config file updated by --apply')
+    args = parser.parse_args()
+
+    reference = args.reference
+    if reference is None:
+        try:
+            with open(args.config, "r") as f:
+                reference = json.load(f).get("calibration", {}).get("temperature_reference", 25.0)
+        except (OSError, json.JSONDecodeError):
+            reference = 25.0
+
+    bins = TemperatureBins(args.bin_width, args.orientation_tolerance)
+    for reading in iter_readings(args.log):
+        if "gap" in reading:
+            continue  # Marker of a gap in the data, not a reading
+        if args.device is None or reading.get("device", args.device) == args.device:
+            bins.add(reading)
+
+    if bins.degrees_of_freedom() < args.degree + 1:
+        print(f"Need readings at rest in at least {args.degree + 2} temperature bins within one orientation, "
+              f"got {len(bins.bins)} bins in {len(bins.segments)} stationary segments "
+              f"({bins.used} readings used, {bins.skipped} skipped)", file=sys.stderr)
+        return 1
+    if bins.with_raw < bins.used:
+        print(f"Warning: {bins.used - bins.with_raw} readings have no raw values; "
+              f"their calibrated values were used", file=sys.stderr)
+
+    temps, axes, counts, segments = bins.means()
+    coefficients, rms = fit(temps, axes, args.degree, reference, segments)
+    result = {
+        "temperature_reference": reference,
+        "temperature_range": [float(temps.min()), float(temps.max())],
+        "readings": bins.used,
+        "skipped": bins.skipped,
+        "bins": len(temps),
+        "segments": len(bins.segments),
+        "accel_temp": coefficients[:, 0:3].tolist(),
+        "gyro_temp": coefficients[:, 3:6].tolist(),
+        "rms_residual": dict(zip(AXES, rms.tolist()))
+    }
+    print(json.dumps(result, indent=2))
+
+    if args.apply:
+        store(args.config, args.device, coefficients[:, 0:3], coefficients[:, 3:6], reference)
+        print(f"Stored in {args.config}; a running monitor picks it up automatically", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
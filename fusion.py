@@ -0,0 +1,205 @@
+# fusion.py - v1.0.3
+# Madgwick / Mahony AHRS orientation filters running on sample timestamps
+
+import math
+
+import numpy as np
+
+import samples
+
+# Default fusion configuration, overridden by config["fusion"]
+DEFAULT_FUSION = {
+    "enabled": True,
+    "algorithm": "madgwick",  # "madgwick" or "mahony"
+    "beta": 0.1,              # Madgwick gradient step gain
+    "kp": 1.0,                # Mahony proportional gain
+    "ki": 0.0,                # Mahony integral gain
+    "max_dt": 0.5             # seconds; longer gaps don't integrate the gyro
+}
+
+
+def quaternion_from_accel(ax, ay, az):
+    """Orientation with zero yaw whose gravity direction matches the accelerometer"""
+    roll = math.atan2(ay, az)
+    pitch = math.atan2(-ax, math.hypot(ay, az))
+    cr, sr = math.cos(roll / 2), math.sin(roll / 2)
+    cp, sp = math.cos(pitch / 2), math.sin(pitch / 2)
+    return (cr * cp, sr * cp, cr * sp, -sr * sp)
+
+
+def quaternion_to_euler(q):
+    """Return (roll, pitch, yaw) in degrees"""
+    angles = samples.orientation_dict(q)
+    return angles["roll"], angles["pitch"], angles["yaw"]
+
+
+class OrientationFilter:
+    """Base class: keeps the quaternion and the timestamp of the last update.
+
+    update() takes a list of Samples and sets sample.q on each of them;
+    update_arrays() does the same work on NumPy arrays. Time deltas and
+    normalised accelerations of a batch are prepared with NumPy in one go;
+    the quaternion recurrence itself is inherently sequential and runs as a
+    tight scalar loop over the prepared rows.
+    """
+
+    def __init__(self, max_dt=0.5):
+        self.q = None
+        self.last_t_ns = None
+        self.max_dt = max_dt
+
+    def step(self, q, gx, gy, gz, ax, ay, az, dt):
+        raise NotImplementedError
+
+    def update(self, batch):
+        if not batch:
+            return
+        if self.q is None:
+            first = batch[0]
+            self.q = quaternion_from_accel(first.ax, first.ay, first.az)
+            self.last_t_ns = first.t_ns
+
+        if len(batch) == 1:
+            sample = batch[0]
+            sample.q = self.update_one(sample.t_ns, sample.ax, sample.ay, sample.az,
+                                       sample.gx, sample.gy, sample.gz)
+            return
+
+        t_ns = np.fromiter((s.t_ns for s in batch), dtype=np.int64, count=len(batch))
+        accel = np.array([(s.ax, s.ay, s.az) for s in batch], dtype=np.float64)
+        gyro = np.array([(s.gx, s.gy, s.gz) for s in batch], dtype=np.float64)
+        for sample, q in zip(batch, self.update_arrays(t_ns, accel, gyro)):
+            sample.q = q
+
+    def update_one(self, t_ns, ax, ay, az, gx, gy, gz):
+        """Fuse a single sample given as scalars and return its quaternion (the polling fast path)"""
+        if self.q is None:
+            self.q = quaternion_from_accel(ax, ay, az)
+            self.last_t_ns = t_ns
+        dt = (t_ns - self.last_t_ns) / 1e9
+        if not 0 < dt <= self.max_dt:
+            dt = 0.0
+        norm = math.sqrt(ax * ax + ay * ay + az * az)
+        if norm > 0:
+            self.q = self.step(self.q, gx, gy, gz, ax / norm, ay / norm, az / norm, dt)
+        else:
+            self.q = self.step(self.q, gx, gy, gz, 0.0, 0.0, 0.0, dt)
+        self.last_t_ns = t_ns
+        return self.q
+
+    def update_arrays(self, t_ns, accel, gyro):
+        """Fuse a batch given as arrays (n,), (n, 3), (n, 3); returns a list of n quaternions"""
+        if self.q is None:
+            self.q = quaternion_from_accel(*accel[0].tolist())
+            self.last_t_ns = int(t_ns[0])
+
+        # Vectorised preparation of the whole batch
+        dt = np.diff(t_ns, prepend=self.last_t_ns) / 1e9
+        dt[(dt <= 0) | (dt > self.max_dt)] = 0.0
+        norm = np.linalg.norm(accel, axis=1, keepdims=True)
+        unit = np.divide(accel, norm, out=np.zeros_like(accel), where=norm > 0)
+        rows = np.hstack((gyro, unit)).tolist()
+
+        q = self.q
+        step = self.step
+        result = []
+        for (gx, gy, gz, ax, ay, az), d in zip(rows, dt.tolist()):
+            q = step(q, gx, gy, gz, ax, ay, az, d)
+            result.append(q)
+        self.q = q
+        self.last_t_ns = int(t_ns[-1])
+        return result
+
+
+class MadgwickFilter(OrientationFilter):
+    """Madgwick gradient-descent filter (IMU form, no magnetometer)"""
+
+    def __init__(self, beta=0.1, max_dt=0.5):
+        super().__init__(max_dt)
+        self.beta = beta
+
+    def step(self, q, gx, gy, gz, ax, ay, az, dt):
+        q0, q1, q2, q3 = q
+        # Rate of change of quaternion from the gyroscope
+        d0 = 0.5 * (-q1 * gx - q2 * gy - q3 * gz)
+        d1 = 0.5 * (q0 * gx + q2 * gz - q3 * gy)
+        d2 = 0.5 * (q0 * gy - q1 * gz + q3 * gx)
+        d3 = 0.5 * (q0 * gz + q1 * gy - q2 * gx)
+
+        # Corrective step towards the measured gravity direction
+        if ax or ay or az:
+            q0q0, q1q1, q2q2, q3q3 = q0 * q0, q1 * q1, q2 * q2, q3 * q3
+            s0 = 4 * q0 * q2q2 + 2 * q2 * ax + 4 * q0 * q1q1 - 2 * q1 * ay
+            s1 = (4 * q1 * q3q3 - 2 * q3 * ax + 4 * q0q0 * q1 - 2 * q0 * ay - 4 * q1
+                  + 8 * q1 * q1q1 + 8 * q1 * q2q2 + 4 * q1 * az)
+            s2 = (4 * q0q0 * q2 + 2 * q0 * ax + 4 * q2 * q3q3 - 2 * q3 * ay - 4 * q2
+                  + 8 * q2 * q1q1 + 8 * q2 * q2q2 + 4 * q2 * az)
+            s3 = 4 * q1q1 * q3 - 2 * q1 * ax + 4 * q2q2 * q3 - 2 * q2 * ay
+            norm = math.sqrt(s0 * s0 + s1 * s1 + s2 * s2 + s3 * s3)
+            if norm > 0:
+                beta = self.beta / norm
+                d0 -= beta * s0
+                d1 -= beta * s1
+                d2 -= beta * s2
+                d3 -= beta * s3
+
+        q0 += d0 * dt
+        q1 += d1 * dt
+        q2 += d2 * dt
+        q3 += d3 * dt
+        norm = math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        return (q0 / norm, q1 / norm, q2 / norm, q3 / norm)
+
+
+class MahonyFilter(OrientationFilter):
+    """Mahony complementary filter with proportional-integral gyro correction"""
+
+    def __init__(self, kp=1.0, ki=0.0, max_dt=0.5):
+        super().__init__(max_dt)
+        self.kp = kp
+        self.ki = ki
+        self.integral = [0.0, 0.0, 0.0]
+
+    def step(self, q, gx, gy, gz, ax, ay, az, dt):
+        q0, q1, q2, q3 = q
+        if ax or ay or az:
+            # Error between measured and estimated gravity direction
+            vx = q1 * q3 - q0 * q2
+            vy = q0 * q1 + q2 * q3
+            vz = q0 * q0 - 0.5 + q3 * q3
+            ex = ay * vz - az * vy
+            ey = az * vx - ax * vz
+            ez = ax * vy - ay * vx
+            if self.ki > 0:
+                integral = self.integral
+                integral[0] += 2 * self.ki * ex * dt
+                integral[1] += 2 * self.ki * ey * dt
+                integral[2] += 2 * self.ki * ez * dt
+                gx += integral[0]
+                gy += integral[1]
+                gz += integral[2]
+            gx += 2 * self.kp * ex
+            gy += 2 * self.kp * ey
+            gz += 2 * self.kp * ez
+
+        gx *= 0.5 * dt
+        gy *= 0.5 * dt
+        gz *= 0.5 * dt
+        q0, q1, q2, q3 = (q0 - q1 * gx - q2 * gy - q3 * gz,
+                          q1 + q0 * gx + q2 * gz - q3 * gy,
+                          q2 + q0 * gy - q1 * gz + q3 * gx,
+                          q3 + q0 * gz + q1 * gy - q2 * gx)
+        norm = math.sqrt(q0 * q0 + q1 * q1 + q2 * q2 + q3 * q3)
+        return (q0 / norm, q1 / norm, q2 / norm, q3 / norm)
+
+
+def create_filter(settings):
+    """Build the orientation filter described by config["fusion"], or None if disabled"""
+    settings = dict(DEFAULT_FUSION, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    if settings["algorithm"] == "madgwick":
+        return MadgwickFilter(settings["beta"], settings["max_dt"])
+    if settings["algorithm"] == "mahony":
+        return MahonyFilter(settings["kp"], settings["ki"], settings["max_dt"])
+    raise ValueError(f"Unknown fusion algorithm: {settings['algorithm']}")
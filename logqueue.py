@@ -0,0 +1,167 @@
+# logqueue.py - v1.0.3
+# Non-blocking logging: records are queued and written by one listener thread, repeats are rate-limited
+
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import threading
+import time
+
+# Default logging configuration, overridden by config["logging"]
+DEFAULT_LOGGING = {
+    "file": "web_server.log",
+    "level": "INFO",
+    "max_bytes": 5000000,     # rotate the log file at this size
+    "backups": 3,             # rotated files kept (web_server.log.1 ...)
+    "console": True,          # also print records to stderr
+    "queue_size": 10000,      # records waiting for the listener; more are dropped and counted
+    "repeat_interval": 10.0   # seconds a repeated warning or error is suppressed for (0: never)
+}
+
+FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+# The installed handler, listener and settings, replaced by setup_logging()
+queue_handler = None
+listener = None
+current_settings = dict(DEFAULT_LOGGING)
+
+
+class RepeatFilter(logging.Filter):
+    """Lets the first of a run of identical warnings/errors through, then one per interval.
+
+    Records are identical when they have the same logger, level and
+    message. The next record let through for that key reports how many were
+    suppressed in between, so a flapping bus costs one line per interval
+    instead of one per failed read.
+    """
+
+    def __init__(self, interval, max_keys=1000):
+        super().__init__()
+        self.interval = interval
+        self.max_keys = max_keys
+        self.seen = {}  # key: [time let through, suppressed since]
+        self.suppressed = 0
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if record.levelno < logging.WARNING or not self.interval:
+            return True
+        key = (record.name, record.levelno, record.getMessage())
+        now = time.monotonic()
+        with self._lock:
+            entry = self.seen.get(key)
+            if entry is not None and now - entry[0] < self.interval:
+                entry[1] += 1
+                self.suppressed += 1
+                return False
+            repeated = entry[1] if entry is not None else 0
+            if len(self.seen) >= self.max_keys:
+                self.seen.clear()
+            self.seen[key] = [now, 0]
+        if repeated:
+            record.msg = f"{record.getMessage()} (repeated {repeated} more times in the last {now - entry[0]:.1f} s)"
+            record.args = None
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that never blocks: when the queue is full the record is dropped and counted"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def setup_logging(settings=None):
+    """Route all logging through a queue to one listener thread writing the rotating file.
+
+    Safe to call again (e.g. once config.json is loaded): the previous
+    listener is flushed and stopped first. Returns the queue handler.
+    """
+    global queue_handler, listener, current_settings
+    settings = dict(DEFAULT_LOGGING, **(settings or {}))
+    current_settings = settings
+    root = logging.getLogger()
+    stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    formatter = logging.Formatter(FORMAT)
+    handlers = [logging.handlers.RotatingFileHandler(settings["file"], maxBytes=settings["max_bytes"],
+                                                     backupCount=settings["backups"])]
+    if settings["console"]:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    queue_handler = DroppingQueueHandler(queue.Queue(settings["queue_size"]))
+    queue_handler.addFilter(RepeatFilter(settings["repeat_interval"]))
+    root.addHandler(queue_handler)
+    root.setLevel(settings["level"])
+    listener = logging.handlers.QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return queue_handler
+
+
+def share_queue():
+    """Move the listener onto a multiprocessing queue other processes can log into (see log_to_queue).
+
+    The same single listener thread then writes the records of this process
+    and of its children. Records still in the old queue are written out
+    before the old listener stops. Returns the new queue.
+    """
+    global listener
+    log_queue = multiprocessing.Queue(current_settings["queue_size"])
+    previous = listener
+    queue_handler.queue = log_queue
+    previous.stop()
+    listener = logging.handlers.QueueListener(log_queue, *previous.handlers, respect_handler_level=True)
+    listener.start()
+    return log_queue
+
+
+def log_to_queue(log_queue, settings=None):
+    """In a child process: send every record to the parent's log_queue instead of writing it"""
+    global queue_handler, listener
+    settings = dict(DEFAULT_LOGGING, **(settings or {}))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    listener = None  # inherited from the parent, but its thread does not exist here
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RepeatFilter(settings["repeat_interval"]))
+    root.addHandler(queue_handler)
+    root.setLevel(settings["level"])
+
+
+def stop_logging():
+    """Write out everything still queued and stop the listener thread"""
+    global listener
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+        listener = None
+
+
+def describe():
+    """Counters of the installed queue handler"""
+    if queue_handler is None:
+        return {"dropped": 0, "suppressed": 0, "queued": 0}
+    repeat = next((f for f in queue_handler.filters if isinstance(f, RepeatFilter)), None)
+    try:
+        queued = queue_handler.queue.qsize()
+    except NotImplementedError:  # multiprocessing queues on macOS
+        queued = None
+    return {
+        "dropped": queue_handler.dropped,
+        "suppressed": repeat.suppressed if repeat is not None else 0,
+        "queued": queued
+    }
@@ -0,0 +1,214 @@
+# metrics.py - v1.0.3
+# Minimal Prometheus-compatible counters, gauges and histograms with text exposition
+
+import bisect
+import math
+import threading
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Latency buckets in seconds, from 50 µs (one I2C read) to 10 s
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, float) and value.is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class CounterChild:
+    """One labelled counter; inc() is a lock and an add"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def state(self):
+        return self.value
+
+    def load_state(self, state):
+        self.value = state
+
+
+class GaugeChild:
+    """One labelled gauge"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value):
+        self.value = value
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        self.inc(-amount)
+
+    def state(self):
+        return self.value
+
+    def load_state(self, state):
+        self.value = state
+
+
+class HistogramChild:
+    """One labelled histogram: per-bucket counts, sum and count"""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        i = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def state(self):
+        with self._lock:
+            return [list(self.counts), self.sum, self.count]
+
+    def load_state(self, state):
+        counts, total, count = state
+        with self._lock:
+            self.counts = list(counts)
+            self.sum = total
+            self.count = count
+
+    def samples(self):
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        cumulative = 0
+        for bound, n in zip(list(self.bounds) + [math.inf], counts):
+            cumulative += n
+            yield "_bucket", (("le", format_value(float(bound))),), cumulative
+        yield "_sum", (), total
+        yield "_count", (), count
+
+
+class Metric:
+    """A named metric family; children are created per label values with labels()"""
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), **kwargs):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kwargs = kwargs
+        self.children = {}
+        self._lock = threading.Lock()
+
+    def _child(self):
+        raise NotImplementedError
+
+    def labels(self, **values):
+        """Child for the given label values (look it up once, outside hot loops)"""
+        key = tuple(str(values[name]) for name in self.labelnames)
+        child = self.children.get(key)
+        if child is None:
+            with self._lock:
+                child = self.children.setdefault(key, self._child())
+        return child
+
+    def state(self):
+        """Values of all children, JSON-ready, e.g. to hand them to another process"""
+        return [[list(key), child.state()] for key, child in list(self.children.items())]
+
+    def load_state(self, state):
+        """Take over the children values of state() (from a metric of the same name and labels)"""
+        for key, value in state:
+            self.labels(**dict(zip(self.labelnames, key))).load_state(value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self.children.items()):
+            if isinstance(child, HistogramChild):
+                for suffix, extra, value in child.samples():
+                    lines.append(f"{self.name}{suffix}{format_labels(self.labelnames, key, extra)} "
+                                 f"{format_value(value)}")
+            else:
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {format_value(child.value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _child(self):
+        return CounterChild()
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _child(self):
+        return GaugeChild()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def _child(self):
+        return HistogramChild(tuple(self.kwargs.get("buckets", LATENCY_BUCKETS)))
+
+
+class Registry:
+    """Metric families plus collector callbacks that set gauges right before a scrape"""
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def collector(self, function):
+        """Register function() to be called before every render (decorator)"""
+        self.collectors.append(function)
+        return function
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        for function in self.collectors:
+            function()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
@@ -7,80 +7,210 @@ import json
 import os
 import math
 import argparse
+import functools
+import hmac
 import logging
 import signal
 import sys
+import tempfile
 import threading
-import subprocess
+import multiprocessing
 from datetime import datetime
-import board
-import busio
-import adafruit_mpu6050
-from flask import Flask, render_template, jsonify, send_file, Response
-
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler("web_server.log"),
-        logging.StreamHandler()
-    ]
-)
+import numpy as np
+from flask import Flask, render_template, jsonify, send_file, Response, request, g
+import calibration
+import capture
+import console
+import datalog
+import devices
+import events
+import fusion
+import logqueue
+import metrics
+import pipeline
+import profiling
+import samples
+import sensor_watchdog
+import shm_ring
+import spectrum
+import stats
+import synthetic_sensor
+import trend
+import warmstart
+
+# Logging is set up by main(): records are queued and written by one listener thread
 logger = logging.getLogger("mpu6050_monitor")
 
 # Create Flask app for web server
 app = Flask("mpu6050_web_server")
-# Redirect Flask logging to file
+# Flask logs through the root queue handler as well
 app.logger.handlers = []
-handler = logging.FileHandler('web_server.log')
-handler.setLevel(logging.INFO)
-app.logger.addHandler(handler)
 app.logger.setLevel(logging.INFO)
 
 # Global start time for uptime tracking
 start_time = time.time()
 
-# Global sensor data (updated by background thread)
-sensor_data = {
-    "acceleration": {"x": 0, "y": 0, "z": 0},
-    "gyro": {"x": 0, "y": 0, "z": 0},
-    "temperature": 0
-}
+# Registry of configured sensors (built by the sensor thread)
+registry = None
+
+# Shared-memory ring written by the acquisition process (None when acquiring in-process)
+sample_ring = None
+
+# Calibration jobs by id, most recent last, and the lock making "one job per sensor" atomic
+calibration_jobs = {}
+calibration_lock = threading.Lock()
+# Serializes read-modify-write cycles of config.json
+config_lock = threading.Lock()
+
+# Profiling runs by id, most recent last, the lock making "one run at a time"
+# atomic, and tracemalloc snapshots
+profile_sessions = {}
+profile_lock = threading.Lock()
+memory_tracker = profiling.MemoryTracker()
+
+# Serializes data file writes (data log writer) and reads (API)
+data_file_lock = threading.Lock()
+
+# Background writer of the data file (created by the sensor thread)
+data_log = None
+
+# What was preloaded from the data log at startup (see warm_start())
+warm_start_info = None
 
 # Global flag to control the main loop
 running = True
 
+# Prometheus metrics served at /metrics. Hot paths look up labelled
+# children once and then only observe/inc them.
+metrics_registry = metrics.Registry()
+I2C_READ_SECONDS = metrics_registry.histogram(
+    "mpu6050_i2c_read_seconds", "Duration of one sensor read (single sample or FIFO batch)", ["device"])
+SAMPLES_TOTAL = metrics_registry.counter("mpu6050_samples_total", "Samples acquired", ["device"])
+SAMPLE_RATE = metrics_registry.gauge(
+    "mpu6050_sample_rate_hz", "Achieved sample rate since the previous update (at least 1 s)", ["device"])
+DROPPED_TOTAL = metrics_registry.counter(
+    "mpu6050_dropped_samples_total", "Samples lost by acquisition (missed polling ticks, FIFO overflow)",
+    ["device", "reason"])
+READ_ERRORS_TOTAL = metrics_registry.counter("mpu6050_read_errors_total", "Failed sensor reads", ["device"])
+PIPELINE_SECONDS = metrics_registry.counter(
+    "mpu6050_pipeline_stage_seconds_total", "Time spent in each pipeline stage", ["device", "stage"])
+DATA_LOG_WRITE_SECONDS = metrics_registry.histogram(
+    "mpu6050_data_log_write_seconds", "Duration of one batched data log write")
+DATA_LOG_BYTES = metrics_registry.counter("mpu6050_data_log_bytes_total", "Bytes written to the data log")
+DATA_LOG_READINGS = metrics_registry.counter("mpu6050_data_log_readings_total", "Readings written to the data log")
+DATA_LOG_DROPPED = metrics_registry.counter(
+    "mpu6050_data_log_dropped_readings_total", "Readings dropped because the writer queue was full or a write failed")
+DATA_LOG_QUEUE = metrics_registry.gauge("mpu6050_data_log_queue_depth", "Batches waiting for the data log writer")
+HTTP_SECONDS = metrics_registry.histogram(
+    "mpu6050_http_request_seconds", "HTTP request latency (until the response starts for streams)",
+    ["route", "method", "status"])
+GAPS_TOTAL = metrics_registry.counter("mpu6050_gaps_total", "Gaps in the data after failed or stuck reads",
+                                      ["device"])
+GAP_SECONDS = metrics_registry.counter("mpu6050_gap_seconds_total", "Time without data in closed gaps", ["device"])
+RESETS_TOTAL = metrics_registry.counter("mpu6050_resets_total", "Sensor and bus resets by the watchdog",
+                                        ["device", "kind"])
+LOG_DROPPED = metrics_registry.counter(
+    "mpu6050_log_records_dropped_total", "Log records dropped because the logging queue was full")
+LOG_SUPPRESSED = metrics_registry.counter(
+    "mpu6050_log_records_suppressed_total", "Repeated warnings and errors left out of the log")
+STREAM_CLIENTS = metrics_registry.gauge("mpu6050_stream_clients", "Connected /api/v1/stream clients")
+STREAM_CLIENTS.labels()
+# Kept by the acquisition side; in process mode mirrored to the parent through the ring's status block
+ACQUISITION_METRICS = (I2C_READ_SECONDS, DROPPED_TOTAL, DATA_LOG_WRITE_SECONDS, DATA_LOG_BYTES, DATA_LOG_READINGS,
+                       DATA_LOG_DROPPED, DATA_LOG_QUEUE)
+
 # Configuration
 CONFIG = {
     "data_file": "sensor_data.json",
     "sample_rate": 0.1,  # seconds
+    "log_decimation": 1,  # log every Nth sample; captures keep full-rate data around events
+    "pipeline": dict(pipeline.DEFAULT_PIPELINE),  # stages every batch of samples goes through
+    "data_log": dict(datalog.DEFAULT_DATA_LOG),  # batched background writes of the data file
     "calibration": {
         "x_offset": 0,
         "y_offset": 0,
         "z_offset": 0,
         "calibrated": False
+    },
+    "fusion": dict(fusion.DEFAULT_FUSION),  # server-side orientation (AHRS) filter
+    "stats": dict(stats.DEFAULT_STATS),  # running per-axis statistics
+    "spectrum": dict(spectrum.DEFAULT_SPECTRUM),  # Welch acceleration spectra
+    "events": dict(events.DEFAULT_EVENTS),  # shock / free fall / tilt / stillness detection
+    "capture": dict(capture.DEFAULT_CAPTURE),  # full-rate captures around events
+    "console": dict(console.DEFAULT_CONSOLE),  # console refresh rate
+    "trend": dict(trend.DEFAULT_TREND),  # console sparklines of the last seconds
+    "watchdog": dict(sensor_watchdog.DEFAULT_WATCHDOG),  # stuck/failed read recovery and gap records
+    "logging": dict(logqueue.DEFAULT_LOGGING),  # queued, rotating, rate-limited log file
+    "warm_start": dict(warmstart.DEFAULT_WARM_START),  # preload recent history and stats from the data log
+    "profiling": dict(profiling.DEFAULT_PROFILING),  # /api/v1/profile, enabled by setting a token
+    "devices": [],  # [{"id", "address", "channel", "mux_address", "calibration"}], empty = one sensor at 0x68
+    "sensor": {
+        "backend": "mpu6050",  # "mpu6050" or "synthetic"
+        "fifo": False,  # read batches from the sensor FIFO when the backend supports it
+        "fifo_poll_interval": 0.01,  # seconds
+        "process": False,  # acquire in a separate process publishing to shared memory
+        "ring_capacity": 4096,  # records kept in the shared-memory ring
+        "status_interval": 1.0,  # seconds between metrics/status updates of the acquisition process
+        "synthetic": {}  # signal overrides, see synthetic_sensor.DEFAULT_SIGNALS
     }
 }
 
 def load_config():
-    """Load config from file if exists"""
+    """Load config from file if exists, filling in missing sections from defaults"""
+    config = json.loads(json.dumps(CONFIG))
     if os.path.exists("config.json"):
         with open("config.json", "r") as f:
-            return json.load(f)
-    return CONFIG
+            for key, value in json.load(f).items():
+                if isinstance(value, dict) and isinstance(config.get(key), dict):
+                    config[key].update(value)
+                else:
+                    config[key] = value
+    return config
+
+def read_config_file():
+    """config.json as written, without the defaults load_config() fills in ({} if there is none)"""
+    if not os.path.exists("config.json"):
+        return {}
+    with open("config.json", "r") as f:
+        return json.load(f)
 
 def save_config(config):
-    """Save config to file"""
-    with open("config.json", "w") as f:
-        json.dump(config, f, indent=4)
+    """Save config to file: written to a temporary file next to it, then moved over it,
+    so readers see the old or the new file and never half of one"""
+    fd, temp = tempfile.mkstemp(dir=".", prefix="config.json.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(config, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp, "config.json")
+    except BaseException:
+        os.unlink(temp)
+        raise
+
+def open_bus(backend, config):
+    """Open the I2C bus for the selected backend (see devices.BACKENDS)"""
+    bus = devices.open_bus(backend, config)
+    if backend == "synthetic":
+        logger.info(f"Synthetic sensor backend initialized at {bus.rate_hz:g} Hz")
+    return bus
 
-def init_sensor():
-    """Initialize the MPU6050 sensor"""
+def init_sensor(backend=None, rate_hz=None):
+    """Driver of the primary MPU6050 sensor (or the synthetic backend) for standalone use.
+
+    The monitor itself only opens sensors in init_devices(); while its
+    registry is running this returns that driver instead of opening the
+    sensor a second time on a competing bus handle.
+    """
     config = load_config()
+    if rate_hz:
+        config["sample_rate"] = 1.0 / rate_hz
+    if registry is not None and registry.primary is not None and registry.primary.driver is not None:
+        return registry.primary.driver, config
+    backend = backend or config["sensor"]["backend"]
     try:
-        i2c = busio.I2C(board.SCL, board.SDA)
-        mpu = adafruit_mpu6050.MPU6050(i2c)
+        device = devices.Device(**devices.device_configs(config)[0])
+        mpu = device.open(open_bus(backend, config))
         logger.info("MPU6050 sensor initialized successfully")
         return mpu, config
     except Exception as e:
@@ -88,49 +218,84 @@ def init_sensor():
         logger.error("Check I2C connections and make sure MPU6050 is properly connected.")
         return None, config
 
-def read_sensor(mpu, config):
-    """Read sensor data with calibration applied"""
+def init_devices(backend=None, rate_hz=None, open_devices=True):
+    """Build the device registry and open every configured sensor on a shared bus"""
+    config = load_config()
+    if rate_hz:
+        config["sample_rate"] = 1.0 / rate_hz
+    backend = backend or config["sensor"]["backend"]
+    registry = devices.DeviceRegistry(tolerance=config["sample_rate"])
+    if not open_devices:
+        for entry in devices.device_configs(config):
+            device = registry.add(devices.Device(**entry))
+            device.stats = stats.create_stats(config["stats"])
+            device.spectrum = spectrum.create_spectrum(config["spectrum"])
+            device.events = events.create_events(config["events"])
+            device.capture = capture.create_capture(config["capture"])
+            device.trend = trend.create_trend(config["trend"])
+        return registry, config
+    try:
+        bus = open_bus(backend, config)
+    except Exception as e:
+        logger.error(f"Error opening I2C bus: {e}")
+        bus = None
+    for entry in devices.device_configs(config):
+        device = registry.add(devices.Device(**entry))
+        device.fusion = fusion.create_filter(config["fusion"])
+        device.stats = stats.create_stats(config["stats"])
+        device.spectrum = spectrum.create_spectrum(config["spectrum"])
+        device.events = events.create_events(config["events"])
+        device.capture = capture.create_capture(config["capture"])
+        device.trend = trend.create_trend(config["trend"])
+        device.watchdog = sensor_watchdog.create_watchdog(config["watchdog"])
+        if bus is None:
+            continue
+        try:
+            device.open(bus)
+            logger.info(f"MPU6050 sensor {device.id} at {hex(device.address)} initialized successfully")
+        except Exception as e:
+            logger.error(f"Error initializing sensor {device.id} at {hex(device.address)}: {e}")
+    return registry, config
+
+def read_raw(mpu):
+    """Read one uncalibrated sample: ([t_ns], [(ax, ay, az, gx, gy, gz, temp)])"""
+    t_ns = time.monotonic_ns()
     ax, ay, az = mpu.acceleration
     gx, gy, gz = mpu.gyro
     temp = mpu.temperature
-    
-    # Apply calibration if available
-    if config["calibration"]["calibrated"]:
-        ax += config["calibration"]["x_offset"]
-        ay += config["calibration"]["y_offset"]
-        az += config["calibration"]["z_offset"]
-    
-    return {
-        "acceleration": {"x": ax, "y": ay, "z": az},
-        "gyro": {"x": gx, "y": gy, "z": gz},
-        "temperature": temp
-    }
+    return [t_ns], [(ax, ay, az, gx, gy, gz, temp)]
+
+def read_raw_fifo(mpu):
+    """Read all uncalibrated samples queued in the sensor FIFO"""
+    times = []
+    raw = []
+    for t_ns, (ax, ay, az), (gx, gy, gz), temp in mpu.read_fifo():
+        times.append(t_ns)
+        raw.append((ax, ay, az, gx, gy, gz, temp))
+    return times, raw
+
+def read_sensor(mpu, transform):
+    """Read sensor data with calibration applied (raw values kept on the sample)"""
+    return transform.samples(*read_raw(mpu))[0]
+
+def read_sensor_fifo(mpu, transform):
+    """Read all samples queued in the sensor FIFO, calibrated as one batch"""
+    return transform.samples(*read_raw_fifo(mpu))
 
 def save_data(data, config):
-    """Save data to JSON file"""
-    # Load existing data if file exists
-    if os.path.exists(config["data_file"]):
-        try:
+    """Append one reading to the JSON data file"""
+    with data_file_lock:
+        datalog.append_readings(config["data_file"], [data])
+
+def read_data_file(config):
+    """Contents of the data file as a dict, {"readings": []} when missing or unreadable"""
+    try:
+        with data_file_lock:
             with open(config["data_file"], "r") as f:
                 content = f.read().strip()
-                if content:
-                    existing_data = json.loads(content)
-                else:
-                    existing_data = {"readings": []}
-        except (json.JSONDecodeError, FileNotFoundError):
-            existing_data = {"readings": []}
-    else:
-        existing_data = {"readings": []}
-    
-    # Add new data and save
-    if "readings" not in existing_data:
-        existing_data["readings"] = []
-    
-    existing_data["readings"].append(data)
-    
-    # Save with proper formatting
-    with open(config["data_file"], "w") as f:
-        json.dump(existing_data, f, indent=2)
+        return json.loads(content) if content else {"readings": []}
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {"readings": []}
 
 def get_direction_arrow(ax, ay):
     """Return ASCII arrow indicating direction based on acceleration"""
@@ -159,147 +324,663 @@ def get_vertical_arrow(value, threshold=0.3):
         return "↓"
     return " "
 
-def calibrate_sensor(mpu):
-    """Calibrate by taking 100 readings and finding average offset"""
-    print("Calibrating sensor. Please keep the sensor still and level...")
-    x_vals, y_vals, z_vals = [], [], []
-    
-    # Collect samples
-    for i in range(100):
-        ax, ay, az = mpu.acceleration
-        x_vals.append(ax)
-        y_vals.append(ay)
-        z_vals.append(az - 9.8)  # Subtract gravity from z axis
-        time.sleep(0.01)
-        print(f"Calibrating: {i+1}/100", end="\r")
+def calibrate_sensor(device, mode="level", duration=None, apply=True):
+    """Start a background calibration job for device and return it"""
+    if mode not in calibration.MODES:
+        raise ValueError(f"Unknown calibration mode: {mode}")
+    with calibration_lock:
+        if device.calibration_job is not None:
+            raise RuntimeError(f"Calibration of {device.id} is already running")
+        job = calibration.CalibrationJob(device, mode, duration)
+        device.calibration_job = job
+        calibration_jobs[job.id] = job
+        while len(calibration_jobs) > 20:
+            calibration_jobs.pop(next(iter(calibration_jobs)))
+    threading.Thread(target=run_calibration_job, args=(job, apply),
+                     name=f"calibrate-{device.id}", daemon=True).start()
+    logger.info(f"Calibration job {job.id} ({mode}) started for sensor {device.id}")
+    return job
+
+def run_calibration_job(job, apply):
+    """Run a calibration job and, if it succeeds, store and apply its result"""
+    job.run()
+    job.device.calibration_job = None
+    if job.state != "done":
+        logger.error(f"Calibration job {job.id} failed: {job.error}")
+        return
+    logger.info(f"Calibration job {job.id} finished")
+    if apply:
+        store_calibration(job.device, job.result)
+
+def store_calibration(device, settings):
+    """Save a device's calibration to config.json and apply it to the running acquisition.
+
+    Only the calibration key changes; defaults the file leaves out stay out,
+    so later changes of the defaults still reach this install.
+    """
+    with config_lock:
+        config = read_config_file()
+        if config.get("devices"):
+            config["devices"][device.index]["calibration"] = settings
+        else:
+            config["calibration"] = settings
+        save_config(config)
+    # Workers in this process pick it up at their next read; an acquisition
+    # process reloads it when it sees config.json change
+    device.calibration = settings
+    if not pipeline.records_calibrated_raw(load_config()["pipeline"]):
+        # Recalibrated raw values would replace the output of those stages
+        logger.info(f"History of sensor {device.id} not recalibrated: stages before record change the values")
+        return
+    history = list(device.history)
+    replacements = {id(old): new for old, new in zip(history, calibration.replay(history, settings)) if new is not old}
+    device.replace_history(replacements)
+    if replacements:
+        logger.info(f"Recalibrated {len(replacements)} samples of sensor {device.id} in memory")
+
+def reload_calibration(watched, last_mtime):
+    """Pick up calibration changes written to config.json; returns its modification time"""
+    try:
+        mtime = os.path.getmtime("config.json")
+    except OSError:
+        return last_mtime
+    if last_mtime is not None and mtime != last_mtime:
+        try:
+            entries = devices.device_configs(load_config())
+        except (OSError, ValueError) as e:
+            # Edited by hand and not valid (yet): keep the calibration, retry at the next poll
+            logger.warning(f"Could not reload calibration from config.json: {e}")
+            return last_mtime
+        for device in watched:
+            if device.index < len(entries) and entries[device.index]["calibration"] != device.calibration:
+                device.calibration = entries[device.index]["calibration"]
+                logger.info(f"Calibration of sensor {device.id} reloaded")
+    return mtime
+
+def pipeline_context(config):
+    """What pipeline stages get from the monitor: shared ring, data log and callbacks"""
+    return {
+        "ring": sample_ring,
+        "data_log": data_log,
+        "device_tag": len(registry) > 1,
+        "rate_hz": 1.0 / config["sample_rate"],
+        "log_decimation": config["log_decimation"],
+        "on_event": log_event,
+        "on_capture": save_capture
+    }
+
+def warm_start(config):
+    """Preload history, trend and statistics of every sensor from the tail of the data log"""
+    global warm_start_info
+    loader = warmstart.create_warm_start(config["warm_start"])
+    if loader is None or not registry:
+        return
+    try:
+        with data_file_lock:
+            by_device = loader.load(config["data_file"], registry.primary.id)
+    except OSError as e:
+        logger.warning(f"Warm start skipped, cannot read {config['data_file']}: {e}")
+        return
+    for device_id, batch in by_device.items():
+        device = registry.get(device_id)
+        if device is not None:
+            loader.preload(device, batch)
+    warm_start_info = loader.describe()
+    logger.info(f"Warm start: {loader.readings} readings from the last {loader.minutes:g} min of "
+                f"{config['data_file']} ({loader.bytes_read / 1024:.0f} KiB read) in {loader.seconds:.3f} s")
+
+def sensor_thread(backend=None, rate_hz=None):
+    """Background thread starting one acquisition worker per configured sensor"""
+    global registry, data_log
+    registry, config = init_devices(backend, rate_hz)
+    # In process mode the parent holds the analysis side and warm starts it
+    if sample_ring is None:
+        warm_start(config)
+    data_log = datalog.DataLog(config["data_file"], config["data_log"], data_file_lock,
+                               latency=DATA_LOG_WRITE_SECONDS.labels())
     
-    # Calculate offsets (ideal: x=0, y=0, z=0 after gravity compensation)
-    config = load_config()
-    config["calibration"]["x_offset"] = -sum(x_vals) / len(x_vals)
-    config["calibration"]["y_offset"] = -sum(y_vals) / len(y_vals)
-    config["calibration"]["z_offset"] = -sum(z_vals) / len(z_vals)
-    config["calibration"]["calibrated"] = True
+    # In process mode the parent runs the analysis side on what it reads from the ring
+    sides = ("acquisition",) if sample_ring is not None else ("acquisition", "analysis")
+    context = pipeline_context(config)
+    for device in registry:
+        device.pipeline = pipeline.create_pipeline(config["pipeline"], device, context, sides)
     
-    save_config(config)
-    print("\nCalibration complete!")
-    return config
+    workers = []
+    for device in registry:
+        worker = threading.Thread(target=device_worker, args=(device, config),
+                                  name=f"sensor-{device.id}", daemon=True)
+        worker.start()
+        workers.append(worker)
+    if any(device.watchdog is not None for device in registry):
+        threading.Thread(target=watchdog_thread, args=(config,), name="watchdog", daemon=True).start()
+    for worker in workers:
+        worker.join()
 
-def sensor_thread():
-    """Background thread to continuously read sensor data"""
-    global sensor_data, running
-    mpu, config = init_sensor()
+def watchdog_thread(config):
+    """Replace device workers whose read hangs longer than the watchdog's read_timeout"""
+    watched = [device for device in registry if device.watchdog is not None]
+    interval = min(device.watchdog.read_timeout for device in watched) / 4
+    while running:
+        for device in watched:
+            generation = device.watchdog.replace_if_stuck()
+            if generation is None:
+                continue
+            latest = device.latest
+            device.watchdog.begin(latest.t_ns if latest is not None else time.monotonic_ns(),
+                                  f"read timeout (> {device.watchdog.read_timeout:g} s)")
+            device.errors += 1
+            if sample_ring is not None:
+                sample_ring.count_error(device.index)
+            logger.error(f"Read of sensor {device.id} stuck for more than {device.watchdog.read_timeout:g} s, "
+                         f"resetting it")
+            threading.Thread(target=device_worker, args=(device, config, True),
+                             name=f"sensor-{device.id}-{generation}", daemon=True).start()
+        time.sleep(interval)
+
+def device_worker(device, config, recovering=False):
+    """Continuously read one sensor and push every batch through its pipeline.
+
+    With a watchdog, a failed read opens a gap and the sensor (then the bus)
+    is reset with backoff until it answers again. A read that hangs is given
+    up on by watchdog_thread(), which starts a new worker with recovering=True.
+    """
+    global running
+    watchdog = device.watchdog
+    generation = watchdog.generation if watchdog is not None else 0
+
+    def keep_going():
+        return running and watchdog.generation == generation
+
+    if recovering:
+        device.driver = watchdog.recover(device, keep_going, registry)
+        if device.driver is None:
+            return
+    mpu = device.driver
     
     if mpu is None:
-        logger.warning("Sensor initialization failed. Using dummy data.")
+        logger.warning(f"Sensor {device.id} initialization failed. Using dummy data.")
         # Return dummy data for testing
         while running:
-            sensor_data = {
-                "acceleration": {"x": 0, "y": 0, "z": 9.8},
-                "gyro": {"x": 0, "y": 0, "z": 0},
-                "temperature": 25
-            }
+            sample = samples.Sample(time.monotonic_ns(), 0, 0, 9.8, 0, 0, 0, 25)
+            device.record(sample)
+            if sample_ring is not None:
+                sample_ring.write(device.index, sample)
+                sample_ring.set_connected(device.index, False)
             time.sleep(0.1)
         return
     
-    # Buffer for data logging
-    data_buffer = []
+    # In FIFO mode the sensor paces the samples and we only poll for batches
+    use_fifo = config["sensor"]["fifo"] and hasattr(mpu, "read_fifo")
+    interval = config["sensor"]["fifo_poll_interval"] if use_fifo else config["sample_rate"]
+    read_seconds = I2C_READ_SECONDS.labels(device=device.id)
+    missed_ticks = DROPPED_TOTAL.labels(device=device.id, reason="missed_tick")
+    fifo_overflow = DROPPED_TOTAL.labels(device=device.id, reason="fifo_overflow")
+    fifo_dropped = getattr(mpu, "fifo_dropped", 0)
+    next_tick = time.monotonic()
+    config_mtime = reload_calibration([device], None)
+    next_reload = next_tick + 1.0
+    latest = device.latest
+    last_ns = latest.t_ns if latest is not None else time.monotonic_ns()  # where a gap would start
+    first_sample = latest is None
     
     while running:
+        profiling.checkpoint()
         try:
-            # Read sensor data
-            data = read_sensor(mpu, config)
-            sensor_data = data
+            # Calibration can change under us (API job, edited config.json)
+            if next_tick >= next_reload:
+                config_mtime = reload_calibration([device], config_mtime)
+                next_reload = next_tick + 1.0
             
-            # Add to buffer
-            data_with_timestamp = data.copy()
-            data_with_timestamp["timestamp"] = datetime.now().isoformat()
-            data_buffer.append(data_with_timestamp)
+            # A bus reset by another device's recovery reopened this sensor too
+            if device.driver is not mpu and device.driver is not None:
+                mpu = device.driver
+                use_fifo = config["sensor"]["fifo"] and hasattr(mpu, "read_fifo")
+                fifo_dropped = getattr(mpu, "fifo_dropped", 0)
             
-            # Save to file periodically (every 10 readings)
-            if len(data_buffer) >= 10:
-                for item in data_buffer:
-                    save_data(item, config)
-                data_buffer = []
-                
-            time.sleep(config["sample_rate"])
+            # Read sensor data and hand the whole batch to the pipeline
+            started = time.perf_counter()
+            if watchdog is None:
+                times, raw = read_raw_fifo(mpu) if use_fifo else read_raw(mpu)
+            else:
+                watchdog.start_read()
+                try:
+                    times, raw = read_raw_fifo(mpu) if use_fifo else read_raw(mpu)
+                except Exception as e:
+                    if not watchdog.finish_read(generation):
+                        return
+                    device.errors += 1
+                    if sample_ring is not None:
+                        sample_ring.count_error(device.index)
+                    logger.error(f"Error reading sensor {device.id}: {e}")
+                    watchdog.begin(last_ns, f"{type(e).__name__}: {e}")
+                    mpu = device.driver = watchdog.recover(device, keep_going, registry)
+                    if mpu is None:
+                        return
+                    use_fifo = config["sensor"]["fifo"] and hasattr(mpu, "read_fifo")
+                    fifo_dropped = getattr(mpu, "fifo_dropped", 0)
+                    next_tick = time.monotonic()
+                    continue
+                if not watchdog.finish_read(generation):
+                    return  # Given up on while the read hung; a new worker owns the device
+            read_seconds.observe(time.perf_counter() - started)
+            if use_fifo and getattr(mpu, "fifo_dropped", 0) != fifo_dropped:
+                fifo_overflow.inc(mpu.fifo_dropped - fifo_dropped)
+                fifo_dropped = mpu.fifo_dropped
+            if times:
+                if watchdog is not None and watchdog.gap is not None:
+                    record_gap(device, watchdog.end(times[0]))
+                last_ns = times[-1]
+                device.pipeline.run(pipeline.Batch(device, np.array(times, dtype=np.int64),
+                                                   np.array(raw, dtype=np.float64)))
+                if first_sample:
+                    logger.info(f"First sample from {device.id} {time.time() - start_time:.3f} s after start")
+                    first_sample = False
+            
+            # Sleep until the next tick so the time spent reading doesn't stretch the period
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                if not use_fifo and -delay >= interval:
+                    missed_ticks.inc(int(-delay / interval))
+                next_tick = time.monotonic()  # Fell behind, don't try to catch up in a burst
                 
         except Exception as e:
-            logger.error(f"Error reading sensor: {e}")
+            device.errors += 1
+            if sample_ring is not None:
+                sample_ring.count_error(device.index)
+            logger.error(f"Error reading sensor {device.id}: {e}")
             time.sleep(1)  # Retry after a longer delay
 
+def event_dict(device, event):
+    """Event as served by the API and written to the events log"""
+    return {
+        "type": event["type"],
+        "device": device.id,
+        "timestamp": datetime.fromtimestamp(samples.wall_time(event["start"])).isoformat(),
+        "start": samples.wall_time(event["start"]),
+        "end": samples.wall_time(event["end"]) if event["end"] is not None else None,
+        "duration": (event["end"] - event["start"]) / 1e9 if event["end"] is not None else None,
+        "peak": event["peak"],
+        "unit": event["unit"]
+    }
+
+def gap_dict(device, gap):
+    """Gap as served by the API and written to the gaps log"""
+    return {
+        "device": device.id,
+        "timestamp": datetime.fromtimestamp(samples.wall_time(gap["start"])).isoformat(),
+        "start": samples.wall_time(gap["start"]),
+        "end": samples.wall_time(gap["end"]) if gap["end"] is not None else None,
+        "duration": (gap["end"] - gap["start"]) / 1e9 if gap["end"] is not None else None,
+        "reason": gap["reason"],
+        "attempts": gap["attempts"],
+        "sensor_resets": gap["sensor_resets"],
+        "bus_resets": gap["bus_resets"]
+    }
+
+def record_gap(device, gap):
+    """Mark a closed gap in the data log and append it to the gaps log"""
+    item = gap_dict(device, gap)
+    logger.warning(f"Sensor {device.id} recovered after {item['duration']:.3f} s without data "
+                   f"({item['reason']}; {item['sensor_resets']} sensor, {item['bus_resets']} bus resets)")
+    if data_log is not None:
+        data_log.mark({
+            "timestamp": item["timestamp"],
+            "device": device.id,
+            "gap": {key: item[key] for key in ("end", "duration", "reason")}
+        })
+    try:
+        with open(device.watchdog.file, "a") as f:
+            f.write(json.dumps(item) + "\n")
+    except OSError as e:
+        logger.error(f"Error writing gaps log: {e}")
+
+def read_gaps_file(path):
+    """Gaps written by record_gap() (possibly in the acquisition process), oldest first"""
+    found = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                try:
+                    found.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+    except OSError:
+        pass
+    return found
+
+def log_event(device, event):
+    """Append a finished event to the events log (one JSON object per line)"""
+    item = event_dict(device, event)
+    logger.info(f"Event {item['type']} on {device.id}: {item['duration']:.3f} s, peak {item['peak']:.2f} {item['unit']}")
+    try:
+        with open(device.events.file, "a") as f:
+            f.write(json.dumps(item) + "\n")
+    except OSError as e:
+        logger.error(f"Error writing event log: {e}")
+
+def save_capture(device, finished):
+    """Write the full-rate samples around one or more events to their own capture file"""
+    directory = device.capture.directory
+    trigger = finished["events"][0]
+    stamp = datetime.fromtimestamp(samples.wall_time(trigger["start"])).strftime("%Y%m%d-%H%M%S-%f")
+    name = f"{device.id}_{trigger['type']}_{stamp}.json"
+    # The raw readings let the capture be recalibrated or filtered differently later
+    readings = []
+    for t_ns, row, raw in zip(finished["t_ns"].tolist(), finished["values"].tolist(), finished["raw"].tolist()):
+        sample = samples.Sample(t_ns, *row, raw=None if math.isnan(raw[0]) else raw)
+        readings.append(sample.to_dict(orientation=False, raw=True))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, name), "w") as f:
+            json.dump({
+                "device": device.id,
+                "events": [event_dict(device, event) for event in finished["events"]],
+                "start": samples.wall_time(finished["from"]),
+                "end": samples.wall_time(finished["to"]),
+                "truncated": finished["truncated"],
+                "readings": readings
+            }, f, indent=2)
+        logger.info(f"Saved capture {name} ({len(readings)} samples)")
+        # Keep only the newest max_captures files
+        for old in list_captures(directory)[:-device.capture.max_captures]:
+            os.remove(os.path.join(directory, old["name"]))
+    except OSError as e:
+        logger.error(f"Error writing capture {name}: {e}")
+
+def list_captures(directory):
+    """Capture files in directory, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    found = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".json") and os.path.isfile(path):
+            stat = os.stat(path)
+            found.append({
+                "name": name,
+                "size": stat.st_size,
+                "created": datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+    found.sort(key=lambda item: item["created"])
+    return found
+
+def ring_reader_thread(config, poll_interval=0.05):
+    """Feed the samples the acquisition process writes to the ring to the analysis stages"""
+    seq = sample_ring.head
+    by_index = list(registry)
+    context = pipeline_context(config)
+    for device in by_index:
+        device.pipeline = pipeline.create_pipeline(config["pipeline"], device, context, ("analysis",))
+    config_mtime = reload_calibration(by_index, None)
+    while running:
+        profiling.checkpoint()
+        # Keep the reader-side calibration in step with the acquisition process
+        config_mtime = reload_calibration(by_index, config_mtime)
+        head = sample_ring.head
+        if head > seq:
+            records = sample_ring.records_between(seq, head)
+            for index in np.unique(records["device"]).tolist():
+                device = by_index[index]
+                device.pipeline.run(pipeline.Batch.from_records(device, records[records["device"] == index]))
+            seq = head
+        time.sleep(poll_interval)
+
+def acquisition_process(ring_name, backend, rate_hz, stop_event, log_queue, log_settings):
+    """Entry point of the separate acquisition process.
+
+    Runs the device workers and publishes every reading into the shared
+    ring, so sampling never competes with web requests for the GIL. Log
+    records go to the parent, which owns the (rotating) log file.
+    """
+    global sample_ring, running
+    logqueue.log_to_queue(log_queue, log_settings)
+    # Ctrl+C reaches the whole process group; the parent stops us via stop_event
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    sample_ring = shm_ring.SampleRing.attach(ring_name)
+    threading.Thread(target=sensor_thread, args=(backend, rate_hz), daemon=True).start()
+    while not stop_event.wait(load_config()["sensor"]["status_interval"]):
+        publish_status()
+    running = False
+    time.sleep(0.2)  # Let workers finish their current iteration
+    if data_log is not None:
+        data_log.close()
+    sample_ring.close()
+
+def publish_status():
+    """In the acquisition process: share its metrics, data log and watchdog state with the parent"""
+    if data_log is not None:
+        collect_data_log_metrics()
+    watchdogs = {}
+    for device in registry or []:
+        if device.watchdog is not None:
+            gap = device.watchdog.gap
+            watchdogs[device.id] = {
+                "state": device.watchdog.describe(),
+                "open_gap": gap_dict(device, gap) if gap is not None else None
+            }
+    sample_ring.publish_status({
+        "metrics": {metric.name: metric.state() for metric in ACQUISITION_METRICS},
+        "data_log": data_log.describe() if data_log is not None else None,
+        "watchdog": watchdogs
+    })
+
+def acquisition_status():
+    """What the acquisition process published last ({} in thread mode or before its first update)"""
+    if sample_ring is None:
+        return {}
+    return sample_ring.status() or {}
+
+def start_acquisition_process(backend, rate_hz, config):
+    """Create the shared ring, start the acquisition process and a reader-side registry"""
+    global sample_ring, registry
+    registry, config = init_devices(backend, rate_hz, open_devices=False)
+    if len(registry) > shm_ring.MAX_DEVICES:
+        raise ValueError(f"At most {shm_ring.MAX_DEVICES} devices are supported in process mode")
+    warm_start(config)
+    sample_ring = shm_ring.SampleRing.create(config["sensor"]["ring_capacity"])
+    stop_event = multiprocessing.Event()
+    # The child logs into the queue our listener reads, so one thread writes the log file
+    log_queue = logqueue.share_queue()
+    process = multiprocessing.Process(target=acquisition_process, name="mpu6050-acquisition",
+                                      args=(sample_ring.name, backend, rate_hz, stop_event,
+                                            log_queue, config["logging"]), daemon=True)
+    process.start()
+    logger.info(f"Acquisition process started (pid {process.pid}, ring {sample_ring.name})")
+    threading.Thread(target=ring_reader_thread, args=(config,), name="ring-reader", daemon=True).start()
+    return process, stop_event
+
+def current_snapshot():
+    """Latest (version, Sample) of the primary sensor, from the shared ring in process mode"""
+    if sample_ring is not None:
+        latest = sample_ring.latest(0)
+        if latest is None:
+            return 0, None
+        seq, sample = latest
+        return seq + 1, sample
+    if registry is None or registry.primary is None:
+        return 0, None
+    return registry.primary.snapshot.read()
+
+def wait_for_snapshot(version, timeout=None):
+    """Block until the primary sensor publishes a sample newer than version"""
+    if sample_ring is None and registry is not None and registry.primary is not None:
+        return registry.primary.snapshot.wait(version, timeout)
+    # The ring is written by another process, so all we can do is check it often
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        current = current_snapshot()
+        if current[0] != version or (deadline is not None and time.monotonic() >= deadline):
+            return current
+        time.sleep(0.005)
+
+def current_stats():
+    """Running statistics of every sensor, keyed by device id"""
+    return {device.id: device.stats.snapshot() for device in registry or [] if device.stats is not None}
+
+def current_pipeline_timings():
+    """Per-stage pipeline timing of every sensor, keyed by device id"""
+    return {device.id: device.pipeline.timings() for device in registry or [] if device.pipeline is not None}
+
+def current_sensor_data():
+    """Latest reading of the primary sensor as the dict served by /data"""
+    version, sample = current_snapshot()
+    if sample is None:
+        sample = samples.Sample(0, 0, 0, 0, 0, 0, 0, 0)
+    return sample.to_dict(timestamp=False)
+
 #######################################
-def run_console_mode(mpu, config):
+def run_console_mode(config):
     """Run in console mode showing sensor data"""
     global running
+    interval = 1.0 / config["console"]["fps"]
+    renderer = console.Renderer(redraw_interval=config["console"]["redraw_interval"])
     
     try:
-        while running:
-            # Get sensor data
-            data = sensor_data
-            
-            # Get direction arrows
-            ax = data["acceleration"]["x"]
-            ay = data["acceleration"]["y"]
-            az = data["acceleration"]["z"]
-            
-            gx = data["gyro"]["x"]
-            gy = data["gyro"]["y"]
-            gz = data["gyro"]["z"]
-            
-            temp = data["temperature"]
-            temp_f = (temp * 9/5) + 32
-            
-            # Direction arrows
-            acc_x_arrow = get_horizontal_arrow(ax)
-            acc_y_arrow = get_vertical_arrow(ay)
-            acc_z_arrow = get_horizontal_arrow(az)
-            
-            gyro_x_arrow = get_vertical_arrow(gx)
-            gyro_y_arrow = get_vertical_arrow(gy)
-            gyro_z_arrow = get_horizontal_arrow(gz)
-            
-            overall_direction = get_direction_arrow(ax, ay)
-            
-            # Clear screen
-            os.system('clear')
-            
-            # Display header
-            print("╔════════════════════════════════════════════════════════════╗")
-            print("║               MPU6050 MONITOR v1.0.3                       ║")
-            print("╠════════════════════════════════════════════════════════════╣")
-            
-            # One line status display as requested
-            print(f"║ Accel(m/s²) X: {ax:6.2f}{acc_x_arrow} Y: {ay:6.2f}{acc_y_arrow} Z: {az:6.2f}{acc_z_arrow} | ", end='')
-            print(f"Gyro(rad/s) X: {gx:6.2f}{gyro_x_arrow} Y: {gy:6.2f}{gyro_y_arrow} Z: {gz:6.2f}{gyro_z_arrow} | ", end='')
-            print(f"Temp: {temp:5.1f}°C / {temp_f:5.1f}°F ║")
-            
-            # Additional info
-            print("╠════════════════════════════════════════════════════════════╣")
-            print(f"║ Direction: {overall_direction}                                               ║")
-            print(f"║ Web Interface: http://localhost:5000                       ║")
-            print("╠════════════════════════════════════════════════════════════╣")
-            print("║ [c] Calibrate  [q] Quit                                    ║")
-            print("╚════════════════════════════════════════════════════════════╝")
-            
-            # Wait for keypress with timeout
-            import select
-            import sys
-            
-            # Check for keypresses (non-blocking)
-            if select.select([sys.stdin], [], [], 0) == ([sys.stdin], [], []):
-                key = sys.stdin.read(1)
-                if key.lower() == 'q':
-                    running = False
-                    break
-                elif key.lower() == 'c':
-                    calibrate_sensor(mpu)
-            
-            time.sleep(config["sample_rate"])
+        with console.KeyInput() as keys:
+            renderer.start()
+            next_frame = time.monotonic()
+            while running:
+                profiling.checkpoint()
+                renderer.draw(console_frame())
+                
+                # Wait for the next frame, handling keys as they come in
+                next_frame += interval
+                now = time.monotonic()
+                if next_frame < now:
+                    next_frame = now  # Fell behind, don't try to catch up in a burst
+                while running and now < next_frame:
+                    key = (keys.read(next_frame - now) or "").lower()
+                    if key == 'q':
+                        running = False
+                    elif key == 'c' and registry and registry.primary:
+                        # Runs in the background; progress shows up on the next frames
+                        try:
+                            calibrate_sensor(registry.primary)
+                        except RuntimeError as e:
+                            logger.warning(str(e))
+                    now = time.monotonic()
             
     except KeyboardInterrupt:
         running = False
+    finally:
+        renderer.stop()
         print("\nExiting...")
 
+def console_frame():
+    """Lines of one console frame"""
+    # Get sensor data
+    data = current_sensor_data()
+    
+    # Get direction arrows
+    ax = data["acceleration"]["x"]
+    ay = data["acceleration"]["y"]
+    az = data["acceleration"]["z"]
+    
+    gx = data["gyro"]["x"]
+    gy = data["gyro"]["y"]
+    gz = data["gyro"]["z"]
+    
+    temp = data["temperature"]
+    temp_f = (temp * 9/5) + 32
+    
+    # Direction arrows
+    acc_x_arrow = get_horizontal_arrow(ax)
+    acc_y_arrow = get_vertical_arrow(ay)
+    acc_z_arrow = get_horizontal_arrow(az)
+    
+    gyro_x_arrow = get_vertical_arrow(gx)
+    gyro_y_arrow = get_vertical_arrow(gy)
+    gyro_z_arrow = get_horizontal_arrow(gz)
+    
+    overall_direction = get_direction_arrow(ax, ay)
+    
+    lines = [
+        "╔════════════════════════════════════════════════════════════╗",
+        "║               MPU6050 MONITOR v1.0.3                       ║",
+        "╠════════════════════════════════════════════════════════════╣",
+        # Status, one line per quantity so every line fits the box
+        f"║ {f'Accel(m/s²) X: {ax:6.2f}{acc_x_arrow} Y: {ay:6.2f}{acc_y_arrow} Z: {az:6.2f}{acc_z_arrow}':<58} ║",
+        f"║ {f'Gyro(rad/s) X: {gx:6.2f}{gyro_x_arrow} Y: {gy:6.2f}{gyro_y_arrow} Z: {gz:6.2f}{gyro_z_arrow}':<58} ║",
+        f"║ {f'Temp: {temp:5.1f}°C / {temp_f:5.1f}°F':<58} ║",
+        # Additional info
+        "╠════════════════════════════════════════════════════════════╣",
+        f"║ Direction: {overall_direction}                                               ║"
+    ]
+    lines.extend(trend_panel_lines())
+    lines.extend(stats_panel_lines())
+    lines.extend(calibration_status_lines())
+    lines.extend([
+        "║ Web Interface: http://localhost:5000                       ║",
+        "╠════════════════════════════════════════════════════════════╣",
+        "║ [c] Calibrate  [q] Quit                                    ║",
+        "╚════════════════════════════════════════════════════════════╝"
+    ])
+    return lines
+
+def calibration_status_lines():
+    """Progress of the primary sensor's latest calibration job, while it runs and shortly after"""
+    primary = registry.primary if registry else None
+    jobs = [job for job in calibration_jobs.values() if primary is not None and job.device is primary]
+    if not jobs:
+        return []
+    job = jobs[-1]
+    if job.state == "collecting":
+        text = f"Calibrating ({job.mode}): {job.elapsed:4.1f}/{job.duration:g} s, keep still"
+    elif job.state == "fitting":
+        text = "Calibrating: fitting..."
+    elif time.time() - job.created > job.duration + 10:
+        return []
+    elif job.state == "done":
+        text = "Calibration complete!"
+    else:
+        text = f"Calibration failed: {job.error}"
+    return [
+        "╠════════════════════════════════════════════════════════════╣",
+        f"║ {text[:58]:<58} ║"
+    ]
+
+def trend_panel_lines():
+    """Sparklines with min/max/mean of the primary sensor's last seconds"""
+    primary = registry.primary if registry else None
+    if primary is None or primary.trend is None:
+        return []
+    means, lows, highs, averages = primary.trend.snapshot()
+    title = f"Last {primary.trend.seconds:g}s"
+    header = f"{title:<{primary.trend.width + 3}} {'min':>7} {'max':>7} {'mean':>7}"
+    lines = [
+        "╠════════════════════════════════════════════════════════════╣",
+        f"║ {header[:58]:<58} ║"
+    ]
+    for i, label in enumerate(("AX", "AY", "AZ", "GX", "GY", "GZ")):
+        spark = trend.sparkline(means[:, i].tolist(), lows[i], highs[i])
+        text = f"{label:<3} {spark} {lows[i]:7.2f} {highs[i]:7.2f} {averages[i]:7.2f}"
+        lines.append(f"║ {text[:58]:<58} ║")
+    return lines
+
+def stats_panel_lines():
+    """Windowed statistics of the primary sensor for the console"""
+    primary = registry.primary if registry else None
+    if primary is None or primary.stats is None or not primary.stats.windows:
+        return []
+    seconds = primary.stats.windows[0]
+    window = primary.stats.window(seconds)
+    if window is None:
+        return []
+    title = f"Last {seconds:g}s"
+    lines = [
+        "╠════════════════════════════════════════════════════════════╣",
+        f"║ {title:<10}   mean      std      min      max      p95      ║"
+    ]
+    for label, channel in (("Accel X", "accel_x"), ("Accel Y", "accel_y"), ("Accel Z", "accel_z"),
+                           ("Gyro X", "gyro_x"), ("Gyro Y", "gyro_y"), ("Gyro Z", "gyro_z")):
+        axis = window[channel]
+        lines.append(f"║ {label:<8}{axis['mean']:8.3f} {axis['std']:8.3f} {axis['min']:8.3f} "
+                     f"{axis['max']:8.3f} {axis.get('p95', math.nan):8.3f}       ║")
+    return lines
+
 #######################################
 
 
@@ -317,16 +998,11 @@ def index():
 
 @app.route('/data')
 def get_data():
-    return jsonify(sensor_data)
+    return jsonify(current_sensor_data())
 
 @app.route('/logdata')
 def get_log_data():
-    config = load_config()
-    try:
-        with open(config["data_file"], "r") as f:
-            return jsonify(json.load(f))
-    except (FileNotFoundError, json.JSONDecodeError):
-        return jsonify({"readings": []})
+    return jsonify(read_data_file(load_config()))
 
 @app.route('/download')
 def download_data():
@@ -340,7 +1016,7 @@ def api_get_data():
     return jsonify({
         "version": "1.0.3",
         "timestamp": datetime.now().isoformat(),
-        "data": sensor_data
+        "data": current_sensor_data()
     })
 
 @app.route('/api/v1/status')
@@ -352,47 +1028,464 @@ def api_get_status():
         "uptime": time.time() - start_time,
         "calibrated": config["calibration"]["calibrated"],
         "sample_rate": config["sample_rate"],
-        "data_file": config["data_file"]
+        "data_file": config["data_file"],
+        "stats": current_stats(),
+        "pipeline": current_pipeline_timings(),
+        "data_log": data_log.describe() if data_log is not None else acquisition_status().get("data_log"),
+        "logging": logqueue.describe(),
+        "warm_start": warm_start_info
     })
 
 @app.route('/api/v1/log')
 def api_get_log():
     """API endpoint to get logged data"""
-    config = load_config()
-    try:
-        with open(config["data_file"], "r") as f:
-            content = f.read().strip()
-            if content:
-                return jsonify(json.loads(content))
-            else:
-                return jsonify({"readings": []})
-    except (FileNotFoundError, json.JSONDecodeError):
-        return jsonify({"readings": []})
+    return jsonify(read_data_file(load_config()))
 
 @app.route('/api/v1/calibrate', methods=['POST'])
 def api_calibrate():
-    """API endpoint to trigger calibration"""
-    global sensor_data
-    
-    # We can't directly calibrate the sensor here as it requires console input
-    # So just return the current calibration values
+    """API endpoint to start a background calibration job.
+
+    JSON body (all optional): {"device": id, "mode": "ellipsoid" | "level",
+    "duration": seconds, "apply": true}. Poll /api/v1/calibrate/<job id>.
+    For "ellipsoid", rest the sensor in at least 6 orientations (9+ for
+    cross-axis terms) during the job; for "level", keep it still with z up.
+    """
+    params = request.get_json(silent=True) or {}
+    device_id = params.get("device")
+    device = (registry.get(device_id) if device_id else registry.primary) if registry else None
+    if device is None:
+        return jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404
+    try:
+        job = calibrate_sensor(device, params.get("mode", "ellipsoid"), params.get("duration"),
+                               params.get("apply", True))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"status": "error", "message": str(e)}), 409
+    return jsonify({
+        "status": "success",
+        "message": f"Calibration job {job.id} started",
+        "job": job.describe(),
+        "calibration": device.calibration
+    }), 202
+
+@app.route('/api/v1/calibrate', methods=['GET'])
+def api_get_calibration():
+    """API endpoint to get the calibration of every sensor and recent jobs"""
+    return jsonify({
+        "version": "1.0.3",
+        "calibration": {device.id: device.calibration for device in registry or []},
+        "jobs": [job.describe() for job in calibration_jobs.values()]
+    })
+
+@app.route('/api/v1/calibrate/<job_id>')
+def api_get_calibration_job(job_id):
+    """API endpoint to poll a calibration job"""
+    job = calibration_jobs.get(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": f"Unknown calibration job: {job_id}"}), 404
+    return jsonify({
+        "version": "1.0.3",
+        "job": job.describe()
+    })
+
+@app.route('/api/v1/devices')
+def api_get_devices():
+    """API endpoint to list configured sensors"""
+    watchdogs = acquisition_status().get("watchdog", {})
+    described = []
+    for device in registry or []:
+        info = device.describe()
+        if sample_ring is not None:
+            info.update(sample_ring.device_stats(device.index))
+            info["watchdog"] = watchdogs.get(device.id, {}).get("state")
+        described.append(info)
+    return jsonify({
+        "version": "1.0.3",
+        "devices": described
+    })
+
+@app.route('/api/v1/devices/<device_id>/data')
+def api_get_device_data(device_id):
+    """API endpoint to get current data of one sensor"""
+    device = registry.get(device_id) if registry else None
+    if device is None:
+        return jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404
+    sample = device.latest
+    if sample_ring is not None:
+        latest = sample_ring.latest(device.index)
+        sample = latest[1] if latest else None
+    return jsonify({
+        "version": "1.0.3",
+        "timestamp": datetime.now().isoformat(),
+        "device": device_id,
+        "data": sample.to_dict() if sample else None
+    })
+
+@app.route('/api/v1/devices/merged')
+def api_get_merged_data():
+    """API endpoint to get readings of all sensors aligned by timestamp.
+
+    Poll with ?since=<t of the last row> to follow the merged stream.
+    """
+    if not registry:
+        return jsonify({"version": "1.0.3", "reference": None, "readings": []})
+    since = request.args.get("since", type=float)
+    tolerance = request.args.get("tolerance", type=float)
+    timelines = None
+    if sample_ring is not None:
+        ids = [device.id for device in registry]
+        timelines = {device_id: [] for device_id in ids}
+        for sample in sample_ring.since(0):
+            timelines[ids[sample.device]].append(sample)
+    since_ns = samples.monotonic_ns(since) if since is not None else None
+    rows = registry.merged(since_ns, tolerance, timelines)
+    return jsonify({
+        "version": "1.0.3",
+        "reference": registry.primary.id,
+        "readings": [{
+            "t": samples.wall_time(t_ns),
+            "devices": {device_id: sample.to_dict() if sample else None for device_id, sample in row.items()}
+        } for t_ns, row in rows]
+    })
+
+@app.route('/api/v1/stream')
+def api_stream():
+    """Server-sent events stream of the primary sensor, one event per new sample.
+
+    ?rate=<Hz> caps the event rate (default 20); samples in between are skipped.
+    """
+    max_rate = request.args.get("rate", default=20.0, type=float)
+    interval = 1.0 / max_rate if max_rate > 0 else 0
+
+    def generate():
+        clients = STREAM_CLIENTS.labels()
+        clients.inc()
+        try:
+            version = 0
+            while running:
+                profiling.checkpoint()
+                new_version, sample = wait_for_snapshot(version, timeout=5.0)
+                if new_version == version or sample is None:
+                    yield ": keepalive\n\n"
+                    continue
+                version = new_version
+                yield f"id: {version}\ndata: {json.dumps(sample.to_dict())}\n\n"
+                if interval:
+                    time.sleep(interval)
+        finally:
+            clients.dec()
+
+    return Response(generate(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache"})
+
+@app.route('/api/v1/spectrum')
+def api_get_spectrum():
+    """API endpoint to get the averaged acceleration spectrum of a sensor.
+
+    ?device=<id> selects the sensor (default: primary).
+    """
+    device_id = request.args.get("device")
+    device = (registry.get(device_id) if device_id else registry.primary) if registry else None
+    if device is None:
+        return jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404
+    if device.spectrum is None:
+        return jsonify({"status": "error", "message": "Spectrum analysis is disabled"}), 404
+    return jsonify({
+        "version": "1.0.3",
+        "timestamp": datetime.now().isoformat(),
+        "device": device.id,
+        "spectrum": device.spectrum.snapshot()
+    })
+
+@app.route('/api/v1/events')
+def api_get_events():
+    """API endpoint to get detected motion events, oldest first.
+
+    ?since=<wall s> returns events ending after since (plus ongoing ones),
+    ?type=<shock|free_fall|tilt|stillness> and ?device=<id> filter them.
+    """
+    since = request.args.get("since", type=float)
+    kind = request.args.get("type")
+    device_id = request.args.get("device")
+    if device_id and (not registry or registry.get(device_id) is None):
+        return jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404
+    since_ns = samples.monotonic_ns(since) if since is not None else None
+    found = []
+    for device in registry or []:
+        if device.events is None or (device_id and device.id != device_id):
+            continue
+        found.extend(event_dict(device, event) for event in device.events.events(since_ns, kind))
+    found.sort(key=lambda event: event["start"])
+    return jsonify({
+        "version": "1.0.3",
+        "timestamp": datetime.now().isoformat(),
+        "events": found
+    })
+
+@app.route('/api/v1/gaps')
+def api_get_gaps():
+    """API endpoint to get the gaps in the data (failed or stuck reads until recovery), oldest first.
+
+    ?since=<wall s> returns gaps ending after since (plus an open one) and
+    ?device=<id> selects a sensor. With --acquisition-process the closed
+    gaps are read from the gaps log and the open ones come from the status
+    the acquisition process publishes.
+    """
+    since = request.args.get("since", type=float)
+    device_id = request.args.get("device")
+    if device_id and (not registry or registry.get(device_id) is None):
+        return jsonify({"status": "error", "message": f"Unknown device: {device_id}"}), 404
+    if sample_ring is not None:
+        found = [gap for gap in read_gaps_file(load_config()["watchdog"]["file"])
+                 if (not device_id or gap["device"] == device_id) and (since is None or gap["end"] > since)]
+        for published_id, published in acquisition_status().get("watchdog", {}).items():
+            if published["open_gap"] is not None and (not device_id or published_id == device_id):
+                found.append(published["open_gap"])
+    else:
+        since_ns = samples.monotonic_ns(since) if since is not None else None
+        found = []
+        for device in registry or []:
+            if device.watchdog is None or (device_id and device.id != device_id):
+                continue
+            found.extend(gap_dict(device, gap) for gap in device.watchdog.gaps_list(since_ns))
+    found.sort(key=lambda gap: gap["start"])
+    return jsonify({
+        "version": "1.0.3",
+        "timestamp": datetime.now().isoformat(),
+        "gaps": found
+    })
+
+@app.route('/api/v1/captures')
+def api_get_captures():
+    """API endpoint to list the saved event captures, oldest first"""
     config = load_config()
-    
+    return jsonify({
+        "version": "1.0.3",
+        "captures": list_captures(config["capture"]["directory"])
+    })
+
+@app.route('/api/v1/captures/<name>')
+def api_download_capture(name):
+    """API endpoint to download one capture file"""
+    config = load_config()
+    path = os.path.join(config["capture"]["directory"], os.path.basename(name))
+    if not name.endswith(".json") or not os.path.isfile(path):
+        return jsonify({"status": "error", "message": f"Unknown capture: {name}"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+def profiling_token_required(view):
+    """Reject requests without the configured profiling token (endpoints off when none is set)"""
+    @functools.wraps(view)
+    def check(*args, **kwargs):
+        token = load_config()["profiling"]["token"]
+        if not token:
+            return jsonify({"status": "error",
+                            "message": "Profiling is disabled; set profiling.token in config.json"}), 403
+        given = request.headers.get("Authorization", "")
+        if not hmac.compare_digest(given.encode(), f"Bearer {token}".encode()):
+            return jsonify({"status": "error", "message": "Invalid or missing profiling token"}), 401
+        return view(*args, **kwargs)
+    return check
+
+@app.route('/api/v1/profile', methods=['POST'])
+@profiling_token_required
+def api_start_profile():
+    """API endpoint to profile all threads for a number of seconds.
+
+    JSON body (all optional): {"mode": "cprofile" | "sampling", "seconds": 10,
+    "interval": seconds between samples}. Poll /api/v1/profile/<id>.
+    """
+    settings = load_config()["profiling"]
+    params = request.get_json(silent=True) or {}
+    mode = params.get("mode", "sampling")
+    if mode not in profiling.MODES:
+        return jsonify({"status": "error", "message": f"Unknown profiling mode: {mode}"}), 400
+    try:
+        seconds = float(params.get("seconds", 10))
+        interval = float(params.get("interval", settings["sampling_interval"]))
+    except (TypeError, ValueError):
+        return jsonify({"status": "error", "message": "seconds and interval must be numbers"}), 400
+    if not 0 < seconds <= settings["max_seconds"] or interval <= 0:
+        return jsonify({"status": "error",
+                        "message": f"seconds must be between 0 and {settings['max_seconds']}"}), 400
+    with profile_lock:
+        if any(session.state == "running" for session in profile_sessions.values()):
+            return jsonify({"status": "error", "message": "A profiling run is already in progress"}), 409
+        if mode == "cprofile":
+            session = profiling.CProfileSession(seconds, settings["directory"])
+        else:
+            session = profiling.SamplingSession(seconds, settings["directory"], interval)
+        profile_sessions[session.id] = session
+        while len(profile_sessions) > settings["keep"]:
+            old = profile_sessions.pop(next(iter(profile_sessions)))
+            for path in old.files.values():
+                if os.path.exists(path):
+                    os.remove(path)
+    session.start()
+    logger.info(f"Profiling run {session.id} ({mode}, {seconds:g} s) started")
     return jsonify({
         "status": "success",
-        "message": "Current calibration values returned. Use console mode for full calibration.",
-        "calibration": config["calibration"]
+        "message": f"Profiling run {session.id} started",
+        "profile": session.describe()
+    }), 202
+
+@app.route('/api/v1/profile', methods=['GET'])
+@profiling_token_required
+def api_get_profiles():
+    """API endpoint to list profiling runs and the tracemalloc state"""
+    return jsonify({
+        "version": "1.0.3",
+        "profiles": [session.describe() for session in profile_sessions.values()],
+        "memory": memory_tracker.describe()
     })
 
+@app.route('/api/v1/profile/<profile_id>')
+@profiling_token_required
+def api_get_profile(profile_id):
+    """API endpoint to poll a profiling run; includes a text summary once done"""
+    session = profile_sessions.get(profile_id)
+    if session is None:
+        return jsonify({"status": "error", "message": f"Unknown profiling run: {profile_id}"}), 404
+    return jsonify({
+        "version": "1.0.3",
+        "profile": session.describe(),
+        "summary": session.summary
+    })
+
+@app.route('/api/v1/profile/<profile_id>/stop', methods=['POST'])
+@profiling_token_required
+def api_stop_profile(profile_id):
+    """API endpoint to end a profiling run early"""
+    session = profile_sessions.get(profile_id)
+    if session is None:
+        return jsonify({"status": "error", "message": f"Unknown profiling run: {profile_id}"}), 404
+    session.stop()
+    return jsonify({"status": "success", "message": f"Profiling run {profile_id} stopping"})
+
+@app.route('/api/v1/profile/<profile_id>/download')
+@profiling_token_required
+def api_download_profile(profile_id):
+    """API endpoint to download a profiling result.
+
+    ?format=pstats (cprofile), collapsed (sampling, for flamegraph.pl or
+    speedscope) or text; defaults to the run's main format.
+    """
+    session = profile_sessions.get(profile_id)
+    if session is None:
+        return jsonify({"status": "error", "message": f"Unknown profiling run: {profile_id}"}), 404
+    fmt = request.args.get("format", "pstats" if session.mode == "cprofile" else "collapsed")
+    path = session.files.get(fmt)
+    if path is None or not os.path.isfile(path):
+        return jsonify({"status": "error", "message": f"No {fmt} result for profiling run {profile_id}"}), 404
+    return send_file(os.path.abspath(path), as_attachment=True)
+
+@app.route('/api/v1/profile/memory', methods=['POST'])
+@profiling_token_required
+def api_memory_snapshot():
+    """API endpoint to take a tracemalloc snapshot (tracing starts with the first one)"""
+    limit = request.args.get("limit", default=20, type=int)
+    snapshot_id = memory_tracker.snapshot()
+    return jsonify({
+        "version": "1.0.3",
+        "snapshot": snapshot_id,
+        "memory": memory_tracker.describe(),
+        "top": memory_tracker.top(snapshot_id, limit)
+    })
+
+@app.route('/api/v1/profile/memory/diff')
+@profiling_token_required
+def api_memory_diff():
+    """API endpoint to compare two snapshots: ?from=<id>&to=<id>&limit=20"""
+    first = request.args.get("from", type=int)
+    second = request.args.get("to", type=int)
+    limit = request.args.get("limit", default=20, type=int)
+    if first not in memory_tracker.snapshots or second not in memory_tracker.snapshots:
+        return jsonify({"status": "error", "message": "Unknown snapshot id in from/to"}), 404
+    return jsonify({
+        "version": "1.0.3",
+        "from": first,
+        "to": second,
+        "diff": memory_tracker.diff(first, second, limit)
+    })
+
+@app.route('/api/v1/profile/memory', methods=['DELETE'])
+@profiling_token_required
+def api_memory_stop():
+    """API endpoint to stop tracemalloc and drop its snapshots"""
+    memory_tracker.stop()
+    return jsonify({"status": "success", "message": "Memory tracing stopped"})
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of acquisition, persistence and HTTP metrics"""
+    return Response(metrics_registry.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    started = g.get("request_started")
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_SECONDS.labels(route=route, method=request.method,
+                            status=response.status_code).observe(time.perf_counter() - started)
+    return response
+
+# Previous (samples, time) per device for the sample rate gauge
+_rate_marks = {}
+
+@metrics_registry.collector
+def collect_metrics():
+    """Copy counters kept elsewhere (devices, ring, data log, pipelines) into the metrics"""
+    now = time.monotonic()
+    published = acquisition_status()
+    # In process mode the watchdogs run in the acquisition process
+    watchdogs = {device_id: item["state"] for device_id, item in published.get("watchdog", {}).items()}
+    for device in registry or []:
+        count, errors = device.samples, device.errors
+        if sample_ring is not None:
+            ring_stats = sample_ring.device_stats(device.index)
+            count, errors = ring_stats["samples"], ring_stats["errors"]
+        SAMPLES_TOTAL.labels(device=device.id).value = count
+        READ_ERRORS_TOTAL.labels(device=device.id).value = errors
+        watchdog = device.watchdog.describe() if device.watchdog is not None else watchdogs.get(device.id)
+        if watchdog is not None:
+            GAPS_TOTAL.labels(device=device.id).value = watchdog["gaps"]
+            GAP_SECONDS.labels(device=device.id).value = watchdog["lost_seconds"]
+            RESETS_TOTAL.labels(device=device.id, kind="sensor").value = watchdog["sensor_resets"]
+            RESETS_TOTAL.labels(device=device.id, kind="bus").value = watchdog["bus_resets"]
+        last = _rate_marks.get(device.id)
+        if last is None or now - last[1] >= 1.0:
+            if last is not None:
+                SAMPLE_RATE.labels(device=device.id).set((count - last[0]) / (now - last[1]))
+            _rate_marks[device.id] = (count, now)
+        if device.pipeline is not None:
+            for stage in device.pipeline.timings():
+                PIPELINE_SECONDS.labels(device=device.id, stage=stage["stage"]).value = stage["total_ms"] / 1e3
+    if data_log is not None:
+        collect_data_log_metrics()
+    elif sample_ring is not None:
+        # Process mode: the acquisition process owns these, take its last published values
+        for metric in ACQUISITION_METRICS:
+            metric.load_state(published.get("metrics", {}).get(metric.name, []))
+    log_counters = logqueue.describe()
+    LOG_DROPPED.labels().value = log_counters["dropped"]
+    LOG_SUPPRESSED.labels().value = log_counters["suppressed"]
+
+def collect_data_log_metrics():
+    DATA_LOG_BYTES.labels().value = data_log.bytes_written
+    DATA_LOG_READINGS.labels().value = data_log.readings
+    DATA_LOG_DROPPED.labels().value = data_log.dropped
+    DATA_LOG_QUEUE.labels().set(data_log.pending.qsize())
+
 def start_web_server():
     """Start the Flask web server"""
-    # Configure logging to file only for werkzeug
+    # Only werkzeug errors are logged (through the queue handler), not every request
     log = logging.getLogger('werkzeug')
-    log.setLevel(logging.ERROR)  # Only log errors
-    file_handler = logging.FileHandler('web_server.log')
-    file_handler.setLevel(logging.ERROR)
-    log.addHandler(file_handler)
-    log.disabled = True  # Disable console output
+    log.setLevel(logging.ERROR)
     
     # Start the server
     logger.info("Starting web server at http://0.0.0.0:5000")
@@ -406,35 +1499,57 @@ def main():
     parser = argparse.ArgumentParser(description='MPU6050 Monitor')
     parser.add_argument('--web-only', action='store_true', help='Run in web mode only (no console)')
     parser.add_argument('--console-only', action='store_true', help='Run in console mode only (no web server)')
+    parser.add_argument('--simulate', action='store_true', help='Use the synthetic sensor backend instead of hardware')
+    parser.add_argument('--acquisition-process', action='store_true', help='Acquire in a separate process sharing data through shared memory')
+    parser.add_argument('--rate', type=float, help=f'Sample rate in Hz ({synthetic_sensor.MIN_RATE_HZ}-{synthetic_sensor.MAX_RATE_HZ}), overrides sample_rate')
     args = parser.parse_args()
+    backend = "synthetic" if args.simulate else None
+    if args.rate is not None and not synthetic_sensor.MIN_RATE_HZ <= args.rate <= synthetic_sensor.MAX_RATE_HZ:
+        parser.error(f"--rate must be between {synthetic_sensor.MIN_RATE_HZ} and {synthetic_sensor.MAX_RATE_HZ} Hz")
 
     # Set up signal handler for graceful shutdown
     signal.signal(signal.SIGINT, signal_handler)
+    logqueue.setup_logging(load_config()["logging"])
 
-    # Initialize sensor
-    mpu, config = init_sensor()
-
-    # Start sensor reading thread
-    sensor_daemon = threading.Thread(target=sensor_thread, daemon=True)
-    sensor_daemon.start()
-
-    # Start based on mode
-    if args.web_only:
-        # Web server only
-        start_web_server()
-    elif args.console_only:
-        # Console only
-        run_console_mode(mpu, config)
+    # Start sensor acquisition, in its own process or as a background thread.
+    # Sensors are opened there only, by init_devices(), so there is a single
+    # driver per sensor (in the acquisition process when one is used).
+    config = load_config()
+    acquisition = None
+    if args.acquisition_process or config["sensor"]["process"]:
+        acquisition = start_acquisition_process(backend, args.rate, config)
     else:
-        # Both console and web server
-        web_thread = threading.Thread(target=start_web_server, daemon=True)
-        web_thread.start()
+        sensor_daemon = threading.Thread(target=sensor_thread, args=(backend, args.rate), daemon=True)
+        sensor_daemon.start()
 
-        # Run console in main thread
-        run_console_mode(mpu, config)
+    try:
+        # Start based on mode
+        if args.web_only:
+            # Web server only
+            start_web_server()
+        elif args.console_only:
+            # Console only
+            run_console_mode(config)
+        else:
+            # Both console and web server
+            web_thread = threading.Thread(target=start_web_server, daemon=True)
+            web_thread.start()
 
-    # Cleanup
-    running = False
+            # Run console in main thread
+            run_console_mode(config)
+    finally:
+        # Cleanup. Ctrl+C reaches the whole process group and may arrive twice:
+        # a second SystemExit here would skip unlinking the ring and the log flush.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        running = False
+        if data_log is not None:
+            data_log.close()
+        if acquisition is not None:
+            process, stop_event = acquisition
+            stop_event.set()
+            process.join(timeout=2)
+            sample_ring.close()
+        logqueue.stop_logging()
     print("\nExiting MPU6050 Monitor...")
 
 if __name__ == "__main__":
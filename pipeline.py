@@ -0,0 +1,361 @@
+# pipeline.py - v1.0.3
+# Batched processing pipeline run by every acquisition worker
+
+import importlib
+import math
+import time
+
+import numpy as np
+
+import calibration
+import filters
+import samples
+
+# Default pipeline configuration, overridden by config["pipeline"]. Stages
+# run in order on every batch read from a sensor; an entry is a stage name or
+# {"type": name, ...stage settings}. Custom stages can be registered with
+# register_stage() or given as "module:Class".
+DEFAULT_PIPELINE = {
+    "stages": ["calibrate", "fuse", "record", "trend", "detect", "decimate", "sink"]
+}
+
+# Stage classes by name, see register_stage()
+STAGES = {}
+
+
+class Batch:
+    """Samples of one sensor read in one go, as NumPy arrays.
+
+    t_ns (n,) holds monotonic ns timestamps, raw (n, 7) the uncalibrated
+    (ax, ay, az, gx, gy, gz, temp) rows and values (n, 7) the processed
+    ones. q is the list of fused quaternions once the fuse stage ran.
+    Sample objects are only built when a stage needs them (to_samples()).
+    """
+
+    __slots__ = ("device", "t_ns", "raw", "values", "q", "samples")
+
+    def __init__(self, device, t_ns, raw, values=None, q=None, batch=None):
+        self.device = device
+        self.t_ns = t_ns
+        self.raw = raw
+        self.values = raw if values is None else values
+        self.q = q
+        self.samples = batch
+
+    @classmethod
+    def from_samples(cls, device, batch):
+        """Batch wrapping existing Samples (e.g. read back from the shared ring)"""
+        t_ns, values = samples.as_arrays(batch)
+        return cls(device, t_ns, None, values, batch=batch)
+
+    @classmethod
+    def from_records(cls, device, records):
+        """Batch of shm_ring records (structured array), without building Samples"""
+        q = records["q"]
+        if np.isnan(q[:, 0]).all():
+            q = None
+        else:
+            q = [None if math.isnan(row[0]) else tuple(row) for row in q.tolist()]
+        raw = records["raw"]
+        raw = None if np.isnan(raw[:, 0]).any() else np.ascontiguousarray(raw)
+        return cls(device, np.ascontiguousarray(records["t_ns"]), raw,
+                   np.ascontiguousarray(records["values"]), q=q)
+
+    def __len__(self):
+        return len(self.t_ns)
+
+    def to_samples(self):
+        """The batch as a list of Samples, built once"""
+        if self.samples is None:
+            values = self.values.tolist()
+            raw = self.raw.tolist() if self.raw is not None else [None] * len(values)
+            q = self.q or [None] * len(values)
+            self.samples = [samples.Sample(t, *row, q=qs, raw=r)
+                            for t, row, r, qs in zip(self.t_ns.tolist(), values, raw, q)]
+        return self.samples
+
+    def select(self, index):
+        """New batch holding the rows picked by an index array"""
+        picked = Batch(self.device, self.t_ns[index],
+                       self.raw[index] if self.raw is not None else None, self.values[index])
+        if self.q is not None:
+            picked.q = [self.q[i] for i in index.tolist()]
+        if self.samples is not None:
+            picked.samples = [self.samples[i] for i in index.tolist()]
+        return picked
+
+
+def register_stage(name):
+    """Class decorator making a stage available under name in config.json"""
+    def register(cls):
+        cls.name = name
+        STAGES[name] = cls
+        return cls
+    return register
+
+
+class Stage:
+    """Base class: process() takes a Batch and returns the batch for the next stage.
+
+    Returning None or an empty batch ends the pipeline for that batch.
+    Stages are built per sensor with the sensor's Device, the stage's
+    settings from config.json and the context dict of the monitor (shared
+    ring, data log, callbacks). side tells where the stage runs when
+    acquisition has its own process: "acquisition" stages run there,
+    "analysis" stages next to the web server.
+    """
+
+    name = None
+    side = "acquisition"
+
+    def __init__(self, device, settings, context):
+        self.device = device
+        self.settings = settings
+        self.context = context
+
+    def process(self, batch):
+        raise NotImplementedError
+
+
+@register_stage("calibrate")
+class CalibrateStage(Stage):
+    """Applies the sensor's calibration transform to the raw rows"""
+
+    def __init__(self, device, settings, context):
+        super().__init__(device, settings, context)
+        self.transform = None
+
+    def process(self, batch):
+        # The calibration can change under us (API job, edited config.json)
+        if self.transform is None or self.transform.settings is not self.device.calibration:
+            self.transform = calibration.Transform(self.device.calibration)
+        batch.values = self.transform.apply(batch.values)
+        return batch
+
+
+@register_stage("filter")
+class FilterStage(Stage):
+    """Per-axis low-pass, high-pass and notch filters, see filters.create_filter().
+
+    Filters are causal and keep their state from batch to batch. Placed
+    before "record" they change what the API and console show; after it,
+    only what later stages and the log see.
+    """
+
+    def __init__(self, device, settings, context):
+        super().__init__(device, settings, context)
+        rate_hz = settings.get("rate_hz", context.get("rate_hz"))
+        self.filters = [filters.create_filter(spec, rate_hz) for spec in settings.get("filters", [])]
+
+    def process(self, batch):
+        values = batch.values.copy()
+        for columns, digital_filter in self.filters:
+            values[:, columns] = digital_filter.filter(values[:, columns])
+        batch.values = values
+        batch.samples = None  # Built again from the filtered values when needed
+        return batch
+
+
+@register_stage("fuse")
+class FuseStage(Stage):
+    """Orientation fusion at the full sensor rate on the sample timestamps"""
+
+    def process(self, batch):
+        fusion = self.device.fusion
+        if fusion is None:
+            return batch
+        if len(batch.t_ns) == 1:
+            # Polling reads one sample at a time: skip the array set-up of update_arrays()
+            ax, ay, az, gx, gy, gz = batch.values[0, 0:6].tolist()
+            batch.q = [fusion.update_one(int(batch.t_ns[0]), ax, ay, az, gx, gy, gz)]
+        else:
+            batch.q = fusion.update_arrays(batch.t_ns, batch.values[:, 0:3], batch.values[:, 3:6])
+        return batch
+
+
+@register_stage("record")
+class RecordStage(Stage):
+    """Publishes the samples: device history and snapshot, shared ring in process mode"""
+
+    def process(self, batch):
+        ring = self.context.get("ring")
+        index = self.device.index
+        for sample in batch.to_samples():
+            self.device.record(sample)
+            if ring is not None:
+                ring.write(index, sample)
+        return batch
+
+
+@register_stage("trend")
+class TrendStage(Stage):
+    """Feeds the ring of recent min/max/mean the console draws sparklines from"""
+
+    side = "analysis"
+
+    def process(self, batch):
+        if self.device.trend is not None:
+            self.device.trend.update_arrays(batch.t_ns, batch.values)
+        return batch
+
+
+@register_stage("detect")
+class DetectStage(Stage):
+    """Statistics, spectrum, events, captures and calibration jobs of the sensor"""
+
+    side = "analysis"
+
+    def process(self, batch):
+        device = self.device
+        t_ns, values = batch.t_ns, batch.values
+        if device.stats is not None:
+            device.stats.update_arrays(t_ns, values)
+        if device.spectrum is not None:
+            device.spectrum.update_arrays(t_ns, values[:, :3])
+        if device.capture is not None:
+            device.capture.add(t_ns, values, batch.raw)
+        if device.events is not None:
+            for event in device.events.update_arrays(t_ns, values):
+                self.context["on_event"](device, event)
+                if device.capture is not None:
+                    device.capture.trigger(event)
+        if device.capture is not None:
+            for finished in device.capture.collect():
+                self.context["on_capture"](device, finished)
+        job = device.calibration_job
+        if job is not None:
+            job.feed(t_ns, values)
+        return batch
+
+
+@register_stage("decimate")
+class DecimateStage(Stage):
+    """Keeps every factor-th sample (counted across batches), e.g. before the sink.
+
+    The factor defaults to the top level "log_decimation" setting. With
+    "antialias" (the default) the kept samples are the output of a
+    linear-phase FIR low-pass at 0.8 times the new Nyquist frequency,
+    computed only at the kept positions; raw values are filtered alike and
+    timestamps are shifted back by the filter delay. Orientation is not
+    carried over in that case.
+    """
+
+    def __init__(self, device, settings, context):
+        super().__init__(device, settings, context)
+        self.factor = max(1, int(settings.get("factor", context.get("log_decimation", 1))))
+        self.phase = 0  # samples seen so far, modulo factor
+        self.fir = None
+        if self.factor > 1 and settings.get("antialias", True):
+            taps = int(settings.get("taps", 8 * self.factor + 1))
+            self.fir = filters.FirFilter(filters.lowpass_taps(0.4 / self.factor, 1.0, taps), self.factor)
+
+    def process(self, batch):
+        if self.factor == 1:
+            return batch
+        if self.fir is not None:
+            rows = batch.values if batch.raw is None else np.hstack((batch.values, batch.raw))
+            _, filtered, times = self.fir.decimate(rows, batch.t_ns)
+            raw = filtered[:, 7:] if batch.raw is not None else None
+            return Batch(batch.device, times, raw, filtered[:, :7])
+        n = len(batch)
+        index = np.arange((-self.phase) % self.factor, n, self.factor)
+        self.phase = (self.phase + n) % self.factor
+        return batch.select(index)
+
+
+@register_stage("sink")
+class SinkStage(Stage):
+    """Hands the samples to the data log writer thread"""
+
+    def process(self, batch):
+        data_log = self.context.get("data_log")
+        if data_log is not None:
+            data_log.write(batch.to_samples(), self.device.id if self.context.get("device_tag") else None)
+        return batch
+
+
+def stage_class(name):
+    """Stage class registered under name, or imported from "module:Class" """
+    if name in STAGES:
+        return STAGES[name]
+    if ":" in name:
+        module, _, attr = name.partition(":")
+        return getattr(importlib.import_module(module), attr)
+    raise ValueError(f"Unknown pipeline stage: {name}")
+
+
+class Pipeline:
+    """Ordered stages with per-stage timing.
+
+    For each stage the number of calls and samples, the total and maximum
+    time per call are kept, so /api/v1/status shows where the time of a
+    batch goes.
+    """
+
+    def __init__(self, stages):
+        self.stages = stages
+        self.names = []
+        for stage in stages:
+            name = stage.name or type(stage).__name__
+            while name in self.names:
+                name += "'"
+            self.names.append(name)
+        self.calls = [0] * len(stages)
+        self.samples = [0] * len(stages)
+        self.total_ns = [0] * len(stages)
+        self.max_ns = [0] * len(stages)
+
+    def run(self, batch):
+        """Push a batch through every stage; returns what comes out of the last one"""
+        for i, stage in enumerate(self.stages):
+            if batch is None or not len(batch):
+                return None
+            n = len(batch)
+            started = time.perf_counter_ns()
+            batch = stage.process(batch)
+            elapsed = time.perf_counter_ns() - started
+            self.calls[i] += 1
+            self.samples[i] += n
+            self.total_ns[i] += elapsed
+            if elapsed > self.max_ns[i]:
+                self.max_ns[i] = elapsed
+        return batch
+
+    def timings(self):
+        """Per-stage timing in pipeline order: stage, calls, samples, total_ms, max_ms, us_per_sample"""
+        return [{
+            "stage": name,
+            "calls": self.calls[i],
+            "samples": self.samples[i],
+            "total_ms": self.total_ns[i] / 1e6,
+            "max_ms": self.max_ns[i] / 1e6,
+            "us_per_sample": self.total_ns[i] / 1e3 / self.samples[i] if self.samples[i] else None
+        } for i, name in enumerate(self.names)]
+
+
+def records_calibrated_raw(settings):
+    """True when no stage before "record" changes the calibrated values (e.g. a filter).
+
+    Only then is the recorded history the calibrated raw data, so a new
+    calibration can be replayed over it from the raw values.
+    """
+    settings = dict(DEFAULT_PIPELINE, **(settings or {}))
+    names = [entry if isinstance(entry, str) else entry.get("type") for entry in settings["stages"]]
+    before = names[:names.index("record")] if "record" in names else names
+    return set(before) <= {"calibrate", "fuse"}
+
+
+def create_pipeline(settings, device, context, sides=("acquisition", "analysis")):
+    """Build the pipeline described by config["pipeline"] for one sensor.
+
+    Only stages whose side is in sides are included, so the acquisition
+    process and the web server side can each run their share.
+    """
+    settings = dict(DEFAULT_PIPELINE, **(settings or {}))
+    stages = []
+    for entry in settings["stages"]:
+        entry = {"type": entry} if isinstance(entry, str) else dict(entry)
+        cls = stage_class(entry.pop("type"))
+        if cls.side in sides:
+            stages.append(cls(device, entry, context))
+    return Pipeline(stages)
@@ -0,0 +1,332 @@
+# profiling.py - v1.0.3
+# On-demand cProfile, sampling profiler and tracemalloc snapshots for the running monitor
+
+import collections
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+# Default profiling configuration, overridden by config["profiling"]. The
+# endpoints are disabled until a token is set.
+DEFAULT_PROFILING = {
+    "token": "",                 # required in "Authorization: Bearer <token>"
+    "directory": "profiles",     # where results are written
+    "max_seconds": 300,          # longest allowed profiling run
+    "keep": 10,                  # results kept (oldest are deleted)
+    "sampling_interval": 0.01,   # seconds between stack samples
+    "tracemalloc_frames": 25     # frames stored per allocation
+}
+
+MODES = ("cprofile", "sampling")
+
+_ids = itertools.count(1)
+
+# cProfile session currently collecting, polled by checkpoint()
+_active = None
+_stopping = set()  # sessions waiting for threads to disable their profilers
+
+
+def checkpoint():
+    """Called from the monitor's long-running loops (sensor workers, ring reader,
+    console, data log writer) so a cProfile session can switch profiling on and
+    off in those threads; costs a global lookup when no session runs."""
+    session = _active
+    if session is not None:
+        session.join_thread()
+    elif _stopping:
+        for session in list(_stopping):
+            session.leave_thread()
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    """One profiling run of `seconds` over all threads; see CProfileSession / SamplingSession"""
+
+    mode = None
+
+    def __init__(self, seconds, directory):
+        self.id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{next(_ids)}"
+        self.seconds = seconds
+        self.directory = directory
+        self.state = "running"  # running, done, failed
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.files = {}  # format: path
+        self.summary = None
+        self._stop = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, name=f"profile-{self.id}", daemon=True).start()
+
+    def stop(self):
+        """End the run early"""
+        self._stop.set()
+
+    def _run(self):
+        try:
+            self._begin()
+            self._stop.wait(self.seconds)
+            self._end()
+            self.state = "done"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+        self.finished = time.time()
+
+    def _begin(self):
+        raise NotImplementedError
+
+    def _end(self):
+        raise NotImplementedError
+
+    def _write(self, fmt, extension, write):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{self.id}_{self.mode}.{extension}")
+        write(path)
+        self.files[fmt] = path
+
+    def describe(self):
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "state": self.state,
+            "error": self.error,
+            "seconds": self.seconds,
+            "started": datetime.fromtimestamp(self.started).isoformat(),
+            "finished": datetime.fromtimestamp(self.finished).isoformat() if self.finished else None,
+            "formats": sorted(self.files)
+        }
+
+
+class CProfileSession(ProfileSession):
+    """Deterministic profile of every thread, merged into one pstats file.
+
+    cProfile only profiles the thread that enables it, so each thread gets
+    its own profiler: threads started during the run (e.g. web requests)
+    through threading.setprofile(), long-running loops at their next
+    checkpoint(). The per-thread results are merged at the end.
+    """
+
+    mode = "cprofile"
+
+    def __init__(self, seconds, directory):
+        super().__init__(seconds, directory)
+        self.profilers = {}  # thread ident: (thread name, Profile)
+        self.left = set()    # idents whose profiler has been disabled
+        self._lock = threading.Lock()
+
+    def join_thread(self):
+        ident = threading.get_ident()
+        if ident in self.profilers:
+            return
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers[ident] = (threading.current_thread().name, profiler)
+        profiler.enable()
+
+    def leave_thread(self):
+        ident = threading.get_ident()
+        entry = self.profilers.get(ident)
+        if entry is not None and ident not in self.left:
+            entry[1].disable()
+            self.left.add(ident)
+
+    def _bootstrap(self, frame, event, arg):
+        # First profile event of a new thread: hand over to cProfile
+        sys.setprofile(None)
+        if _active is self:
+            self.join_thread()
+
+    def _begin(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("A cProfile session is already running")
+        _active = self
+        threading.setprofile(self._bootstrap)
+
+    def _end(self):
+        global _active
+        threading.setprofile(None)
+        _active = None
+        _stopping.add(self)
+        # Give the loops time to reach their checkpoint and switch off
+        deadline = time.monotonic() + 2.0
+        while time.monotonic() < deadline:
+            alive = {thread.ident for thread in threading.enumerate()}
+            if all(ident in self.left or ident not in alive for ident in list(self.profilers)):
+                break
+            time.sleep(0.05)
+        _stopping.discard(self)
+
+        merged = None
+        with self._lock:
+            entries = list(self.profilers.values())
+        for name, profiler in entries:
+            profiler.snapshot_stats()  # Works without disabling from another thread
+            if not profiler.stats:
+                continue
+            if merged is None:
+                merged = pstats.Stats(_Snapshot(profiler.stats))
+            else:
+                merged.add(_Snapshot(profiler.stats))
+        if merged is None:
+            raise RuntimeError("No thread was profiled")
+        self._write("pstats", "pstats", merged.dump_stats)
+        report = io.StringIO()
+        merged.stream = report
+        merged.sort_stats("cumulative").print_stats(40)
+        self.summary = report.getvalue()
+        self._write("text", "txt", lambda path: _write_text(path, self.summary))
+
+    def describe(self):
+        info = super().describe()
+        info["threads"] = sorted(name for name, _ in self.profilers.values())
+        return info
+
+
+class _Snapshot:
+    """What pstats.Stats needs from a profiler whose stats were already taken"""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def create_stats(self):
+        pass
+
+
+class SamplingSession(ProfileSession):
+    """Low-overhead statistical profile: all thread stacks every `interval` seconds.
+
+    Results are collapsed stacks ("thread;outer;...;inner count" lines, the
+    input format of flamegraph.pl and speedscope) plus a text summary of
+    the functions seen most often.
+    """
+
+    mode = "sampling"
+
+    def __init__(self, seconds, directory, interval):
+        super().__init__(seconds, directory)
+        self.interval = interval
+        self.samples = 0
+        self.stacks = collections.Counter()
+
+    def _begin(self):
+        pass
+
+    def _run(self):
+        try:
+            own = threading.get_ident()
+            deadline = time.monotonic() + self.seconds
+            while not self._stop.wait(self.interval) and time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame_label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    self.stacks[";".join(reversed(stack))] += 1
+                self.samples += 1
+            self._end()
+            self.state = "done"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+        self.finished = time.time()
+
+    def _end(self):
+        collapsed = "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+        self._write("collapsed", "collapsed", lambda path: _write_text(path, collapsed))
+        leaf = collections.Counter()
+        for stack, count in self.stacks.items():
+            leaf[stack.rsplit(";", 1)[-1]] += count
+        total = sum(self.stacks.values()) or 1
+        lines = [f"{self.samples} samples every {self.interval * 1000:g} ms", "", "  self%  function"]
+        lines += [f"{100.0 * count / total:7.2f}  {name}" for name, count in leaf.most_common(40)]
+        self.summary = "\n".join(lines) + "\n"
+        self._write("text", "txt", lambda path: _write_text(path, self.summary))
+
+    def describe(self):
+        info = super().describe()
+        info["interval"] = self.interval
+        info["samples"] = self.samples
+        return info
+
+
+def _write_text(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+class MemoryTracker:
+    """tracemalloc snapshots taken on demand and compared with each other"""
+
+    def __init__(self, frames=DEFAULT_PROFILING["tracemalloc_frames"], keep=10):
+        self.frames = frames
+        self.snapshots = collections.OrderedDict()  # id: (time, Snapshot)
+        self.keep = keep
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()  # one request at a time starts, snapshots or stops tracing
+
+    def snapshot(self):
+        """Start tracing if needed and take a snapshot; returns its id"""
+        with self._lock:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(self.frames)
+            snapshot = tracemalloc.take_snapshot().filter_traces((
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            ))
+            snapshot_id = next(self._ids)
+            self.snapshots[snapshot_id] = (time.time(), snapshot)
+            while len(self.snapshots) > self.keep:
+                self.snapshots.popitem(last=False)
+            return snapshot_id
+
+    def top(self, snapshot_id, limit=20, key="lineno"):
+        _, snapshot = self.snapshots[snapshot_id]
+        return [{
+            "where": str(stat.traceback),
+            "size": stat.size,
+            "count": stat.count
+        } for stat in snapshot.statistics(key)[:limit]]
+
+    def diff(self, first, second, limit=20, key="lineno"):
+        _, old = self.snapshots[first]
+        _, new = self.snapshots[second]
+        return [{
+            "where": str(stat.traceback),
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff
+        } for stat in new.compare_to(old, key)[:limit]]
+
+    def stop(self):
+        """Stop tracing and drop the snapshots"""
+        with self._lock:
+            tracemalloc.stop()
+            self.snapshots.clear()
+
+    def describe(self):
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        return {
+            "tracing": tracemalloc.is_tracing(),
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "snapshots": [{"id": snapshot_id, "taken": datetime.fromtimestamp(taken).isoformat()}
+                          for snapshot_id, (taken, _) in self.snapshots.items()]
+        }
@@ -0,0 +1,99 @@
+# samples.py - v1.0.3
+# Compact sensor sample type with monotonic nanosecond timestamps
+
+import math
+import time
+from datetime import datetime
+
+import numpy as np
+
+# Wall clock anchor taken once at startup. Samples carry time.monotonic_ns()
+# stamps, which never jump, and are mapped back to wall time only when
+# they leave the process (API, log file).
+ANCHOR_WALL_NS = time.time_ns()
+ANCHOR_MONO_NS = time.monotonic_ns()
+
+
+def wall_time(t_ns):
+    """Wall clock time (seconds since the epoch) of a monotonic_ns() timestamp"""
+    return (ANCHOR_WALL_NS + (t_ns - ANCHOR_MONO_NS)) / 1e9
+
+
+def monotonic_ns(wall):
+    """monotonic_ns() timestamp of a wall clock time given in seconds"""
+    return int(wall * 1e9) - ANCHOR_WALL_NS + ANCHOR_MONO_NS
+
+
+class Sample:
+    """One reading: monotonic ns timestamp, acceleration, gyro and temperature.
+
+    Uses __slots__ so a reading is a single small object instead of three
+    nested dicts plus an ISO timestamp string. q is the fused orientation
+    quaternion (w, x, y, z) once the fusion stage has seen the sample; raw
+    holds the uncalibrated (ax, ay, az, gx, gy, gz, temp) it was computed
+    from, so a new calibration can be replayed over it.
+    """
+
+    __slots__ = ("t_ns", "ax", "ay", "az", "gx", "gy", "gz", "temp", "device", "q", "raw")
+
+    def __init__(self, t_ns, ax, ay, az, gx, gy, gz, temp, device=None, q=None, raw=None):
+        self.t_ns = t_ns
+        self.ax = ax
+        self.ay = ay
+        self.az = az
+        self.gx = gx
+        self.gy = gy
+        self.gz = gz
+        self.temp = temp
+        self.device = device  # registry index, set when samples of several sensors are mixed
+        self.q = q
+        self.raw = raw
+
+    @property
+    def wall_time(self):
+        return wall_time(self.t_ns)
+
+    def to_dict(self, timestamp=True, orientation=True, raw=False):
+        """Reading dict as served by the API and written to the log"""
+        data = {
+            "acceleration": {"x": self.ax, "y": self.ay, "z": self.az},
+            "gyro": {"x": self.gx, "y": self.gy, "z": self.gz},
+            "temperature": self.temp
+        }
+        if raw and self.raw is not None:
+            rax, ray, raz, rgx, rgy, rgz, rtemp = self.raw
+            data["raw"] = {
+                "acceleration": {"x": rax, "y": ray, "z": raz},
+                "gyro": {"x": rgx, "y": rgy, "z": rgz},
+                "temperature": rtemp
+            }
+        if orientation and self.q is not None:
+            data["orientation"] = orientation_dict(self.q)
+        if timestamp:
+            data["timestamp"] = datetime.fromtimestamp(self.wall_time).isoformat()
+        return data
+
+    def __repr__(self):
+        return (f"Sample(t_ns={self.t_ns}, accel=({self.ax:.3f}, {self.ay:.3f}, {self.az:.3f}), "
+                f"gyro=({self.gx:.3f}, {self.gy:.3f}, {self.gz:.3f}), temp={self.temp:.2f})")
+
+
+def as_arrays(batch):
+    """(t_ns (n,), values (n, 7)) arrays of a list of Samples, values ordered ax … gz, temp"""
+    t_ns = np.fromiter((s.t_ns for s in batch), dtype=np.int64, count=len(batch))
+    values = np.array([(s.ax, s.ay, s.az, s.gx, s.gy, s.gz, s.temp) for s in batch], dtype=np.float64)
+    return t_ns, values
+
+
+def orientation_dict(q):
+    """Quaternion plus roll/pitch/yaw in degrees, as served by the API"""
+    w, x, y, z = q
+    roll = math.atan2(2 * (w * x + y * z), 1 - 2 * (x * x + y * y))
+    pitch = math.asin(max(-1.0, min(1.0, 2 * (w * y - z * x))))
+    yaw = math.atan2(2 * (w * z + x * y), 1 - 2 * (y * y + z * z))
+    return {
+        "quaternion": {"w": w, "x": x, "y": y, "z": z},
+        "roll": math.degrees(roll),
+        "pitch": math.degrees(pitch),
+        "yaw": math.degrees(yaw)
+    }
@@ -0,0 +1,174 @@
+# sensor_watchdog.py - v1.0.3
+# Acquisition watchdog: stuck-read detection, sensor/bus reset with backoff, gap accounting
+
+import collections
+import threading
+import time
+
+# Default watchdog configuration, overridden by config["watchdog"]
+DEFAULT_WATCHDOG = {
+    "enabled": True,
+    "read_timeout": 0.5,      # seconds a single read may take before the bus counts as stuck
+    "backoff_initial": 0.01,  # seconds before the first reset attempt
+    "backoff_factor": 2.0,    # each further attempt waits this much longer
+    "backoff_max": 5.0,       # longest wait between attempts
+    "bus_reset_after": 2,     # failed sensor resets before the whole bus is reset as well
+    "max_abandoned": 3,       # hung reads given up on and left behind per device; no new worker while this many hang
+    "history": 1000,          # gaps kept in memory for the API
+    "file": "gaps.jsonl"      # every closed gap, one JSON object per line
+}
+
+
+class Watchdog:
+    """Per-device fault handling and the record of gaps in the data.
+
+    A gap starts at the last good sample before a failed or stuck read and
+    ends at the first good sample after recovery. While it is open the
+    device is reset with exponential backoff: first only the sensor is
+    reopened, after bus_reset_after failed attempts the bus is reset too.
+    A bus reset invalidates every driver on it, so the other devices on
+    the bus are reopened with it.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_WATCHDOG, **(settings or {}))
+        self.read_timeout = settings["read_timeout"]
+        self.backoff_initial = settings["backoff_initial"]
+        self.backoff_factor = settings["backoff_factor"]
+        self.backoff_max = settings["backoff_max"]
+        self.bus_reset_after = settings["bus_reset_after"]
+        self.max_abandoned = settings["max_abandoned"]
+        self.file = settings["file"]
+        self.history = collections.deque(maxlen=settings["history"])
+        self.gap = None            # the open gap, if any
+        self.read_started = None   # time.monotonic() when the current read began
+        self.reader = None         # the thread doing the current read
+        self.abandoned = []        # threads given up on while their read hung
+        self.generation = 0        # bumped when a stuck worker is replaced
+        self.gaps = 0
+        self.timeouts = 0
+        self.sensor_resets = 0
+        self.bus_resets = 0
+        self.lost_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def begin(self, start_ns, reason):
+        """Open a gap after the last good sample at start_ns (no-op if one is open)"""
+        with self._lock:
+            if self.gap is None:
+                self.gap = {"start": start_ns, "end": None, "reason": reason,
+                            "attempts": 0, "sensor_resets": 0, "bus_resets": 0}
+                self.gaps += 1
+            return self.gap
+
+    def end(self, end_ns):
+        """Close the open gap at the first good sample; returns it, or None if none was open"""
+        with self._lock:
+            gap, self.gap = self.gap, None
+            if gap is None:
+                return None
+            gap["end"] = end_ns
+            self.history.append(gap)
+            self.lost_seconds += (end_ns - gap["start"]) / 1e9
+            return gap
+
+    def start_read(self):
+        self.reader = threading.current_thread()
+        self.read_started = time.monotonic()
+
+    def finish_read(self, generation):
+        """End of a read by the worker of generation; False if it was given up on meanwhile"""
+        with self._lock:
+            if generation != self.generation:
+                return False
+            self.read_started = None
+            return True
+
+    def replace_if_stuck(self, now=None):
+        """Give up on a worker whose read has taken longer than read_timeout.
+
+        Returns the new generation (the stuck worker exits when, if ever,
+        its read returns), or None if no read is stuck. While max_abandoned
+        given-up reads still hang, the stuck worker is left waiting instead,
+        so a long lockup does not pile up threads.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            started = self.read_started
+            if started is None or now - started <= self.read_timeout:
+                return None
+            self.abandoned = [thread for thread in self.abandoned if thread.is_alive()]
+            if len(self.abandoned) >= self.max_abandoned:
+                return None
+            if self.reader is not None:
+                self.abandoned.append(self.reader)
+            self.timeouts += 1
+            self.generation += 1
+            self.read_started = None
+            return self.generation
+
+    def backoff(self, attempt):
+        """Seconds to wait before reset attempt number attempt (0-based)"""
+        return min(self.backoff_max, self.backoff_initial * self.backoff_factor ** attempt)
+
+    def recover(self, device, keep_going=lambda: True, registry=None):
+        """Reset device (and, after repeated failures, its bus) until it opens again.
+
+        Waits with exponential backoff between attempts, carried over while
+        the same gap stays open. After a bus reset the other devices of
+        registry on that bus are reopened too. Returns the new driver, or
+        None when keep_going() turned false.
+        """
+        gap = self.gap
+        attempt = gap["attempts"] if gap is not None else 0
+        while keep_going():
+            deadline = time.monotonic() + self.backoff(attempt)
+            while keep_going() and time.monotonic() < deadline:
+                time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+            if not keep_going():
+                break
+            attempt += 1
+            if gap is not None:
+                gap["attempts"] = attempt
+            try:
+                if attempt > self.bus_reset_after and hasattr(device.bus, "reset"):
+                    device.bus.reset()
+                    self.bus_resets += 1
+                    if gap is not None:
+                        gap["bus_resets"] += 1
+                    if registry is not None:
+                        registry.reopen_bus(device.bus, exclude=device)
+                self.sensor_resets += 1
+                if gap is not None:
+                    gap["sensor_resets"] += 1
+                return device.open(device.bus)
+            except Exception:
+                continue  # Count the attempt and back off further
+        return None
+
+    def gaps_list(self, since_ns=None):
+        """Closed gaps (oldest first) followed by the open one"""
+        with self._lock:
+            result = list(self.history) + ([dict(self.gap)] if self.gap is not None else [])
+        if since_ns is not None:
+            result = [gap for gap in result if gap["end"] is None or gap["end"] > since_ns]
+        return result
+
+    def describe(self):
+        return {
+            "state": "recovering" if self.gap is not None else "ok",
+            "gaps": self.gaps,
+            "timeouts": self.timeouts,
+            "sensor_resets": self.sensor_resets,
+            "bus_resets": self.bus_resets,
+            "abandoned_reads": sum(thread.is_alive() for thread in self.abandoned),
+            "lost_seconds": self.lost_seconds
+        }
+
+
+def create_watchdog(settings):
+    """Build the watchdog described by config["watchdog"], or None if disabled"""
+    settings = dict(DEFAULT_WATCHDOG, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return Watchdog(settings)
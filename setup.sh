@@ -25,7 +25,7 @@ source venv/bin/activate
 
 # Install Python dependencies
 echo "Installing Python dependencies..."
-pip install adafruit-circuitpython-mpu6050 flask
+pip install adafruit-circuitpython-mpu6050 flask numpy
 
 # Create service file for autostart (optional)
 echo "Creating systemd service file..."
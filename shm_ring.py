@@ -0,0 +1,213 @@
+# shm_ring.py - v1.0.3
+# Shared-memory ring buffer of fixed-width sensor records
+
+import json
+import math
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import samples
+
+MAGIC = b"MPU6"
+FORMAT_VERSION = 6
+MAX_DEVICES = 8
+
+# Header: magic, format version, capacity, record size, head (records written so far)
+HEADER = struct.Struct("<4sIIIQ")
+HEAD = struct.Struct("<Q")
+HEAD_OFFSET = 16
+# Per-device counters after the header: samples, errors, connected
+DEVICE_STATS = struct.Struct("<QQQ")
+DEVICE_STATS_OFFSET = HEADER.size
+# Then per device the sequence number + 1 of its newest record (0: none yet)
+LATEST_OFFSET = DEVICE_STATS_OFFSET + MAX_DEVICES * DEVICE_STATS.size
+HEADER_SIZE = 512
+# Then the status block: counter (odd while being written), length and a
+# JSON document the acquisition process republishes (metrics, writer state)
+STATUS = struct.Struct("<QI4x")
+STATUS_OFFSET = HEADER_SIZE
+STATUS_SIZE = 65536
+# Then the records
+RECORDS_OFFSET = STATUS_OFFSET + STATUS_SIZE
+
+# Record: stamp (seq + 1 once complete, 0 while being written), monotonic
+# ns timestamp, ax, ay, az, gx, gy, gz, temperature, orientation quaternion
+# (NaN when not fused), the uncalibrated reading (NaN when unknown), device index
+RECORD = struct.Struct("<Qq3d3dd4d7dI4x")
+NO_ORIENTATION = (math.nan,) * 4
+NO_RAW = (math.nan,) * 7
+STAMP = struct.Struct("<Q")
+# The same record as a NumPy structured type, for reading whole ranges at once
+RECORD_DTYPE = np.dtype([("stamp", "<u8"), ("t_ns", "<i8"), ("values", "<f8", 7), ("q", "<f8", 4),
+                         ("raw", "<f8", 7), ("device", "<u4"), ("pad", "<u4")])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+
+class SampleRing:
+    """Fixed-capacity ring of sensor records in shared memory.
+
+    One process writes; any number of processes attach by name and read the
+    records straight out of the shared buffer through a NumPy view. Each
+    slot carries a stamp that is cleared while the slot is rewritten, so a
+    reader that sees the expected stamp both in its copy and in the slot
+    after copying knows the record is consistent. A small status block
+    next to the records carries whatever else the writer wants to share.
+    """
+
+    def __init__(self, shm, owner=False):
+        self.shm = shm
+        self.buf = shm.buf
+        self.owner = owner
+        magic, version, self.capacity, record_size, _ = HEADER.unpack_from(self.buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION or record_size != RECORD.size:
+            raise ValueError(f"Shared memory {shm.name} does not hold a sample ring")
+        # Views over the shared buffer, nothing is copied until a read
+        self.records = np.ndarray((self.capacity,), dtype=RECORD_DTYPE, buffer=self.buf, offset=RECORDS_OFFSET)
+        self.latest_seq = np.ndarray((MAX_DEVICES,), dtype="<u8", buffer=self.buf, offset=LATEST_OFFSET)
+        self._write_lock = threading.Lock()
+
+    @classmethod
+    def create(cls, capacity=4096, name=None):
+        size = RECORDS_OFFSET + capacity * RECORD.size
+        shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        shm.buf[:size] = bytes(size)
+        HEADER.pack_into(shm.buf, 0, MAGIC, FORMAT_VERSION, capacity, RECORD.size, 0)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(shared_memory.SharedMemory(name=name))
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def head(self):
+        """Sequence number of the next record to be written"""
+        return HEAD.unpack_from(self.buf, HEAD_OFFSET)[0]
+
+    def _offset(self, seq):
+        return RECORDS_OFFSET + (seq % self.capacity) * RECORD.size
+
+    def write(self, device, sample):
+        """Append one sample of device and return its sequence number"""
+        with self._write_lock:
+            seq = self.head
+            offset = self._offset(seq)
+            STAMP.pack_into(self.buf, offset, 0)
+            RECORD.pack_into(self.buf, offset, 0, sample.t_ns, sample.ax, sample.ay, sample.az,
+                             sample.gx, sample.gy, sample.gz, sample.temp,
+                             *(sample.q or NO_ORIENTATION), *(sample.raw or NO_RAW), device)
+            STAMP.pack_into(self.buf, offset, seq + 1)
+            HEAD.pack_into(self.buf, HEAD_OFFSET, seq + 1)
+            self.latest_seq[device] = seq + 1
+            stats_offset = DEVICE_STATS_OFFSET + device * DEVICE_STATS.size
+            count, errors, _ = DEVICE_STATS.unpack_from(self.buf, stats_offset)
+            DEVICE_STATS.pack_into(self.buf, stats_offset, count + 1, errors, 1)
+        return seq
+
+    def records_between(self, start, stop):
+        """Consistent copy of records start <= seq < stop still in the ring, as a structured array.
+
+        The slots are copied in one go, then the stamps are checked again:
+        records overwritten meanwhile (or not written yet) are left out.
+        """
+        start = max(start, stop - self.capacity, 0)
+        if stop <= start:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        wanted = np.arange(start, stop, dtype=np.uint64)
+        slots = (wanted % self.capacity).astype(np.intp)
+        copied = self.records[slots]  # fancy indexing copies
+        valid = (copied["stamp"] == wanted + 1) & (self.records["stamp"][slots] == wanted + 1)
+        return copied if valid.all() else copied[valid]
+
+    def read(self, seq):
+        """Return record seq as a Sample (device set to the device index), or None if gone"""
+        records = self.records_between(seq, seq + 1)
+        return to_samples(records)[0] if len(records) else None
+
+    def since(self, seq, stop=None):
+        """All samples still in the ring with sequence number >= seq (and < stop)"""
+        return to_samples(self.records_between(seq, self.head if stop is None else stop))
+
+    def latest(self, device=None):
+        """Most recent (seq, Sample), optionally of one device, or None"""
+        for _ in range(3):
+            newest = int(self.head if device is None else self.latest_seq[device])
+            if newest == 0:
+                return None
+            record = self.read(newest - 1)
+            if record is not None:
+                return newest - 1, record
+            # Either gone for good, or overwritten while the index moved on: then try the new one
+            if int(self.head if device is None else self.latest_seq[device]) == newest:
+                return None
+        return None
+
+    def set_connected(self, device, connected):
+        offset = DEVICE_STATS_OFFSET + device * DEVICE_STATS.size
+        with self._write_lock:
+            count, errors, _ = DEVICE_STATS.unpack_from(self.buf, offset)
+            DEVICE_STATS.pack_into(self.buf, offset, count, errors, int(connected))
+
+    def count_error(self, device):
+        offset = DEVICE_STATS_OFFSET + device * DEVICE_STATS.size
+        with self._write_lock:
+            count, errors, connected = DEVICE_STATS.unpack_from(self.buf, offset)
+            DEVICE_STATS.pack_into(self.buf, offset, count, errors + 1, connected)
+
+    def device_stats(self, device):
+        count, errors, connected = DEVICE_STATS.unpack_from(
+            self.buf, DEVICE_STATS_OFFSET + device * DEVICE_STATS.size)
+        return {"samples": count, "errors": errors, "connected": bool(connected)}
+
+    def publish_status(self, status):
+        """Replace the status block with the JSON-serializable status (one writer)"""
+        data = json.dumps(status).encode()
+        if STATUS.size + len(data) > STATUS_SIZE:
+            raise ValueError(f"Status of {len(data)} bytes does not fit the status block")
+        counter, _ = STATUS.unpack_from(self.buf, STATUS_OFFSET)
+        STATUS.pack_into(self.buf, STATUS_OFFSET, counter + 1, 0)
+        start = STATUS_OFFSET + STATUS.size
+        self.buf[start:start + len(data)] = data
+        STATUS.pack_into(self.buf, STATUS_OFFSET, counter + 2, len(data))
+
+    def status(self):
+        """The last published status, or None before the first one (or if the writer died mid-update)"""
+        for _ in range(1000):
+            counter, length = STATUS.unpack_from(self.buf, STATUS_OFFSET)
+            if counter == 0:
+                return None
+            if counter % 2 == 0:
+                start = STATUS_OFFSET + STATUS.size
+                data = bytes(self.buf[start:start + length])
+                if STATUS.unpack_from(self.buf, STATUS_OFFSET)[0] == counter:
+                    return json.loads(data)
+            time.sleep(0)  # Being rewritten: let the writer finish
+        return None
+
+    def close(self):
+        # The views must go before the buffer can be released
+        self.records = None
+        self.latest_seq = None
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+
+def to_samples(records):
+    """Samples of a structured record array (device set to the device index)"""
+    result = []
+    for t_ns, values, q, raw, device in zip(records["t_ns"].tolist(), records["values"].tolist(),
+                                            records["q"].tolist(), records["raw"].tolist(),
+                                            records["device"].tolist()):
+        result.append(samples.Sample(t_ns, *values, device=device, q=None if math.isnan(q[0]) else tuple(q),
+                                     raw=None if math.isnan(raw[0]) else tuple(raw)))
+    return result
@@ -0,0 +1,84 @@
+# snapshot.py - v1.0.3
+# Versioned latest-sample publication for the acquisition thread
+
+import array
+import math
+import threading
+import time
+
+import samples
+
+# Float fields of a published snapshot (the int64 timestamp is kept separately);
+# the quaternion is NaN until the fusion stage has produced one
+FIELDS = ("ax", "ay", "az", "gx", "gy", "gz", "temp", "qw", "qx", "qy", "qz")
+NO_ORIENTATION = (math.nan,) * 4
+
+
+class SnapshotPublisher:
+    """Single-writer cell holding the latest sample, readable without locks.
+
+    A seqlock: the writer makes the sequence counter odd, stores the fields
+    and makes it even again. A reader copies the fields between two reads
+    of the counter and retries if it was odd or changed, so it never returns
+    a mix of two samples. The version is the number of samples published.
+    Nothing is allocated per publish; readers that want every new sample
+    block in wait() instead of polling with sleeps.
+    """
+
+    def __init__(self):
+        self._time = array.array("q", [0])
+        self._buffer = array.array("d", bytes(8 * len(FIELDS)))
+        self._seq = 0  # odd while the writer is storing a sample
+        self._cond = threading.Condition(threading.Lock())
+        self._waiters = 0
+
+    @property
+    def version(self):
+        return self._seq >> 1
+
+    def publish(self, sample):
+        self._seq += 1
+        self._time[0] = sample.t_ns
+        buf = self._buffer
+        buf[0] = sample.ax
+        buf[1] = sample.ay
+        buf[2] = sample.az
+        buf[3] = sample.gx
+        buf[4] = sample.gy
+        buf[5] = sample.gz
+        buf[6] = sample.temp
+        buf[7], buf[8], buf[9], buf[10] = sample.q or NO_ORIENTATION
+        self._seq += 1
+        # Only pay for the condition when somebody is actually waiting
+        if self._waiters:
+            with self._cond:
+                self._cond.notify_all()
+
+    def read(self):
+        """Return (version, Sample); the sample is None before the first publish"""
+        while True:
+            seq = self._seq
+            if seq == 0:
+                return 0, None
+            if not seq & 1:
+                t_ns = self._time[0]
+                values = self._buffer.tolist()
+                if self._seq == seq:
+                    q = None if math.isnan(values[7]) else tuple(values[7:])
+                    return seq >> 1, samples.Sample(t_ns, *values[:7], q=q)
+            time.sleep(0)  # Let the writer finish
+
+    def wait(self, version, timeout=None):
+        """Block until a version newer than version is published, then read it.
+
+        Returns the unchanged version if timeout expires first.
+        """
+        if self.version == version:
+            with self._cond:
+                self._waiters += 1
+                try:
+                    self._cond.wait_for(lambda: self.version != version, timeout)
+                finally:
+                    self._waiters -= 1
+        return self.read()
+
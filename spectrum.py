@@ -0,0 +1,205 @@
+# spectrum.py - v1.0.3
+# Welch-averaged acceleration power spectra over a sliding window
+
+import math
+import threading
+
+import numpy as np
+
+import samples
+
+AXES = ("x", "y", "z")
+
+# Default spectrum configuration, overridden by config["spectrum"]
+DEFAULT_SPECTRUM = {
+    "enabled": True,
+    "nfft": 256,                  # samples per FFT segment
+    "overlap": 0.5,               # fraction of a segment shared with the next
+    "window_s": 10.0,             # segments averaged, expressed as seconds of signal
+    "peaks": 3,                   # strongest peaks reported per axis
+    "bands": [[0, 5], [5, 20], [20, 50], [50, 100], [100, 500]],  # Hz
+    "max_gap": 5.0                # sample periods; a longer gap restarts the segment
+}
+
+
+class SpectrumAnalyzer:
+    """Welch power spectral density of the three acceleration axes.
+
+    Incoming samples are copied into a preallocated pending buffer; every
+    complete (overlapping) segment in it is detrended, Hann-windowed and
+    transformed in a single rfft call over all segments and axes.
+    Per-segment spectra go into a ring, and the spectrum served is the mean
+    of the ring, i.e. a Welch estimate over the last window_s seconds. The
+    sample rate is measured from the sample timestamps; gaps are found
+    against a running estimate of the sample period, so adding a sample
+    only looks at the new timestamps.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_SPECTRUM, **(settings or {}))
+        self.nfft = int(settings["nfft"])
+        self.step = max(1, int(round(self.nfft * (1 - settings["overlap"]))))
+        self.window_s = settings["window_s"]
+        self.peaks = settings["peaks"]
+        self.bands = settings["bands"]
+        self.max_gap = settings["max_gap"]
+        self.window = np.hanning(self.nfft)
+        self.window_power = float((self.window ** 2).sum())
+        self.rate_hz = None
+        self.segments = None  # ring of per-segment PSDs, allocated once the rate is known
+        self.filled = 0
+        self.position = 0
+        self.pending_t = np.empty(2 * self.nfft, dtype=np.int64)
+        self.pending = np.empty((2 * self.nfft, 3))
+        self.length = 0     # samples in the pending buffer
+        self.period = None  # running estimate of the sample period (ns)
+        self._lock = threading.Lock()
+
+    def update(self, batch):
+        """Add a list of Samples"""
+        if batch:
+            t_ns, values = samples.as_arrays(batch)
+            self.update_arrays(t_ns, values[:, :3])
+
+    def update_arrays(self, t_ns, accel):
+        """Add a batch given as t_ns (n,) and accel (n, 3)"""
+        if len(t_ns) == 0:
+            return
+        with self._lock:
+            t_ns, accel = self._split_at_gap(t_ns, accel)
+            self._append(t_ns, accel)
+            length = self.length
+            count = (length - self.nfft) // self.step + 1 if length >= self.nfft else 0
+            if count == 0:
+                return
+            t = self.pending_t
+            buf = self.pending
+            used = (count - 1) * self.step + self.nfft
+            self._set_rate((used - 1) * 1e9 / (t[used - 1] - t[0]))
+            index = np.arange(count)[:, None] * self.step + np.arange(self.nfft)
+            segments = buf[index]                          # (count, nfft, 3)
+            segments = segments - segments.mean(axis=1, keepdims=True)
+            spectra = np.fft.rfft(segments * self.window[None, :, None], axis=1)
+            psd = (spectra.real ** 2 + spectra.imag ** 2) / (self.rate_hz * self.window_power)
+            psd[:, 1:-1 if self.nfft % 2 == 0 else None] *= 2  # one-sided
+            self._push(psd)
+            start = count * self.step
+            self.length = length - start
+            t[:self.length] = t[start:length]
+            buf[:self.length] = buf[start:length]
+
+    def _split_at_gap(self, t_ns, accel):
+        """The part of a batch after its last gap (dropping the pending samples if there is one)"""
+        if len(t_ns) == 1:
+            # Polling: one new interval, compared with plain floats
+            if self.length:
+                dt = int(t_ns[0]) - int(self.pending_t[self.length - 1])
+                period = self.period
+                if dt <= 0 or (period is not None and dt > self.max_gap * period):
+                    self.length = 0
+                    self.period = None
+                else:
+                    self.period = dt if period is None else period + 0.05 * (dt - period)
+            return t_ns, accel
+        if self.length:
+            dt = np.diff(t_ns, prepend=self.pending_t[self.length - 1])
+            first = 0  # dt[i] ends at sample i
+        else:
+            dt = np.diff(t_ns)
+            first = 1  # dt[i] ends at sample i + 1
+        period = self.period
+        threshold = self.max_gap * (period if period is not None else float(np.median(dt)))
+        gaps = np.flatnonzero((dt <= 0) | (dt > threshold))
+        if len(gaps):
+            # Only samples after the last gap form contiguous segments
+            self.length = 0
+            period = None
+            t_ns, accel = t_ns[gaps[-1] + first:], accel[gaps[-1] + first:]
+            dt = dt[gaps[-1] + 1:]
+        if len(dt):
+            median = float(np.median(dt))
+            self.period = median if period is None else period + min(1.0, 0.05 * len(dt)) * (median - period)
+        else:
+            self.period = period
+        return t_ns, accel
+
+    def _append(self, t_ns, accel):
+        needed = self.length + len(t_ns)
+        if needed > len(self.pending_t):
+            size = max(needed, 2 * len(self.pending_t))
+            t = np.empty(size, dtype=np.int64)
+            buf = np.empty((size, 3))
+            t[:self.length] = self.pending_t[:self.length]
+            buf[:self.length] = self.pending[:self.length]
+            self.pending_t, self.pending = t, buf
+        self.pending_t[self.length:needed] = t_ns
+        self.pending[self.length:needed] = accel
+        self.length = needed
+
+    def _set_rate(self, rate_hz):
+        # A rate change invalidates the averaged spectra (and the ring size)
+        if self.rate_hz is None or abs(rate_hz - self.rate_hz) > 0.05 * self.rate_hz:
+            self.rate_hz = rate_hz
+            size = max(1, int(math.ceil(self.window_s * rate_hz / self.step)))
+            self.segments = np.zeros((size, self.nfft // 2 + 1, 3))
+            self.filled = 0
+            self.position = 0
+
+    def _push(self, psd):
+        size = len(self.segments)
+        if len(psd) > size:
+            psd = psd[-size:]
+        slots = (self.position + np.arange(len(psd))) % size
+        self.segments[slots] = psd
+        self.position = int((self.position + len(psd)) % size)
+        self.filled = min(size, self.filled + len(psd))
+
+    def snapshot(self):
+        """Averaged spectrum with peaks and band energies as a JSON-ready dict"""
+        with self._lock:
+            if not self.filled:
+                return {"segments": 0, "rate_hz": self.rate_hz}
+            psd = self.segments[:self.filled].mean(axis=0)  # (bins, 3)
+            rate_hz = self.rate_hz
+            filled = self.filled
+
+        resolution = rate_hz / self.nfft
+        freqs = np.arange(psd.shape[0]) * resolution
+        peaks = {axis: find_peaks(psd[:, i], resolution, self.peaks) for i, axis in enumerate(AXES)}
+        bands = {}
+        for low, high in self.bands:
+            mask = (freqs >= low) & (freqs < high)
+            energy = psd[mask].sum(axis=0) * resolution
+            bands[f"{low:g}-{high:g}"] = {axis: float(energy[i]) for i, axis in enumerate(AXES)}
+        return {
+            "segments": filled,
+            "window_s": (filled - 1) * self.step / rate_hz + self.nfft / rate_hz,
+            "rate_hz": rate_hz,
+            "resolution_hz": resolution,
+            "frequencies": freqs.tolist(),
+            "psd": {axis: psd[:, i].tolist() for i, axis in enumerate(AXES)},
+            "peaks": peaks,
+            "bands": bands
+        }
+
+
+def find_peaks(psd, resolution, count):
+    """Strongest local maxima (excluding DC), refined by a parabola through the log powers"""
+    inner = psd[1:-1]
+    local = np.flatnonzero((inner > psd[:-2]) & (inner >= psd[2:])) + 1
+    strongest = local[np.argsort(psd[local])[::-1][:count]]
+    peaks = []
+    for k in strongest.tolist():
+        a, b, c = np.log(np.maximum(psd[k - 1:k + 2], 1e-30))
+        denominator = a - 2 * b + c
+        offset = 0.5 * (a - c) / denominator if denominator else 0.0
+        peaks.append({"frequency": float((k + offset) * resolution), "psd": float(psd[k])})
+    return peaks
+
+
+def create_spectrum(settings):
+    """Build the spectrum analyzer described by config["spectrum"], or None if disabled"""
+    settings = dict(DEFAULT_SPECTRUM, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return SpectrumAnalyzer(settings)
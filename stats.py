@@ -0,0 +1,222 @@
+# stats.py - v1.0.3
+# Streaming per-axis statistics: Welford moments, EWMA and windowed percentiles
+
+import math
+import threading
+
+import numpy as np
+
+import samples
+
+CHANNELS = ("accel_x", "accel_y", "accel_z", "gyro_x", "gyro_y", "gyro_z", "temperature")
+
+# Default statistics configuration, overridden by config["stats"]
+DEFAULT_STATS = {
+    "enabled": True,
+    "windows": [10, 60],          # sliding windows in seconds
+    "bucket_s": 1.0,              # window resolution
+    "ewma_alpha": 0.01,           # per-sample smoothing factor
+    "percentiles": [50, 95, 99],
+    "bins": 2048,                 # histogram bins per channel and bucket
+    # Histogram range per quantity; values outside land in the edge bins
+    # (min/max stay exact, only percentiles saturate)
+    "ranges": {
+        "accel": [-40.0, 40.0],
+        "gyro": [-5.0, 5.0],
+        "temperature": [0.0, 80.0]
+    }
+}
+
+
+class StatsEngine:
+    """Running statistics for the seven sensor channels.
+
+    Since-start mean/variance use Welford's method (merged a batch at a time
+    with Chan's formula), min/max and an EWMA are kept alongside. Sliding
+    windows are a ring of time buckets, each holding its own moments and a
+    fixed-bin histogram; percentiles come from summing the histograms of the
+    buckets inside the window. Every update is constant work per sample and
+    a batch is processed with a handful of NumPy operations.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_STATS, **(settings or {}))
+        self.windows = sorted(settings["windows"])
+        self.percentiles = settings["percentiles"]
+        self.alpha = settings["ewma_alpha"]
+        self.bucket_ns = int(settings["bucket_s"] * 1e9)
+        self.bins = settings["bins"]
+        channels = len(CHANNELS)
+
+        ranges = dict(DEFAULT_STATS["ranges"], **settings.get("ranges", {}))
+        self.lo = np.array([ranges["accel"][0]] * 3 + [ranges["gyro"][0]] * 3 + [ranges["temperature"][0]])
+        hi = np.array([ranges["accel"][1]] * 3 + [ranges["gyro"][1]] * 3 + [ranges["temperature"][1]])
+        self.scale = self.bins / (hi - self.lo)
+        self.offsets = np.arange(channels) * self.bins
+
+        # Since-start moments
+        self.count = 0
+        self.mean = np.zeros(channels)
+        self.m2 = np.zeros(channels)
+        self.min = np.full(channels, np.inf)
+        self.max = np.full(channels, -np.inf)
+        self.ewma = None
+
+        # Ring of window buckets
+        self.buckets = int(math.ceil(self.windows[-1] * 1e9 / self.bucket_ns)) if self.windows else 1
+        self.bucket_ids = np.full(self.buckets, -1, dtype=np.int64)
+        self.bucket_count = np.zeros(self.buckets, dtype=np.int64)
+        self.bucket_mean = np.zeros((self.buckets, channels))
+        self.bucket_m2 = np.zeros((self.buckets, channels))
+        self.bucket_min = np.full((self.buckets, channels), np.inf)
+        self.bucket_max = np.full((self.buckets, channels), -np.inf)
+        self.bucket_hist = np.zeros((self.buckets, channels, self.bins), dtype=np.int32)
+        self.latest_bucket = -1
+        self._lock = threading.Lock()
+
+    def update(self, batch):
+        """Add a list of Samples"""
+        if batch:
+            self.update_arrays(*samples.as_arrays(batch))
+
+    def update_arrays(self, t_ns, values):
+        """Add a batch given as t_ns (n,) and values (n, 7)"""
+        n = len(values)
+        if n == 0:
+            return
+        with self._lock:
+            batch_mean = values.mean(axis=0)
+            batch_m2 = ((values - batch_mean) ** 2).sum(axis=0)
+            self.mean, self.m2, self.count = merge_moments(
+                self.mean, self.m2, self.count, batch_mean, batch_m2, n)
+            np.minimum(self.min, values.min(axis=0), out=self.min)
+            np.maximum(self.max, values.max(axis=0), out=self.max)
+            self._update_ewma(values)
+
+            ids = t_ns // self.bucket_ns
+            first, last = int(ids[0]), int(ids[-1])
+            if first == last:
+                self._update_bucket(first, values, batch_mean, batch_m2)
+            else:
+                for bucket_id in np.unique(ids).tolist():
+                    rows = values[ids == bucket_id]
+                    rows_mean = rows.mean(axis=0)
+                    self._update_bucket(bucket_id, rows, rows_mean, ((rows - rows_mean) ** 2).sum(axis=0))
+            self.latest_bucket = max(self.latest_bucket, last)
+
+    def _update_ewma(self, values):
+        a = self.alpha
+        if self.ewma is None:
+            self.ewma = values[0].copy()
+            values = values[1:]
+        n = len(values)
+        if n:
+            # Closed form of n EWMA steps: decayed start plus weighted batch
+            weights = a * (1 - a) ** np.arange(n - 1, -1, -1)
+            self.ewma = (1 - a) ** n * self.ewma + weights @ values
+
+    def _update_bucket(self, bucket_id, rows, rows_mean, rows_m2):
+        slot = bucket_id % self.buckets
+        if self.bucket_ids[slot] != bucket_id:
+            if self.bucket_ids[slot] > bucket_id:
+                return  # Older than anything the ring still holds
+            self.bucket_ids[slot] = bucket_id
+            self.bucket_count[slot] = 0
+            self.bucket_mean[slot] = 0
+            self.bucket_m2[slot] = 0
+            self.bucket_min[slot] = np.inf
+            self.bucket_max[slot] = -np.inf
+            self.bucket_hist[slot] = 0
+        n = len(rows)
+        self.bucket_mean[slot], self.bucket_m2[slot], self.bucket_count[slot] = merge_moments(
+            self.bucket_mean[slot], self.bucket_m2[slot], self.bucket_count[slot], rows_mean, rows_m2, n)
+        np.minimum(self.bucket_min[slot], rows.min(axis=0), out=self.bucket_min[slot])
+        np.maximum(self.bucket_max[slot], rows.max(axis=0), out=self.bucket_max[slot])
+        index = np.clip(((rows - self.lo) * self.scale).astype(np.int64), 0, self.bins - 1) + self.offsets
+        hist = self.bucket_hist[slot].reshape(-1)
+        if index.size * 64 < hist.size:
+            # Small batch: touch only the bins it lands in, not all channels x bins
+            np.add.at(hist, index.ravel(), 1)
+        else:
+            hist += np.bincount(index.ravel(), minlength=hist.size).astype(np.int32)
+
+    def window(self, seconds):
+        """Statistics per channel over the last seconds (relative to the newest sample)"""
+        with self._lock:
+            span = int(math.ceil(seconds * 1e9 / self.bucket_ns))
+            valid = (self.bucket_ids > self.latest_bucket - span) & (self.bucket_ids <= self.latest_bucket)
+            counts = self.bucket_count[valid]
+            total = int(counts.sum())
+            if total == 0:
+                return None
+            means = self.bucket_mean[valid]
+            mean = (counts[:, None] * means).sum(axis=0) / total
+            m2 = self.bucket_m2[valid].sum(axis=0) + (counts[:, None] * (means - mean) ** 2).sum(axis=0)
+            low = self.bucket_min[valid].min(axis=0)
+            high = self.bucket_max[valid].max(axis=0)
+            hist = self.bucket_hist[valid].sum(axis=0)
+
+        cumulative = np.cumsum(hist, axis=1)
+        quantiles = {}
+        for p in self.percentiles:
+            target = p / 100 * total
+            index = np.argmax(cumulative >= target, axis=1)
+            rows = np.arange(len(CHANNELS))
+            before = np.where(index > 0, cumulative[rows, np.maximum(index - 1, 0)], 0)
+            within = (target - before) / np.maximum(hist[rows, index], 1)
+            # Interpolate inside the bin, but never report beyond the observed extremes
+            quantiles[p] = np.clip(self.lo + (index + within) / self.scale, low, high)
+
+        std = np.sqrt(m2 / (total - 1)) if total > 1 else np.zeros(len(CHANNELS))
+        return {
+            name: dict({
+                "count": total,
+                "mean": float(mean[i]),
+                "std": float(std[i]),
+                "min": float(low[i]),
+                "max": float(high[i])
+            }, **{f"p{p}": float(quantiles[p][i]) for p in self.percentiles})
+            for i, name in enumerate(CHANNELS)
+        }
+
+    def snapshot(self):
+        """All statistics as a JSON-ready dict"""
+        with self._lock:
+            count = self.count
+            mean = self.mean.copy()
+            m2 = self.m2.copy()
+            low = self.min.copy()
+            high = self.max.copy()
+            ewma = None if self.ewma is None else self.ewma.copy()
+        if count == 0:
+            return {"count": 0, "channels": {}}
+        std = np.sqrt(m2 / (count - 1)) if count > 1 else np.zeros(len(CHANNELS))
+        windows = {f"{w:g}s": self.window(w) for w in self.windows}
+        channels = {}
+        for i, name in enumerate(CHANNELS):
+            channels[name] = {
+                "mean": float(mean[i]),
+                "std": float(std[i]),
+                "min": float(low[i]),
+                "max": float(high[i]),
+                "ewma": float(ewma[i]),
+                "windows": {label: stats[name] if stats else None for label, stats in windows.items()}
+            }
+        return {"count": count, "channels": channels}
+
+
+def merge_moments(mean_a, m2_a, n_a, mean_b, m2_b, n_b):
+    """Combine two (mean, M2, count) sets with Chan's parallel form of Welford"""
+    n = n_a + n_b
+    delta = mean_b - mean_a
+    mean = mean_a + delta * (n_b / n)
+    m2 = m2_a + m2_b + delta ** 2 * (n_a * n_b / n)
+    return mean, m2, n
+
+
+def create_stats(settings):
+    """Build the statistics engine described by config["stats"], or None if disabled"""
+    settings = dict(DEFAULT_STATS, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return StatsEngine(settings)
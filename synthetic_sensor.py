@@ -0,0 +1,170 @@
+# synthetic_sensor.py - v1.0.3
+# Synthetic MPU6050 backend used for stress testing without hardware
+
+import math
+import random
+import time
+
+GRAVITY = 9.80665
+
+# Supported output data rates (Hz)
+MIN_RATE_HZ = 1
+MAX_RATE_HZ = 10000
+
+# Default signal configuration, overridden by config["sensor"]["synthetic"]
+DEFAULT_SIGNALS = {
+    "seed": None,
+    "fifo_size": 4096,
+    "tilt": {
+        "roll_deg": 0.0,
+        "pitch_deg": 0.0,
+        "sweep_deg": 0.0,        # amplitude of a slow roll oscillation
+        "sweep_period_s": 10.0
+    },
+    "vibration": [
+        {"axis": "z", "freq_hz": 25.0, "amplitude": 0.2}
+    ],
+    "noise": {
+        "accel": 0.02,           # m/s² standard deviation
+        "gyro": 0.002,           # rad/s standard deviation
+        "temperature": 0.01      # °C standard deviation
+    },
+    "shock": {
+        "interval_s": 0.0,       # 0 disables shocks
+        "duration_s": 0.005,
+        "magnitude": 30.0,       # m/s² peak of a half-sine pulse
+        "axis": "x"
+    },
+    "temperature": {
+        "start": 25.0,
+        "drift_per_min": 0.0,
+        "max": 45.0,
+        "accel_bias_per_deg": 0.0,
+        "gyro_bias_per_deg": 0.0
+    }
+}
+
+AXES = {"x": 0, "y": 1, "z": 2}
+
+
+def merge_signals(overrides):
+    """Return DEFAULT_SIGNALS updated with user overrides (one level deep)"""
+    signals = {}
+    for key, value in DEFAULT_SIGNALS.items():
+        if isinstance(value, dict):
+            signals[key] = dict(value)
+            signals[key].update((overrides or {}).get(key, {}))
+        else:
+            signals[key] = (overrides or {}).get(key, value)
+    return signals
+
+
+class SyntheticMPU6050:
+    """Drop-in stand-in for adafruit_mpu6050.MPU6050 generating configurable signals.
+
+    Values are quantised to the configured output data rate like the real
+    sensor registers, so reading acceleration, gyro and temperature one after
+    another returns a consistent sample. read_fifo() returns every sample
+    generated since the previous call, which is how rates above what a
+    sleep-paced loop can sustain are reached.
+    """
+
+    def __init__(self, signals=None, rate_hz=10, clock=time.monotonic):
+        if not MIN_RATE_HZ <= rate_hz <= MAX_RATE_HZ:
+            raise ValueError(f"Synthetic rate must be between {MIN_RATE_HZ} and {MAX_RATE_HZ} Hz")
+        self.signals = merge_signals(signals)
+        self.rate_hz = rate_hz
+        self.clock = clock
+        self.random = random.Random(self.signals["seed"])
+        self.fifo_overflows = 0
+        self.fifo_dropped = 0  # samples lost to overflows
+        self._start = clock()
+        self._slot = -1
+        self._fifo_slot = 0
+        self._sample = None
+
+    def sample_at(self, t):
+        """Generate (acceleration, gyro, temperature) at t seconds since start"""
+        s = self.signals
+        tilt = s["tilt"]
+        noise = s["noise"]
+        gauss = self.random.gauss
+
+        # Gravity projected through roll/pitch, with an optional roll sweep
+        roll = math.radians(tilt["roll_deg"])
+        roll_rate = 0.0
+        if tilt["sweep_deg"]:
+            w = 2 * math.pi / tilt["sweep_period_s"]
+            roll += math.radians(tilt["sweep_deg"]) * math.sin(w * t)
+            roll_rate = math.radians(tilt["sweep_deg"]) * w * math.cos(w * t)
+        pitch = math.radians(tilt["pitch_deg"])
+        accel = [
+            -GRAVITY * math.sin(pitch),
+            GRAVITY * math.sin(roll) * math.cos(pitch),
+            GRAVITY * math.cos(roll) * math.cos(pitch)
+        ]
+        gyro = [roll_rate, 0.0, 0.0]
+
+        # Sine vibration components
+        for component in s["vibration"]:
+            accel[AXES[component["axis"]]] += component["amplitude"] * math.sin(
+                2 * math.pi * component["freq_hz"] * t + component.get("phase", 0.0))
+
+        # Periodic half-sine shock pulses
+        shock = s["shock"]
+        if shock["interval_s"] > 0:
+            phase = t % shock["interval_s"]
+            if phase < shock["duration_s"]:
+                accel[AXES[shock["axis"]]] += shock["magnitude"] * math.sin(
+                    math.pi * phase / shock["duration_s"])
+
+        # Die temperature drift and the bias it induces
+        temp_cfg = s["temperature"]
+        temp = min(temp_cfg["max"], temp_cfg["start"] + temp_cfg["drift_per_min"] * t / 60)
+        delta_t = temp - temp_cfg["start"]
+        accel_bias = temp_cfg["accel_bias_per_deg"] * delta_t
+        gyro_bias = temp_cfg["gyro_bias_per_deg"] * delta_t
+
+        accel = tuple(a + accel_bias + gauss(0, noise["accel"]) for a in accel)
+        gyro = tuple(g + gyro_bias + gauss(0, noise["gyro"]) for g in gyro)
+        temp += gauss(0, noise["temperature"])
+        return accel, gyro, temp
+
+    def _current(self):
+        slot = int((self.clock() - self._start) * self.rate_hz)
+        if slot != self._slot:
+            self._slot = slot
+            self._sample = self.sample_at(slot / self.rate_hz)
+        return self._sample
+
+    @property
+    def acceleration(self):
+        return self._current()[0]
+
+    @property
+    def gyro(self):
+        return self._current()[1]
+
+    @property
+    def temperature(self):
+        return self._current()[2]
+
+    def read_fifo(self):
+        """Return [(t_ns, acceleration, gyro, temperature), ...] generated since the last call.
+
+        t_ns is the sample time on the clock's timeline in nanoseconds, i.e.
+        comparable with time.monotonic_ns() for the default clock.
+        """
+        end = int((self.clock() - self._start) * self.rate_hz)
+        start = self._fifo_slot
+        if end - start > self.signals["fifo_size"]:
+            # Like the hardware FIFO, the oldest samples are lost when it overflows
+            self.fifo_overflows += 1
+            self.fifo_dropped += end - start - self.signals["fifo_size"]
+            start = end - self.signals["fifo_size"]
+        self._fifo_slot = end
+        samples = []
+        for slot in range(start, end):
+            t = slot / self.rate_hz
+            samples.append((int((self._start + t) * 1e9),) + self.sample_at(t))
+        return samples
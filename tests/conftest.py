@@ -0,0 +1,7 @@
+# tests/conftest.py - v1.0.3
+# The monitor's modules live flat in the repository root
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
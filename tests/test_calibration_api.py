@@ -0,0 +1,79 @@
+# tests/test_calibration_api.py - v1.0.3
+# POST /api/v1/calibrate: one running job per sensor, 409 for the rest; storing and reloading config.json
+
+import json
+import os
+import sys
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    # The monitor reads and writes config.json and its logs in the working directory
+    monkeypatch.chdir(tmp_path)
+    import devices
+    import mpu6050_monitor
+    registry = devices.DeviceRegistry()
+    registry.add(devices.Device("mpu0"))
+    monkeypatch.setattr(mpu6050_monitor, "registry", registry)
+    yield mpu6050_monitor
+    registry.primary.calibration_job = None
+
+
+def start(client):
+    return client.post("/api/v1/calibrate", json={"mode": "level", "duration": 0.1, "apply": False})
+
+
+def test_second_job_on_same_sensor_conflicts(monitor):
+    client = monitor.app.test_client()
+    assert start(client).status_code == 202
+    response = start(client)
+    assert response.status_code == 409
+    assert response.get_json()["status"] == "error"
+
+
+def test_concurrent_requests_start_one_job(monitor):
+    clients = 8
+    barrier = threading.Barrier(clients)
+    statuses = []
+
+    def post():
+        client = monitor.app.test_client()
+        barrier.wait()
+        statuses.append(start(client).status_code)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Interleave the requests as much as possible
+    try:
+        threads = [threading.Thread(target=post) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert sorted(statuses) == [202] + [409] * (clients - 1)
+
+
+def test_stored_calibration_changes_only_the_calibration(monitor):
+    with open("config.json", "w") as f:
+        json.dump({"sample_rate": 0.05}, f)
+    settings = dict(monitor.devices.UNCALIBRATED, x_offset=0.5, calibrated=True)
+    monitor.store_calibration(monitor.registry.primary, settings)
+    with open("config.json") as f:
+        assert json.load(f) == {"sample_rate": 0.05, "calibration": settings}
+    assert [name for name in os.listdir(".") if name.startswith("config.json.")] == []
+
+
+def test_half_written_config_keeps_the_calibration(monitor):
+    device = monitor.registry.primary
+    with open("config.json", "w") as f:
+        json.dump({"calibration": device.calibration}, f)
+    mtime = monitor.reload_calibration([device], None)
+    with open("config.json", "w") as f:
+        f.write('{"calibration": {"x_off')
+    os.utime("config.json", (mtime + 1, mtime + 1))
+    assert monitor.reload_calibration([device], mtime) == mtime
+    assert device.calibration == monitor.devices.UNCALIBRATED
@@ -0,0 +1,53 @@
+# tests/test_calibration_replay.py - v1.0.3
+# Stored calibrations are replayed over the history as new Samples, only when it holds calibrated raw data
+
+import json
+
+import pytest
+
+import calibration
+import devices
+import samples
+
+RAW = (1.0, 2.0, 3.0, 0.1, 0.2, 0.3, 25.0)
+SETTINGS = dict(devices.UNCALIBRATED, x_offset=0.5, calibrated=True)
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import mpu6050_monitor
+    return mpu6050_monitor
+
+
+def recorded(device):
+    old = samples.Sample(1, *RAW, raw=RAW)
+    plain = samples.Sample(2, *RAW)
+    device.history.extend([old, plain])
+    return old, plain
+
+
+def test_replay_builds_new_samples():
+    old, plain = samples.Sample(1, *RAW, raw=RAW), samples.Sample(2, *RAW)
+    new, same = calibration.replay([old, plain], SETTINGS)
+    assert same is plain
+    assert new is not old and new.raw == RAW and new.t_ns == 1
+    assert old.ax == RAW[0]
+    assert new.ax == pytest.approx(calibration.Transform(SETTINGS).apply([RAW])[0][0])
+
+
+def test_store_swaps_the_history(monitor):
+    device = devices.Device("mpu0")
+    old, plain = recorded(device)
+    monitor.store_calibration(device, SETTINGS)
+    assert list(device.history)[1] is plain
+    assert list(device.history)[0] is not old and old.ax == RAW[0]
+
+
+def test_store_leaves_filtered_history_alone(monitor):
+    with open("config.json", "w") as f:
+        json.dump({"pipeline": {"stages": ["calibrate", "filter", "fuse", "record", "sink"]}}, f)
+    device = devices.Device("mpu0")
+    old, plain = recorded(device)
+    monitor.store_calibration(device, SETTINGS)
+    assert list(device.history) == [old, plain]
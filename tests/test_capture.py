@@ -0,0 +1,37 @@
+# tests/test_capture.py - v1.0.3
+# Captures keep the raw readings next to the processed values, also when read back from the shared ring
+
+import numpy as np
+
+import capture
+import devices
+import pipeline
+import samples
+import shm_ring
+
+MS = 1000000
+
+
+def test_capture_holds_raw_rows():
+    buffer = capture.CaptureBuffer({"pre_ms": 20, "post_ms": 20, "buffer_samples": 256})
+    t_ns = np.arange(100, dtype=np.int64) * MS
+    raw = np.arange(700, dtype=np.float64).reshape(100, 7)
+    buffer.add(t_ns[:50], raw[:50] * 2, raw[:50])
+    buffer.trigger({"type": "shock", "start": 50 * MS, "end": None})
+    buffer.add(t_ns[50:], raw[50:] * 2, raw[50:])
+    [finished] = buffer.collect()
+    np.testing.assert_array_equal(finished["raw"], raw[30:71])
+    np.testing.assert_array_equal(finished["values"], raw[30:71] * 2)
+
+
+def test_raw_rows_survive_the_shared_ring():
+    ring = shm_ring.SampleRing.create(capacity=16)
+    try:
+        raw = (0.1, 0.2, 9.7, 0.01, 0.02, 0.03, 2000.0)
+        ring.write(0, samples.Sample(5, 0.0, 0.0, 9.8, 0.0, 0.0, 0.0, 25.0, raw=raw))
+        ring.write(0, samples.Sample(6, 0.0, 0.0, 9.8, 0.0, 0.0, 0.0, 25.0, raw=raw))
+        batch = pipeline.Batch.from_records(devices.Device("mpu0"), ring.records_between(0, ring.head))
+        np.testing.assert_array_equal(batch.raw, [raw, raw])
+        assert ring.since(0)[0].raw == raw
+    finally:
+        ring.close()
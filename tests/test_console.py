@@ -0,0 +1,19 @@
+# tests/test_console.py - v1.0.3
+# Renderer: lines wider than the terminal are cut so the cursor moves stay on their rows
+
+import io
+import os
+import re
+
+import console
+
+
+def test_lines_are_cut_at_the_terminal_width(monkeypatch):
+    monkeypatch.setattr(console.shutil, "get_terminal_size", lambda: os.terminal_size((20, 24)))
+    stream = io.StringIO()
+    renderer = console.Renderer(stream, redraw_interval=0)
+    renderer.draw(["a" * 30, "b" * 10])
+    renderer.draw(["a" * 29 + "x", "b" * 9 + "y"])
+    assert renderer.previous == ["a" * 20, "b" * 9 + "y"]
+    for row, column in re.findall(r"\x1b\[(\d+);(\d+)H", stream.getvalue()):
+        assert int(column) <= 20
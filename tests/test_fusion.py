@@ -0,0 +1,26 @@
+# tests/test_fusion.py - v1.0.3
+# FuseStage: one-sample batches (polling) take the scalar path and match the batched result
+
+import numpy as np
+import pytest
+
+import devices
+import fusion
+import pipeline
+
+
+@pytest.mark.parametrize("make", [fusion.MadgwickFilter, fusion.MahonyFilter])
+def test_single_sample_batches_match_one_batch(make):
+    rng = np.random.default_rng(1)
+    t_ns = np.arange(1, 201, dtype=np.int64) * 5000000
+    values = rng.normal(0, 0.2, (200, 7))
+    values[:, 2] += 9.8
+    expected = make().update_arrays(t_ns, values[:, 0:3], values[:, 3:6])
+
+    device = devices.Device("mpu0")
+    device.fusion = make()
+    stage = pipeline.FuseStage(device, {}, {})
+    got = []
+    for i in range(len(t_ns)):
+        got.extend(stage.process(pipeline.Batch(device, t_ns[i:i + 1], values[i:i + 1])).q)
+    np.testing.assert_allclose(got, expected, atol=1e-12)
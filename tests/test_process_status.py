@@ -0,0 +1,53 @@
+# tests/test_process_status.py - v1.0.3
+# Process mode: acquisition metrics, data log and watchdog state reach the web server's API and /metrics
+
+import pytest
+
+import devices
+import sensor_watchdog
+import shm_ring
+
+
+def make_registry(watchdog):
+    registry = devices.DeviceRegistry()
+    device = registry.add(devices.Device("mpu0"))
+    if watchdog:
+        device.watchdog = sensor_watchdog.Watchdog()
+    return registry
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    import mpu6050_monitor
+    ring = shm_ring.SampleRing.create(capacity=16)
+    monkeypatch.setattr(mpu6050_monitor, "sample_ring", ring)
+    monkeypatch.setattr(mpu6050_monitor, "data_log", None)
+    yield mpu6050_monitor
+    ring.close()
+
+
+def test_published_state_is_served_by_the_parent(monitor, monkeypatch):
+    # Acquisition side: a read failed and the gap is still open
+    acquisition = make_registry(watchdog=True)
+    watchdog = acquisition.primary.watchdog
+    watchdog.begin(1000, "OSError: bus locked")
+    watchdog.sensor_resets = 2
+    monitor.I2C_READ_SECONDS.labels(device="mpu0").observe(0.0004)
+    monkeypatch.setattr(monitor, "registry", acquisition)
+    monitor.publish_status()
+
+    # Web server side: same sensors, no watchdog of its own
+    monkeypatch.setattr(monitor, "registry", make_registry(watchdog=False))
+    monitor.I2C_READ_SECONDS.children.clear()
+    client = monitor.app.test_client()
+
+    device = client.get("/api/v1/devices").get_json()["devices"][0]
+    assert device["watchdog"]["state"] == "recovering"
+    assert device["watchdog"]["sensor_resets"] == 2
+    gaps = client.get("/api/v1/gaps").get_json()["gaps"]
+    assert [(gap["device"], gap["end"], gap["reason"]) for gap in gaps] == [("mpu0", None, "OSError: bus locked")]
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'mpu6050_gaps_total{device="mpu0"} 1' in text
+    assert 'mpu6050_resets_total{device="mpu0",kind="sensor"} 2' in text
+    assert 'mpu6050_i2c_read_seconds_count{device="mpu0"} 1' in text
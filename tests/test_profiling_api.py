@@ -0,0 +1,56 @@
+# tests/test_profiling_api.py - v1.0.3
+# POST /api/v1/profile: one profiling run at a time, 409 for the rest
+
+import json
+import sys
+import threading
+
+import pytest
+
+TOKEN = "secret"
+
+
+@pytest.fixture
+def monitor(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open("config.json", "w") as f:
+        json.dump({"profiling": {"token": TOKEN}}, f)
+    import mpu6050_monitor
+    monkeypatch.setattr(mpu6050_monitor, "profile_sessions", {})
+    yield mpu6050_monitor
+    for session in mpu6050_monitor.profile_sessions.values():
+        session.stop()
+
+
+def start(client):
+    return client.post("/api/v1/profile", json={"mode": "sampling", "seconds": 1},
+                       headers={"Authorization": f"Bearer {TOKEN}"})
+
+
+def test_concurrent_requests_start_one_run(monitor):
+    clients = 8
+    barrier = threading.Barrier(clients)
+    statuses = []
+
+    def post():
+        client = monitor.app.test_client()
+        barrier.wait()
+        statuses.append(start(client).status_code)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Interleave the requests as much as possible
+    try:
+        threads = [threading.Thread(target=post) for _ in range(clients)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert sorted(statuses) == [202] + [409] * (clients - 1)
+
+
+def test_token_check_keeps_the_view_name_and_docstring(monitor):
+    assert monitor.api_start_profile.__name__ == "api_start_profile"
+    assert monitor.api_start_profile.__doc__.startswith("API endpoint to profile all threads")
+    assert monitor.api_start_profile.__wrapped__ is not None
@@ -0,0 +1,27 @@
+# tests/test_shm_ring.py - v1.0.3
+# SampleRing status block: what the acquisition process publishes reaches an attached reader
+
+import metrics
+import shm_ring
+
+
+def test_status_round_trip():
+    ring = shm_ring.SampleRing.create(capacity=16)
+    reader = shm_ring.SampleRing.attach(ring.name)
+    try:
+        assert reader.status() is None
+        ring.publish_status({"data_log": {"readings": 1}})
+        ring.publish_status({"data_log": {"readings": 2}})
+        assert reader.status() == {"data_log": {"readings": 2}}
+    finally:
+        reader.close()
+        ring.close()
+
+
+def test_metric_state_moves_between_registries():
+    source = metrics.Registry().histogram("read_seconds", "Read latency", ["device"])
+    source.labels(device="mpu0").observe(0.0003)
+    source.labels(device="mpu1").observe(2.0)
+    mirror = metrics.Registry().histogram("read_seconds", "Read latency", ["device"])
+    mirror.load_state(source.state())
+    assert mirror.render() == source.render()
@@ -0,0 +1,54 @@
+# tests/test_snapshot.py - v1.0.3
+# SnapshotPublisher: readers never see a mix of two published samples
+
+import sys
+import threading
+import time
+
+import samples
+import snapshot
+
+
+def test_read_before_first_publish():
+    assert snapshot.SnapshotPublisher().read() == (0, None)
+
+
+def test_concurrent_readers_see_consistent_samples():
+    publisher = snapshot.SnapshotPublisher()
+    stop = threading.Event()
+    torn = []
+    reads = [0]
+
+    def writer():
+        i = 1
+        while not stop.is_set():
+            # Every field of sample i holds i, so a torn read shows up as a mismatch
+            publisher.publish(samples.Sample(i, i, i, i, i, i, i, i, q=(i, i, i, i)))
+            i += 1
+
+    def reader():
+        last = 0
+        while not stop.is_set():
+            version, sample = publisher.read()
+            if sample is None:
+                continue
+            values = (sample.ax, sample.ay, sample.az, sample.gx, sample.gy, sample.gz, sample.temp) + sample.q
+            if any(value != sample.t_ns for value in values) or version < last:
+                torn.append((version, sample))
+            last = version
+            reads[0] += 1
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # Switch threads as often as possible
+    try:
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(1.0)
+        stop.set()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert reads[0] > 0
+    assert torn == []
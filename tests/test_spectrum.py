@@ -0,0 +1,42 @@
+# tests/test_spectrum.py - v1.0.3
+# SpectrumAnalyzer: the same spectrum whatever the batch sizes, and a restart after a gap
+
+import numpy as np
+import pytest
+
+import spectrum
+
+
+def stream(n=6000, gap_at=3000):
+    rng = np.random.default_rng(3)
+    t_ns = np.arange(n, dtype=np.int64) * 5000000 + rng.integers(-20000, 20000, n)
+    t_ns[gap_at:] += 2000000000
+    accel = rng.normal(size=(n, 3)) + np.sin(2 * np.pi * 37 * t_ns[:, None] / 1e9)
+    return t_ns, accel
+
+
+def feed(sizes):
+    t_ns, accel = stream()
+    analyzer = spectrum.SpectrumAnalyzer({"window_s": 60})
+    start = 0
+    for i in range(len(t_ns)):
+        size = sizes[i % len(sizes)]
+        analyzer.update_arrays(t_ns[start:start + size], accel[start:start + size])
+        start += size
+        if start >= len(t_ns):
+            break
+    return analyzer.snapshot()
+
+
+@pytest.mark.parametrize("sizes", [[1], [1, 2, 7, 30]])
+def test_batch_sizes_do_not_change_the_spectrum(sizes):
+    whole = feed([100])
+    parts = feed(sizes)
+    assert parts["segments"] == whole["segments"]
+    np.testing.assert_allclose(parts["psd"]["x"], whole["psd"]["x"], rtol=1e-12)
+    assert parts["peaks"]["x"][0]["frequency"] == pytest.approx(37, abs=0.1)
+
+
+def test_segments_do_not_span_a_gap():
+    # 3000 samples on each side of the gap: 22 segments of 256 with a step of 128 per side
+    assert feed([1])["segments"] == 2 * ((3000 - 256) // 128 + 1)
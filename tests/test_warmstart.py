@@ -0,0 +1,49 @@
+# tests/test_warmstart.py - v1.0.3
+# Warm start tail read: stops at the first old timestamp in any record and never reads past max_bytes
+
+import json
+import time
+from datetime import datetime
+
+import warmstart
+
+BLOCK = 4096
+
+
+def reading(wall, **extra):
+    return dict({"acceleration": {"x": 0.0, "y": 0.0, "z": 9.8}, "gyro": {"x": 0.0, "y": 0.0, "z": 0.0},
+                 "temperature": 25.0, "timestamp": datetime.fromtimestamp(wall).isoformat()}, **extra)
+
+
+def test_recent_readings_are_loaded_oldest_first(tmp_path):
+    now = time.time()
+    path = tmp_path / "sensor_data.json"
+    path.write_text("".join(json.dumps(reading(now - 100 + i)) + ",\n" for i in range(100)))
+    found, _ = warmstart.read_tail(path, now - 10.5, block_bytes=BLOCK)
+    assert [round(wall - now) for wall, _ in found] == list(range(-10, 0))
+
+
+def test_pretty_printed_log_stops_at_first_old_timestamp(tmp_path):
+    old = time.time() - 3600
+    path = tmp_path / "sensor_data.json"
+    path.write_text(json.dumps({"readings": [reading(old + i / 100) for i in range(5000)]}, indent=2))
+    found, bytes_read = warmstart.read_tail(path, time.time() - 60, block_bytes=BLOCK)
+    assert found == []
+    assert bytes_read == BLOCK
+
+
+def test_old_gap_marker_stops_the_scan(tmp_path):
+    now = time.time()
+    path = tmp_path / "sensor_data.json"
+    gap = {"timestamp": datetime.fromtimestamp(now - 3600).isoformat(), "device": "mpu0", "gap": {}}
+    path.write_text("damaged\n" * 100000 + json.dumps(gap) + "\n" + "damaged\n" * 10)
+    _, bytes_read = warmstart.read_tail(path, now - 60, block_bytes=BLOCK)
+    assert bytes_read == BLOCK
+
+
+def test_reading_stops_at_max_bytes(tmp_path):
+    path = tmp_path / "sensor_data.json"
+    path.write_bytes(b"no timestamps here\n" * 100000)
+    found, bytes_read = warmstart.read_tail(path, time.time() - 60, block_bytes=BLOCK, max_bytes=5 * BLOCK)
+    assert found == []
+    assert bytes_read == 5 * BLOCK
@@ -0,0 +1,82 @@
+# tests/test_watchdog.py - v1.0.3
+# Watchdog recovery: backoff without a gap, reopening the whole bus after a reset, capped hung reads
+
+import threading
+import time
+
+import devices
+import sensor_watchdog
+
+FAST = {"backoff_initial": 0.001, "backoff_factor": 2.0, "backoff_max": 0.01, "bus_reset_after": 2}
+
+
+class LockedBus(devices.SyntheticBus):
+    """Sensors only answer again once the bus has been reset"""
+
+    def __init__(self):
+        super().__init__()
+        self.opens = []
+
+    def open(self, address, channel=None, mux_address=devices.MUX_ADDRESS, signals=None):
+        if not self.resets:
+            raise OSError("bus locked")
+        self.opens.append((channel, address))
+        return super().open(address, channel, mux_address, signals)
+
+
+def test_recover_without_gap_backs_off_and_resets_bus():
+    watchdog = sensor_watchdog.Watchdog(FAST)
+    device = devices.Device("mpu0")
+    bus = LockedBus()
+    device.bus = bus
+    assert watchdog.gap is None
+    deadline = time.monotonic() + 5
+    assert watchdog.recover(device, lambda: time.monotonic() < deadline) is not None
+    assert bus.resets == 1
+    assert watchdog.sensor_resets == FAST["bus_reset_after"] + 1
+
+
+def test_bus_reset_reopens_other_devices_on_the_bus():
+    bus = LockedBus()
+    other_bus = LockedBus()
+    registry = devices.DeviceRegistry()
+    stuck = registry.add(devices.Device("mpu0"))
+    neighbour = registry.add(devices.Device("mpu1", channel=3))
+    elsewhere = registry.add(devices.Device("mpu2"))
+    for device, on in ((stuck, bus), (neighbour, bus), (elsewhere, other_bus)):
+        device.bus = on
+    old = neighbour.driver
+
+    watchdog = sensor_watchdog.Watchdog(FAST)
+    watchdog.begin(0, "OSError: bus locked")
+    assert watchdog.recover(stuck, registry=registry) is stuck.driver
+    assert neighbour.driver is not None and neighbour.driver is not old
+    assert set(bus.opens) == {(None, devices.DEFAULT_ADDRESS), (3, devices.DEFAULT_ADDRESS)}
+    assert elsewhere.driver is None and not other_bus.opens
+    assert watchdog.gap["bus_resets"] == 1
+
+
+def test_hung_reads_left_behind_are_capped():
+    watchdog = sensor_watchdog.Watchdog(dict(FAST, read_timeout=0.01, max_abandoned=2))
+    release = threading.Event()
+
+    def hung_read():
+        watchdog.start_read()
+        release.wait()
+
+    threads = []
+    try:
+        for expected in (1, 2, None, None):
+            thread = threading.Thread(target=hung_read, daemon=True)
+            thread.start()
+            threads.append(thread)
+            time.sleep(0.02)
+            assert watchdog.replace_if_stuck() == expected
+        assert watchdog.describe()["abandoned_reads"] == 2
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+    # Once the hung reads return, a stuck worker can be replaced again
+    watchdog.start_read()
+    assert watchdog.replace_if_stuck(time.monotonic() + 1) == 3
@@ -0,0 +1,102 @@
+# trend.py - v1.0.3
+# Fixed-size ring of per-interval min/max/mean for console sparklines
+
+import math
+import threading
+
+import numpy as np
+
+# Default trend configuration, overridden by config["trend"]
+DEFAULT_TREND = {
+    "enabled": True,
+    "seconds": 30,  # time covered by the sparklines
+    "width": 30     # points per sparkline (one bucket each)
+}
+
+SPARK = "▁▂▃▄▅▆▇█"
+
+
+class TrendBuffer:
+    """Per-channel min, max, sum and count for the last `width` time buckets.
+
+    The acquisition side folds each batch into at most a couple of buckets
+    with array reductions; readers copy width x 7 arrays, so drawing a
+    sparkline does not depend on the sample rate.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_TREND, **(settings or {}))
+        self.seconds = settings["seconds"]
+        self.width = int(settings["width"])
+        self.bucket_ns = max(1, int(self.seconds * 1e9 / self.width))
+        self.ids = np.full(self.width, -1, dtype=np.int64)
+        self.count = np.zeros(self.width, dtype=np.int64)
+        self.sum = np.zeros((self.width, 7))
+        self.min = np.full((self.width, 7), np.inf)
+        self.max = np.full((self.width, 7), -np.inf)
+        self.latest = -1
+        self._lock = threading.Lock()
+
+    def update_arrays(self, t_ns, values):
+        """Add a batch given as t_ns (n,) and values (n, 7)"""
+        if len(t_ns) == 0:
+            return
+        ids = t_ns // self.bucket_ns
+        with self._lock:
+            first, last = int(ids[0]), int(ids[-1])
+            for bucket_id in ([first] if first == last else np.unique(ids).tolist()):
+                rows = values if first == last else values[ids == bucket_id]
+                slot = bucket_id % self.width
+                if self.ids[slot] != bucket_id:
+                    self.ids[slot] = bucket_id
+                    self.count[slot] = 0
+                    self.sum[slot] = 0.0
+                    self.min[slot] = np.inf
+                    self.max[slot] = -np.inf
+                self.count[slot] += len(rows)
+                self.sum[slot] += rows.sum(axis=0)
+                np.minimum(self.min[slot], rows.min(axis=0), out=self.min[slot])
+                np.maximum(self.max[slot], rows.max(axis=0), out=self.max[slot])
+            self.latest = max(self.latest, last)
+
+    def snapshot(self):
+        """Oldest-first bucket means (width, 7), NaN where empty, plus window min, max and mean (7,)"""
+        with self._lock:
+            wanted = np.arange(self.latest - self.width + 1, self.latest + 1)
+            slots = wanted % self.width
+            valid = (self.ids[slots] == wanted) & (self.count[slots] > 0)
+            count = self.count[slots]
+            sums = self.sum[slots]
+            mins = self.min[slots]
+            maxs = self.max[slots]
+        means = np.full((self.width, 7), np.nan)
+        means[valid] = sums[valid] / count[valid, None]
+        if not valid.any():
+            nan = np.full(7, np.nan)
+            return means, nan, nan, nan
+        total = count[valid].sum()
+        return (means, mins[valid].min(axis=0), maxs[valid].max(axis=0),
+                sums[valid].sum(axis=0) / total)
+
+
+def sparkline(points, lo, hi):
+    """One block character per point scaled between lo and hi; blank for NaN"""
+    chars = []
+    span = hi - lo
+    top = len(SPARK) - 1
+    for value in points:
+        if math.isnan(value):
+            chars.append(" ")
+        elif not span > 0:
+            chars.append(SPARK[top // 2])
+        else:
+            chars.append(SPARK[min(top, max(0, int((value - lo) / span * top + 0.5)))])
+    return "".join(chars)
+
+
+def create_trend(settings):
+    """Build the trend buffer described by config["trend"], or None if disabled"""
+    settings = dict(DEFAULT_TREND, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return TrendBuffer(settings)
@@ -0,0 +1,181 @@
+# warmstart.py - v1.0.3
+# Warm start: read the last minutes of the data log backwards from its end and preload in-memory state
+
+import json
+import os
+import re
+import time
+from datetime import datetime
+
+import samples
+
+# Default warm start configuration, overridden by config["warm_start"]
+DEFAULT_WARM_START = {
+    "enabled": True,
+    "minutes": 1.0,           # readings from this far back are preloaded (covers the default stats windows)
+    "max_readings": 100000,   # never preload more than this many readings, whatever the rate
+    "block_bytes": 65536,     # the log is read backwards in blocks of this size
+    "max_bytes": 8388608      # never read more than this much of the log, whatever it holds
+}
+
+# Device writers flush independently, so lines are only roughly in time
+# order; the scan goes this far past the cutoff before it stops
+ORDER_SLACK_S = 5.0
+
+# The timestamp of any record: gap markers, older formats, pretty-printed logs
+TIMESTAMP = re.compile(rb'"timestamp"\s*:\s*"([^"]+)"')
+
+
+def parse_line(line):
+    """(wall time, reading) of one data log line, or None for brackets, gap markers and damaged lines"""
+    line = line.strip().rstrip(b",")
+    if not line.startswith(b'{"'):
+        return None
+    try:
+        reading = json.loads(line)
+        wall = datetime.fromisoformat(reading["timestamp"]).timestamp()
+    except (ValueError, KeyError, TypeError):
+        return None
+    if "gap" in reading:
+        return None
+    return wall, reading
+
+
+def line_time(line):
+    """Wall time of the first timestamp found in a line parse_line() rejected, or None"""
+    match = TIMESTAMP.search(line)
+    if match is None:
+        return None
+    try:
+        return datetime.fromisoformat(match.group(1).decode()).timestamp()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def read_tail(path, since, max_readings=None, block_bytes=DEFAULT_WARM_START["block_bytes"],
+              max_bytes=DEFAULT_WARM_START["max_bytes"]):
+    """Readings logged at or after wall time since, oldest first, and the bytes read.
+
+    The file is read in blocks from the end towards the start and the scan
+    stops at the first timestamp older than since (minus ORDER_SLACK_S),
+    whether it belongs to a reading, a gap marker or a record in another
+    format, so the work depends on how much was logged in the window, not
+    on the size of the file. It never reads more than max_bytes, even when
+    nothing in the file has a timestamp.
+    """
+    found = []
+    bytes_read = 0
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return found, 0
+    with f:
+        position = f.seek(0, os.SEEK_END)
+        partial = b""
+        done = False
+        while position > 0 and not done and (not max_bytes or bytes_read < max_bytes):
+            block = min(block_bytes, position)
+            position -= block
+            f.seek(position)
+            lines = (f.read(block) + partial).split(b"\n")
+            bytes_read += block
+            # The first line may continue in the block before this one
+            partial = lines.pop(0) if position > 0 else b""
+            for line in reversed(lines):
+                parsed = parse_line(line)
+                if parsed is None:
+                    wall = line_time(line)
+                    if wall is not None and wall < since - ORDER_SLACK_S:
+                        done = True
+                        break
+                    continue
+                if parsed[0] < since - ORDER_SLACK_S:
+                    done = True
+                    break
+                if parsed[0] >= since:
+                    found.append(parsed)
+                    if max_readings and len(found) >= max_readings:
+                        done = True
+                        break
+    found.sort(key=lambda item: item[0])
+    return found, bytes_read
+
+
+def to_sample(wall, reading):
+    """Sample of a logged reading, its wall time mapped onto this process's monotonic clock"""
+    accel = reading["acceleration"]
+    gyro = reading["gyro"]
+    raw = None
+    if "raw" in reading:
+        r = reading["raw"]
+        raw = (r["acceleration"]["x"], r["acceleration"]["y"], r["acceleration"]["z"],
+               r["gyro"]["x"], r["gyro"]["y"], r["gyro"]["z"], r["temperature"])
+    return samples.Sample(samples.monotonic_ns(wall), accel["x"], accel["y"], accel["z"],
+                          gyro["x"], gyro["y"], gyro["z"], reading["temperature"], raw=raw)
+
+
+class WarmStart:
+    """Rebuilds recent per-device history, trend buckets and statistics from the data log.
+
+    Readings without a "device" tag belong to the primary sensor. Fusion,
+    spectra and event detection start fresh: they need an unbroken stream,
+    and replaying old readings would raise their events a second time.
+    """
+
+    def __init__(self, settings=None):
+        settings = dict(DEFAULT_WARM_START, **(settings or {}))
+        self.minutes = settings["minutes"]
+        self.max_readings = settings["max_readings"]
+        self.block_bytes = settings["block_bytes"]
+        self.max_bytes = settings["max_bytes"]
+        self.readings = 0
+        self.bytes_read = 0
+        self.seconds = 0.0
+        self.devices = {}  # device id: readings preloaded
+
+    def load(self, path, default_device):
+        """Recent readings of the log at path as {device id: [Sample]}, oldest first"""
+        started = time.perf_counter()
+        found, self.bytes_read = read_tail(path, time.time() - self.minutes * 60, self.max_readings,
+                                           self.block_bytes, self.max_bytes)
+        by_device = {}
+        for wall, reading in found:
+            try:
+                sample = to_sample(wall, reading)
+            except (KeyError, TypeError):
+                continue  # A reading from an older log format
+            by_device.setdefault(reading.get("device", default_device), []).append(sample)
+        self.readings = sum(len(batch) for batch in by_device.values())
+        self.seconds = time.perf_counter() - started
+        return by_device
+
+    def preload(self, device, batch):
+        """Fill a device's history, trend and statistics with samples from load()"""
+        if not batch:
+            return
+        started = time.perf_counter()
+        device.history.extend(batch)
+        t_ns, values = samples.as_arrays(batch)
+        if device.trend is not None:
+            device.trend.update_arrays(t_ns, values)
+        if device.stats is not None:
+            device.stats.update_arrays(t_ns, values)
+        self.devices[device.id] = len(batch)
+        self.seconds += time.perf_counter() - started
+
+    def describe(self):
+        return {
+            "minutes": self.minutes,
+            "readings": self.readings,
+            "bytes_read": self.bytes_read,
+            "seconds": self.seconds,
+            "devices": dict(self.devices)
+        }
+
+
+def create_warm_start(settings):
+    """Build the warm start described by config["warm_start"], or None if disabled"""
+    settings = dict(DEFAULT_WARM_START, **(settings or {}))
+    if not settings["enabled"]:
+        return None
+    return WarmStart(settings)